@@ -1,48 +1,460 @@
-from flask import Flask, request, jsonify
-import pickle
+import time
+
+# Mesure du temps de démarrage (imports + chargement du modèle)
+startup_begin = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify
+import json
+import math
 import numpy as np
 import os
-import shap
+import sys
 from pathlib import Path
 
+# Ajout du dossier de l'API au chemin d'import (lancement via "api.app:app" ou "--chdir api app:app")
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import binary_codec
+from binary_codec import FLOAT32_MATRIX, MSGPACK, UnsupportedMediaType
+from bulk_explain import ENGINES, BulkExplainer
+from client_index import ClientIndex
+from decision_policy import DEFAULT_COST_FN, DEFAULT_COST_FP, PolicyEvaluator, policy_records
+from feature_logger import FeatureLogger
+from metrics import NULL_TIMER, Metrics
+from micro_batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from model_loader import classify_probability, default_model_path
+from tree_engine import numba_available
+from model_registry import UnknownModelVersion, registry
+
+startup_timings = {"imports_s": time.perf_counter() - startup_begin}
+
 # Vérification du démarrage Flask
 print("🚀 Démarrage du script Flask...")
 
-# Chargement du modèle depuis le fichier pickle
-base_dir = Path(__file__).resolve().parent.parent
-file_path = base_dir / "models" / "lgbm_final_model.pkl"
+# Chargement du modèle : format compact (booster LightGBM texte + JSON) par défaut, ou pickle
+file_path = Path(os.getenv("MODEL_PATH", str(default_model_path())))
 
-print(f"📂 Chemin du fichier Pickle : {file_path}")
+print(f"📂 Chemin du modèle : {file_path}")
 
-# Vérification de l'existence du fichier Pickle
+# Vérification de l'existence du fichier du modèle
 if not os.path.exists(file_path):
-    print(f"❌ Erreur : Le fichier Pickle '{file_path}' est introuvable.")
+    print(f"❌ Erreur : Le fichier du modèle '{file_path}' est introuvable.")
     exit()
 
-print("📌 Chargement du fichier Pickle...")
+print("📌 Chargement du modèle...")
+
+# Nombre de threads OpenMP par prédiction LightGBM (0 : valeur par défaut, voir gunicorn.conf.py)
+lgbm_num_threads = int(os.getenv("LGBM_NUM_THREADS", "0"))
+
+# Politique appliquée aux valeurs manquantes (null JSON) : "allow" (NaN géré par LightGBM) ou "reject"
+nan_policy = os.getenv("NAN_POLICY", "allow")
+
+# Modèles supplémentaires pouvant être épinglés par requête (noms de fichiers séparés par des virgules)
+extra_model_paths = [path.strip() for path in os.getenv("EXTRA_MODEL_PATHS", "").split(",") if path.strip()]
+
+# Moteur d'inférence de /predict : "lightgbm" (natif), "numba" ou "numpy" (arbres exportés, voir tree_engine.py)
+inference_backend = os.getenv("INFERENCE_BACKEND", "lightgbm")
+
+# Profil de scoring : "full" (modèle complet, float64) ou "fast" (float32 et sortie anticipée, voir fast_scoring.py)
+scoring_profile = os.getenv("SCORING_PROFILE", "full")
+fast_options = {
+    "num_iteration": int(os.getenv("FAST_NUM_ITERATION", "60")),
+    "exit_margin": float(os.getenv("FAST_EXIT_MARGIN", "0.3")),
+    "audit_rate": float(os.getenv("FAST_AUDIT_RATE", "0.01")),
+}
+backend_override = None
+if scoring_profile == "fast" and inference_backend == "lightgbm" and numba_available():
+    # La sortie anticipée n'est rentable sur un seul client qu'en un seul parcours compilé des arbres
+    inference_backend = "numba"
+    backend_override = ("Profil rapide (SCORING_PROFILE=fast) : moteur d'inférence INFERENCE_BACKEND=lightgbm "
+                        "remplacé par numba")
+    print(f"📌 {backend_override}")
+
+registry.configure(
+    num_threads=lgbm_num_threads,
+    nan_policy=nan_policy,
+    backend=inference_backend,
+    profile=scoring_profile,
+    fast_options=fast_options,
+    max_versions=int(os.getenv("MODEL_MAX_VERSIONS", "3")) + len(extra_model_paths),
+)
 
 try:
-    with open(file_path, "rb") as f:
-        model_data = pickle.load(f)
-    print("✅ Modèle chargé avec succès !")
+    model_load_begin = time.perf_counter()
+    model_entry = registry.load(file_path)
+    for extra_path in extra_model_paths:
+        extra_path = Path(extra_path) if os.path.isabs(extra_path) else file_path.parent / extra_path
+        extra_entry = registry.load(extra_path)
+        registry.keep(extra_entry.name)
+        print(f"✅ Modèle supplémentaire chargé : {extra_entry.name} (version {extra_entry.version})")
+    startup_timings["model_load_s"] = time.perf_counter() - model_load_begin
+    print(f"✅ Modèle chargé avec succès ! (format : {model_entry.format}, version : {model_entry.version}, "
+          f"moteur : {model_entry.backend}, profil : {model_entry.profile})")
 except Exception as e:
     print(f"❌ Erreur lors du chargement du modèle : {e}")
     exit()
 
-# Vérification du contenu du fichier Pickle
-if not isinstance(model_data, dict) or "model" not in model_data or "features" not in model_data:
-    print("❌ Erreur : Le fichier Pickle ne contient pas les bonnes clés ('model', 'features').")
-    exit()
+print(f"✅ Nombre de features : {len(model_entry.features_names)}")
+print(f"📌 Seuil optimal utilisé pour la classification : {model_entry.optimal_threshold:.3f}")
+
+# Surveillance du fichier du modèle actif pour le rechargement à chaud (0 pour désactiver)
+model_watch_interval_s = float(os.getenv("MODEL_WATCH_INTERVAL_S", "10"))
+
+# Modèle fantôme évalué en parallèle du modèle servi, sans impact sur la réponse (nom de fichier ou version)
+shadow_model = os.getenv("SHADOW_MODEL", "")
 
-# Récupération du modèle et des features
-model = model_data["model"]
-features_names = model_data["features"]
-optimal_threshold = model_data["optimal_threshold"]
+# Marge autour du seuil (zone grise)
+margin = 0
 
-print(f"✅ Nombre de features : {len(features_names)}")
-print(f"📌 Seuil optimal utilisé pour la classification : {optimal_threshold:.3f}")
+# Taille maximale d'un lot pour le endpoint /predict/batch (configurable par variable d'environnement)
+max_batch_size = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+print(f"📌 Taille maximale d'un lot : {max_batch_size}")
+
+# Cache des prédictions /predict par worker (PREDICTION_CACHE_SIZE=0 pour le désactiver)
+prediction_cache = None
+prediction_cache_size = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+if prediction_cache_size > 0:
+    prediction_cache = PredictionCache(prediction_cache_size, float(os.getenv("PREDICTION_CACHE_TTL_S", "300")))
+    print(f"📌 Cache des prédictions : {prediction_cache.max_size} entrées, durée de vie {prediction_cache.ttl_s:.0f} s")
+
+# Construction de l'explainer SHAP au démarrage (sinon au premier appel de chaque worker)
+preload_explainer = os.getenv("PRELOAD_EXPLAINER", "0") == "1"
+
+# Micro-batching optionnel des requêtes /predict concurrentes (nécessite des workers multi-threads)
+micro_batcher = None
+if os.getenv("MICRO_BATCHING", "0") == "1":
+    micro_batcher = MicroBatcher(
+        # Lignes regroupées par version du modèle résolue par la requête (pas de nouvelle résolution au scoring)
+        lambda input_matrix, entry: entry.model.predict_proba(input_matrix)[:, 1],
+        max_batch_size=int(os.getenv("MICRO_BATCH_MAX_SIZE", "32")),
+        max_wait_ms=float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5")),
+    )
+    print(f"📌 Micro-batching activé : {micro_batcher.max_batch_size} lignes / {micro_batcher.max_wait_s * 1000:.1f} ms")
+
+# Journalisation des features et des scores servis (FEATURE_LOG_DIR vide pour la désactiver)
+feature_logger = None
+if os.getenv("FEATURE_LOG_DIR"):
+    feature_logger = FeatureLogger(
+        os.getenv("FEATURE_LOG_DIR"),
+        capacity=int(os.getenv("FEATURE_LOG_BUFFER_SIZE", "10000")),
+        sample_rate=float(os.getenv("FEATURE_LOG_SAMPLE_RATE", "1.0")),
+        flush_interval_s=float(os.getenv("FEATURE_LOG_FLUSH_S", "5")),
+        rotate_rows=int(os.getenv("FEATURE_LOG_ROTATE_ROWS", "100000")),
+        max_files=int(os.getenv("FEATURE_LOG_MAX_FILES", "100")),
+    )
+    print(f"📌 Journalisation des features : {feature_logger.directory} (échantillonnage {feature_logger.sample_rate:.0%})")
+
+# Index des clients (recherche par SK_ID_CURR et clients similaires), construit par `api/client_index.py`
+client_index = None
+if os.getenv("CLIENT_INDEX_DIR"):
+    client_index = ClientIndex.open(os.getenv("CLIENT_INDEX_DIR"))
+    print(f"📌 Index des clients : {len(client_index)} clients ({os.getenv('CLIENT_INDEX_DIR')})")
+
+# Nombre maximal de clients similaires retournés par /clients/<id>/similar
+max_similar_clients = 100
+
+# Portefeuille évalué par /policy/what_if : fichier PORTFOLIO_PATH (CSV / Parquet, colonne TARGET facultative),
+# sinon features de l'index des clients. Probabilités calculées au premier appel, une fois par version du modèle.
+policy_evaluator = None
+if os.getenv("PORTFOLIO_PATH"):
+    policy_evaluator = PolicyEvaluator(os.getenv("PORTFOLIO_PATH"))
+elif client_index is not None:
+    policy_evaluator = PolicyEvaluator(client_index.features, client_index.features_names)
+if policy_evaluator is not None:
+    print(f"📌 Portefeuille des simulations de politique : {os.getenv('PORTFOLIO_PATH') or 'index des clients'}")
+
+# Nombre maximal de points de la courbe de coût retournée par /policy/what_if
+max_policy_curve_points = 1001
+
+# Instrumentation exposée par /metrics (format Prometheus) et profilage à la demande par l'en-tête X-Profile
+metrics = Metrics(enabled=os.getenv("METRICS_ENABLED", "1") == "1")
+profiling_enabled = os.getenv("PROFILING_ENABLED", "1") == "1"
 
 app = Flask(__name__)
+if backend_override:
+    app.logger.warning(backend_override)
+
+startup_timings["total_s"] = time.perf_counter() - startup_begin
+print(f"⏱️ Démarrage en {startup_timings['total_s']:.2f} s (imports : {startup_timings['imports_s']:.2f} s)")
+
+
+@app.before_request
+def start_model_watcher():
+    """
+    Démarre la surveillance du fichier du modèle dans le worker (une seule fois, après le fork).
+    """
+    registry.start_watcher(model_watch_interval_s)
+
+
+@app.before_request
+def start_request_timer():
+    """
+    Démarre le chronomètre de la requête (chronomètre vide si l'instrumentation et le profilage sont désactivés).
+    """
+    g.profile = profiling_enabled and request.headers.get("X-Profile") == "1"
+    g.timer = metrics.start_timer(force=g.profile)
+
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Enregistre la latence et le statut de la requête ; ajoute le détail par étape (`Server-Timing`) si demandé.
+    """
+    timer = g.get("timer", NULL_TIMER)
+    if timer.stages:
+        timer.mark("serialize")
+    metrics.record(request.endpoint or "not_found", request.method, response.status_code, timer)
+    if g.get("profile"):
+        response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
+
+@app.after_request
+def add_model_version_header(response):
+    """
+    Indique la version et le profil de scoring du modèle ayant servi la requête.
+    """
+    entry = getattr(g, "model_entry", None)
+    if entry is not None:
+        response.headers["X-Model-Version"] = entry.version
+        response.headers["X-Scoring-Profile"] = entry.profile
+    return response
+
+
+def unknown_model_version_response(requested_version):
+    """
+    Construit la réponse d'erreur 404 d'une version de modèle inconnue (versions disponibles comprises).
+    """
+    versions = registry.versions()
+    return {
+        "error": f"Version de modèle inconnue : {requested_version}",
+        "available_versions": [version["name"] for version in versions] + [version["version"] for version in versions],
+    }
+
+
+@app.errorhandler(UnknownModelVersion)
+def unknown_model_version(e):
+    return jsonify(unknown_model_version_response(e.args[0])), 404
+
+
+def resolve_model_entry():
+    """
+    Retourne la version du modèle demandée par la requête (en-tête `X-Model-Version` ou paramètre
+    `model_version` : empreinte ou nom de fichier), ou la version active.
+    Lève UnknownModelVersion (réponse 404) si elle est inconnue.
+    """
+    g.model_entry = registry.get(request.headers.get("X-Model-Version") or request.args.get("model_version"))
+    return g.model_entry
+
+
+def get_explainer(entry=None):
+    """
+    Retourne l'explainer SHAP du modèle (actif par défaut), construit une seule fois puis réutilisé.
+    Avec PRELOAD_EXPLAINER=1 et le préchargement Gunicorn, il est construit dans le processus maître
+    et partagé par les workers.
+    """
+    return (entry or registry.active()).get_explainer()
+
+
+def compute_shap_values(entry, input_matrix):
+    """
+    Calcule les valeurs SHAP (classe risquée) et la valeur de base pour une matrice de clients.
+    """
+    tree_explainer = get_explainer(entry)
+    shap_values = tree_explainer.shap_values(input_matrix)
+    base_values = tree_explainer.expected_value
+
+    # Vérifier si SHAP génère une liste (cas binaire)
+    if isinstance(shap_values, list):
+        shap_values = shap_values[1]  # Selection de la classe risquée (1)
+    if isinstance(base_values, (list, np.ndarray)) and np.size(base_values) > 1:
+        base_values = np.ravel(base_values)[1]
+
+    return np.asarray(shap_values), float(np.ravel(base_values)[0])
+
+
+def build_single_row(entry, input_data):
+    """
+    Vérifie les features d'un client et remplit la ligne (1 x n_features) préallouée du thread.
+    Retourne un tuple (ligne, erreur) où `erreur` est None si le client est valide.
+    """
+    return entry.schema.build_row(input_data)
+
+
+def score_client(entry, input_array, timer=NULL_TIMER):
+    """
+    Calcule la probabilité de défaut (classe 1) d'un client validé : recherche dans le cache, prédiction
+    (regroupée avec les requêtes concurrentes si le micro-batching est actif) et évaluation du modèle fantôme.
+    Retourne un tuple (probabilité, statut du cache "HIT" / "MISS").
+    """
+    # Recherche dans le cache (clé : vecteur de features canonique + version du modèle)
+    prediction_proba = None
+    if prediction_cache is not None:
+        prediction_cache.check_model_version(registry.active().version)
+        cache_key = prediction_cache.make_key(input_array, entry.version)
+        prediction_proba = prediction_cache.get(cache_key)
+        timer.mark("cache")
+    cache_status = "MISS" if prediction_proba is None else "HIT"
+
+    # Prédiction avec le modèle
+    if prediction_proba is None:
+        if micro_batcher is not None:
+            prediction_proba = micro_batcher.submit(input_array[0].copy(), group=entry)
+        else:
+            prediction_proba = entry.model.predict_proba(input_array)[0][1]  # Probabilité d'être en classe 1 (risqué)
+        timer.mark("predict")
+        if prediction_cache is not None:
+            prediction_cache.put(cache_key, float(prediction_proba))
+
+    # Evaluation du modèle fantôme (comparaison uniquement, la réponse n'est pas modifiée)
+    if shadow_model:
+        score_shadow(entry, input_array, prediction_proba)
+        timer.mark("shadow")
+
+    # Journalisation non bloquante (ajout au tampon, écriture par le thread d'arrière-plan)
+    if feature_logger is not None:
+        feature_logger.log(entry, input_array, [prediction_proba])
+
+    return prediction_proba, cache_status
+
+
+def prediction_response(entry, prediction_proba):
+    """
+    Construit la réponse de /predict : classe, probabilités et bornes de la zone grise autour du seuil optimal.
+    """
+    # Marge autour du seuil
+    lower_bound = entry.optimal_threshold - margin
+    upper_bound = entry.optimal_threshold + margin
+
+    return {
+        "prediction": classify_probability(prediction_proba, lower_bound, upper_bound),
+        "probability_class_1": float(prediction_proba),
+        "probability_class_0": float(1 - prediction_proba),
+        "optimal_threshold": entry.optimal_threshold,
+        "margin": margin,
+        "lower_bound": lower_bound,
+        "upper_bound": upper_bound,
+        # Profil rapide : probabilité éventuellement estimée par sortie anticipée (décision exacte loin du seuil)
+        "approximate": entry.profile == "fast",
+    }
+
+
+def batch_response(entry, probabilities):
+    """
+    Construit la réponse JSON de /predict/batch : classe et probabilités par client, bornes de la zone grise.
+    """
+    # Marge autour du seuil
+    lower_bound = entry.optimal_threshold - margin
+    upper_bound = entry.optimal_threshold + margin
+
+    predictions = [
+        {
+            "prediction": classify_probability(proba, lower_bound, upper_bound),
+            "probability_class_1": proba,
+            "probability_class_0": 1 - proba,
+        }
+        for proba in probabilities.tolist()
+    ]
+    return {
+        "n_clients": len(predictions),
+        "predictions": predictions,
+        "optimal_threshold": entry.optimal_threshold,
+        "margin": margin,
+        "lower_bound": lower_bound,
+        "upper_bound": upper_bound,
+        "approximate": entry.profile == "fast",
+    }
+
+
+def sample_shap_response(entry, timer=NULL_TIMER):
+    """
+    Construit la réponse de /shap_values : valeurs SHAP d'un échantillon aléatoire.
+    """
+    # Echantillon aléatoire pour l'explication SHAP
+    num_samples = 1
+    sample_data = np.random.randn(num_samples, len(entry.features_names))
+    timer.mark("sample")
+
+    # Calcul des valeurs SHAP avec l'explainer mis en cache
+    shap_values, base_values = compute_shap_values(entry, sample_data)
+    timer.mark("shap")
+
+    return {
+        "shap_values": shap_values.tolist(),  # Conversion en liste pour JSON
+        "base_values": base_values,
+        "features_names": entry.features_names,
+        "sample_values": sample_data.tolist(),
+    }
+
+
+def build_batch_matrix(entry, payload):
+    """
+    Construit une matrice float64 contiguë (n_clients x n_features) à partir d'un lot.
+
+    Deux formats sont acceptés :
+    - une liste d'enregistrements clients (ou un dictionnaire {"clients": [...]}) ;
+    - un format colonnaire {feature: [valeurs...]} indexé par les noms de features.
+
+    Retourne un tuple (matrice, erreur) où `erreur` est None si le lot est valide.
+    """
+    return entry.schema.build_matrix(payload, max_rows=max_batch_size)
+
+
+def read_scoring_request(entry, max_rows):
+    """
+    Lit le corps d'une requête de scoring selon son Content-Type. Retourne un tuple (matrice, données, erreur) :
+    - matrice décodée sans copie pour `application/x-float32-matrix`, convertie au type du schéma si besoin
+      (données None). Une valeur non représentable exactement en float32 diffère de sa valeur JSON après
+      l'aller-retour : clé de cache et probabilité peuvent alors différer légèrement de celles du JSON ;
+    - données décodées (JSON par défaut, ou MessagePack) à valider par le schéma (matrice None).
+    Lève UnsupportedMediaType (réponse 415) si MessagePack est demandé sans le paquet `msgpack`.
+    """
+    content_type = binary_codec.media_type(request.content_type)
+    if content_type == FLOAT32_MATRIX:
+        # L'ordre des colonnes est celui du modèle : la version doit être désignée explicitement
+        if not (request.headers.get("X-Model-Version") or request.args.get("model_version")):
+            return None, None, "Le format binaire nécessite l'en-tête X-Model-Version (ordre des colonnes du modèle)."
+        input_matrix, error = binary_codec.decode_float32_matrix(
+            request.get_data(), entry.schema.n_features, max_rows=max_rows, nan_policy=entry.schema.nan_policy)
+        if error:
+            return None, None, error
+        return input_matrix.astype(entry.schema.dtype, copy=False), None, None
+    if content_type == MSGPACK:
+        return None, binary_codec.decode_msgpack(request.get_data()), None
+    return None, request.get_json(), None
+
+
+def scoring_response(entry, response_type, probabilities, build_payload, headers=None):
+    """
+    Encode la réponse d'un endpoint de scoring au format négocié : probabilités float32 (seuil, marge et nombre
+    de clients en en-têtes), ou dictionnaire `build_payload()` en JSON / MessagePack.
+    """
+    headers = dict(headers or {})
+    if response_type == FLOAT32_MATRIX:
+        headers.update({
+            "X-Optimal-Threshold": repr(entry.optimal_threshold),
+            "X-Margin": repr(margin),
+            "X-Rows": str(len(probabilities)),
+        })
+        return Response(binary_codec.encode_float32(probabilities), mimetype=FLOAT32_MATRIX, headers=headers)
+    if response_type == MSGPACK:
+        return Response(binary_codec.encode_msgpack(build_payload()), mimetype=MSGPACK, headers=headers)
+    return jsonify(build_payload()), 200, headers
+
+
+def score_shadow(entry, input_array, prediction_proba):
+    """
+    Évalue le modèle fantôme (SHADOW_MODEL) sur la même ligne et enregistre l'écart avec la prédiction servie.
+    """
+    try:
+        shadow_entry = registry.get(shadow_model)
+    except KeyError:
+        return
+    if shadow_entry is entry:
+        return
+    shadow_proba = shadow_entry.model.predict_proba(input_array)[0][1]
+    registry.record_shadow(prediction_proba, shadow_proba, entry.optimal_threshold)
 
 @app.route('/')
 def home():
@@ -59,87 +471,304 @@ def home():
         "indiquant quelles caractéristiques influencent le plus la prédiction du modèle."
     )
 
+@app.route('/status', methods=['GET'])
+def status():
+    """
+    Endpoint Flask exposant l'état du worker : modèle chargé et temps de démarrage mesurés.
+    """
+    active_entry = registry.active()
+    return jsonify({
+        "pid": os.getpid(),
+        "model_path": active_entry.path,
+        "model_format": active_entry.format,
+        "model_version": active_entry.version,
+        "n_features": len(active_entry.features_names),
+        "explainer_loaded": active_entry.explainer is not None,
+        "lgbm_num_threads": lgbm_num_threads,
+        "inference_backend": active_entry.backend,
+        "scoring_profile": active_entry.profile,
+        "startup_timings": {**startup_timings, "explainer_load_s": active_entry.explainer_load_s},
+    }), 200
+
+@app.route('/schema', methods=['GET'])
+def get_schema():
+    """
+    Endpoint Flask retournant le schéma des features attendues par le modèle (format OpenAPI).
+    """
+    return jsonify(resolve_model_entry().schema.openapi_schema()), 200
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """
     Endpoint Flask pour effectuer une prédiction avec le modèle entraîné.
     Intègre une marge autour du seuil optimal.
     """
+    entry = resolve_model_entry()
+    timer = g.timer
     try:
-        # Récupération des données JSON envoyées
-        input_data = request.get_json()
-
-        # Vérification des features
-        missing_features = [feat for feat in features_names if feat not in input_data]
-        if missing_features:
-            return jsonify({"error": f"Features manquantes : {missing_features}"}), 400
+        # Récupération des données envoyées (JSON par défaut, ou format binaire négocié)
+        response_type = binary_codec.negotiate(request.headers.get("Accept"))
+        input_array, input_data, error = read_scoring_request(entry, max_rows=1)
+        timer.mark("parse")
 
-        # Convertion des données en array numpy
-        input_array = np.array([list(input_data[feat] for feat in features_names)]).reshape(1, -1)
+        # Vérification des features et convertion des données en array numpy
+        if input_array is None and error is None:
+            input_array, error = build_single_row(entry, input_data)
+        timer.mark("validation")
+        if error:
+            return jsonify({"error": error}), 400
 
-        # Prédiction avec le modèle
-        prediction_proba = model.predict_proba(input_array)[0][1]  # Probabilité d'être en classe 1 (risqué)
+        # Prédiction (cache, micro-batching et modèle fantôme compris) et construction de la réponse
+        prediction_proba, cache_status = score_client(entry, input_array, timer)
+        return scoring_response(entry, response_type, [prediction_proba],
+                                lambda: prediction_response(entry, prediction_proba), {"X-Cache": cache_status})
 
-        # Marge autour du seuil
-        margin = 0
-        lower_bound = optimal_threshold - margin
-        upper_bound = optimal_threshold + margin
+    except UnsupportedMediaType as e:
+        return jsonify({"error": str(e)}), 415
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Classification avec la marge
-        if prediction_proba < lower_bound:
-            prediction_class = "Classe_0 (fiable)"
-        elif prediction_proba > upper_bound:
-            prediction_class = "Classe_1 (risqué)"
-        else:
-            prediction_class = "Zone grise (incertain)"
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Endpoint Flask pour scorer un lot de clients en un seul appel vectorisé au modèle.
+    La taille maximale du lot est définie par la variable d'environnement MAX_BATCH_SIZE.
+    """
+    entry = resolve_model_entry()
+    timer = g.timer
+    try:
+        # Récupération et validation du lot complet (JSON par défaut, ou format binaire négocié)
+        response_type = binary_codec.negotiate(request.headers.get("Accept"))
+        input_matrix, input_data, error = read_scoring_request(entry, max_rows=max_batch_size)
+        timer.mark("parse")
+        if input_matrix is None and error is None:
+            input_matrix, error = build_batch_matrix(entry, input_data)
+        timer.mark("validation")
+        if error:
+            return jsonify({"error": error}), 400
 
-        # Construction de la réponse
-        response = {
-            "prediction": prediction_class,
-            "probability_class_1": float(prediction_proba),
-            "probability_class_0": float(1 - prediction_proba),
-            "optimal_threshold": optimal_threshold,
-            "margin": margin,
-            "lower_bound": lower_bound,
-            "upper_bound": upper_bound,
-        }
+        # Prédiction vectorisée sur l'ensemble du lot
+        probabilities = entry.model.predict_proba(input_matrix)[:, 1]
+        timer.mark("predict")
+        if feature_logger is not None:
+            feature_logger.log(entry, input_matrix, probabilities)
 
-        return jsonify(response), 200
+        return scoring_response(entry, response_type, probabilities, lambda: batch_response(entry, probabilities))
 
+    except UnsupportedMediaType as e:
+        return jsonify({"error": str(e)}), 415
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/micro_batching/stats', methods=['GET'])
+def get_micro_batching_stats():
+    """
+    Endpoint Flask exposant les métriques du micro-batching (profondeur de file, taille réalisée des lots).
+    """
+    if micro_batcher is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **micro_batcher.stats()}), 200
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Endpoint Flask exposant les compteurs du cache des prédictions (taille, succès, échecs, évictions).
+    """
+    if prediction_cache is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **prediction_cache.stats()}), 200
+
+@app.route('/clients/<int:client_id>', methods=['GET'])
+def get_client(client_id):
+    """
+    Endpoint Flask retournant les features d'un client de l'index (recherche par SK_ID_CURR).
+    """
+    if client_index is None:
+        return jsonify({"error": "Index des clients non configuré (CLIENT_INDEX_DIR)."}), 404
+    record = client_index.lookup_record(client_id)
+    if record is None:
+        return jsonify({"error": f"Client inconnu : {client_id}"}), 404
+    return jsonify({"SK_ID_CURR": client_id, "features": record}), 200
+
+@app.route('/clients/<int:client_id>/similar', methods=['GET'])
+def get_similar_clients(client_id):
+    """
+    Endpoint Flask retournant les k clients les plus proches d'un client (features centrées-réduites),
+    avec leur probabilité de défaut.
+    """
+    if client_index is None:
+        return jsonify({"error": "Index des clients non configuré (CLIENT_INDEX_DIR)."}), 404
+    entry = resolve_model_entry()
+    try:
+        k = int(request.args.get("k", "5"))
+    except ValueError:
+        return jsonify({"error": "Le paramètre k doit être un entier."}), 400
+    if not 1 <= k <= max_similar_clients:
+        return jsonify({"error": f"Le paramètre k doit être compris entre 1 et {max_similar_clients}."}), 400
+    try:
+        ids, distances, positions = client_index.similar(client_id, k=k)
+    except KeyError:
+        return jsonify({"error": f"Client inconnu : {client_id}"}), 404
+
+    similar_clients = [{"SK_ID_CURR": int(similar_id), "distance": distance}
+                       for similar_id, distance in zip(ids.tolist(), distances.tolist())]
+    # Probabilités des clients similaires (un seul appel vectorisé) si l'index porte sur les features du modèle
+    if len(ids) and client_index.features_names == entry.features_names:
+        probabilities = entry.exact_model.predict_proba(np.asarray(client_index.features[positions]))[:, 1]
+        for similar_client, proba in zip(similar_clients, probabilities.tolist()):
+            similar_client["probability_class_1"] = proba
+    return jsonify({"SK_ID_CURR": client_id, "k": k, "similar_clients": similar_clients}), 200
+
+def float_arg(name, default, minimum, maximum):
+    """
+    Lit un paramètre décimal fini de la requête ; lève ValueError (message d'erreur) s'il est invalide ou hors bornes.
+    """
+    try:
+        value = float(request.args.get(name, default))
+    except ValueError:
+        raise ValueError(f"Le paramètre {name} doit être un nombre.")
+    if not math.isfinite(value):
+        raise ValueError(f"Le paramètre {name} doit être un nombre fini.")
+    if not minimum <= value <= maximum:
+        raise ValueError(f"Le paramètre {name} doit être compris entre {minimum} et {maximum}.")
+    return value
+
+def int_arg(name, default, minimum, maximum):
+    """
+    Lit un paramètre entier de la requête ; lève ValueError (message d'erreur) s'il est invalide ou hors bornes.
+    """
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        raise ValueError(f"Le paramètre {name} doit être un entier.")
+    if not minimum <= value <= maximum:
+        raise ValueError(f"Le paramètre {name} doit être compris entre {minimum} et {maximum}.")
+    return value
+
+@app.route('/policy/what_if', methods=['GET'])
+def policy_what_if():
+    """
+    Endpoint Flask simulant une politique de décision (seuil et marge de la zone grise) sur tout le portefeuille :
+    taux d'accord, taille de la zone grise et coût métier, comparés à la politique actuelle, et courbe de coût
+    en fonction du seuil (recherche dichotomique dans les probabilités triées du portefeuille).
+    """
+    if policy_evaluator is None:
+        return jsonify({"error": "Portefeuille non configuré (PORTFOLIO_PATH ou CLIENT_INDEX_DIR)."}), 404
+    entry = resolve_model_entry()
+    try:
+        threshold = float_arg("threshold", entry.optimal_threshold, 0.0, 1.0)
+        policy_margin = float_arg("margin", margin, 0.0, 0.5)
+        costs = {
+            "cost_fn": float_arg("cost_fn", DEFAULT_COST_FN, 0.0, float("inf")),
+            "cost_fp": float_arg("cost_fp", DEFAULT_COST_FP, 0.0, float("inf")),
+            "cost_review": float_arg("cost_review", 0.0, 0.0, float("inf")),
+        }
+        curve_points = int_arg("curve_points", 101, 2, max_policy_curve_points)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        portfolio = policy_evaluator.get(entry)
+    except Exception as e:
+        return jsonify({"error": f"Erreur lors de l'évaluation du portefeuille : {e}"}), 500
+    if not len(portfolio):
+        return jsonify({"error": "Le portefeuille ne contient aucun client."}), 404
+
+    current_policy, policy = policy_records(portfolio.evaluate([entry.optimal_threshold, threshold],
+                                                               [margin, policy_margin], **costs))
+    thresholds = np.linspace(0.0, 1.0, curve_points)
+    curve = portfolio.evaluate(thresholds, policy_margin, **costs)
+    best = int(np.argmin(curve["cost"]))
+    return jsonify({
+        "model_version": entry.version,
+        "n_clients": len(portfolio),
+        "defaults": "observed" if portfolio.observed else "expected",
+        **costs,
+        "current_policy": current_policy,
+        "policy": policy,
+        "cost_curve": {
+            "margin": policy_margin,
+            **{name: curve[name].tolist() for name in ("threshold", "approval_rate", "gray_zone_rate",
+                                                        "refusal_rate", "cost_per_client")},
+            "min_cost_threshold": float(thresholds[best]),
+            "min_cost_per_client": float(curve["cost_per_client"][best]),
+        },
+    }), 200
+
+@app.route('/fast_profile/stats', methods=['GET'])
+def get_fast_profile_stats():
+    """
+    Endpoint Flask exposant les compteurs du profil de scoring rapide du modèle (sorties anticipées,
+    accord avec le modèle complet mesuré sur l'échantillon audité).
+    """
+    entry = resolve_model_entry()
+    if entry.profile != "fast":
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, "model_version": entry.version, **entry.model.stats()}), 200
+
+@app.route('/feature_log/stats', methods=['GET'])
+def get_feature_log_stats():
+    """
+    Endpoint Flask exposant les compteurs de la journalisation des features (lignes en attente, abandonnées, écrites).
+    """
+    if feature_logger is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **feature_logger.stats()}), 200
+
 @app.route('/shap_values', methods=['GET'])
 def get_shap_values():
     """
     Endpoint Flask pour récupérer les valeurs SHAP d'un échantillon.
     Permet d'afficher l'explication SHAP dans la démo Streamlit.
     """
+    entry = resolve_model_entry()
+    timer = g.timer
     try:
-        # Echantillon aléatoire pour l'explication SHAP
-        num_samples = 1
-        sample_data = np.random.randn(num_samples, len(features_names))
-
-        # Vérifier si le modèle supporte SHAP
-        if "lightgbm" in str(type(model)).lower():
-            explainer = shap.TreeExplainer(model)
-            shap_values = explainer.shap_values(sample_data)
-            base_values = explainer.expected_value
-        else:
-            explainer = shap.Explainer(model, sample_data)
-            shap_values = explainer(sample_data).values
-            base_values = explainer.expected_value
+        response = sample_shap_response(entry, timer)
+
+        return jsonify(response), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/explain', methods=['POST'])
+def explain():
+    """
+    Endpoint Flask pour calculer les valeurs SHAP d'un client réel.
+    Prend le même corps JSON que /predict ; le paramètre optionnel `top_k` (query string)
+    limite la réponse aux k features ayant le plus d'impact en valeur absolue.
+    """
+    entry = resolve_model_entry()
+    timer = g.timer
+    try:
+        # Récupération des données JSON envoyées
+        input_data = request.get_json()
+        timer.mark("parse")
+        input_array, error = build_single_row(entry, input_data)
+        timer.mark("validation")
+        if error:
+            return jsonify({"error": error}), 400
 
-        # Vérifier si SHAP génère une liste (cas binaire)
-        if isinstance(shap_values, list):
-            shap_values = shap_values[1]  # Selection de la classe risquée (1)
+        top_k = request.args.get("top_k", type=int)
+        if top_k is not None and top_k <= 0:
+            return jsonify({"error": "Le paramètre 'top_k' doit être un entier positif."}), 400
 
-        # Construction de la réponse JSON
+        # Calcul des valeurs SHAP avec l'explainer mis en cache
+        shap_values, base_values = compute_shap_values(entry, input_array)
+        timer.mark("shap")
+        features_names = entry.features_names
+        selected = np.arange(len(features_names))
+
+        # Troncature aux k features les plus influentes
+        if top_k is not None and top_k < len(features_names):
+            selected = np.argsort(-np.abs(shap_values[0]))[:top_k]
+
+        # Construction de la réponse JSON (même format que /shap_values)
         response = {
-            "shap_values": shap_values.tolist(),  # Conversion en liste pour JSON
-            "base_values": base_values.tolist() if isinstance(base_values, np.ndarray) else float(base_values),
-            "features_names": features_names,
-            "sample_values": sample_data.tolist(),
+            "shap_values": shap_values[:, selected].tolist(),
+            "base_values": base_values,
+            "features_names": [features_names[i] for i in selected],
+            "sample_values": input_array[:, selected].tolist(),
         }
 
         return jsonify(response), 200
@@ -148,6 +777,112 @@ def get_shap_values():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/explain/batch', methods=['POST'])
+def explain_batch():
+    """
+    Endpoint Flask pour calculer les valeurs SHAP d'un lot de clients (même corps que /predict/batch).
+    Les résultats sont calculés par blocs et envoyés au fil de l'eau au format NDJSON (une ligne par client).
+    Le paramètre `engine` choisit le moteur : "shap" (TreeExplainer) ou "lightgbm" (pred_contrib natif).
+    """
+    entry = resolve_model_entry()
+    try:
+        input_data = request.get_json()
+        input_matrix, error = build_batch_matrix(entry, input_data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        engine = request.args.get("engine", "shap")
+        if engine not in ENGINES:
+            return jsonify({"error": f"Moteur inconnu '{engine}', valeurs possibles : {list(ENGINES)}"}), 400
+        chunk_size = request.args.get("chunk_size", 1000, type=int)
+        if chunk_size <= 0:
+            return jsonify({"error": "Le paramètre 'chunk_size' doit être un entier positif."}), 400
+
+        bulk_explainer = BulkExplainer(entry.model, engine=engine, explainer=get_explainer(entry) if engine == "shap" else None)
+
+        def generate():
+            for start in range(0, input_matrix.shape[0], chunk_size):
+                shap_values, base_values = bulk_explainer.explain(input_matrix[start:start + chunk_size])
+                for offset, (row_values, base_value) in enumerate(zip(shap_values.tolist(), base_values.tolist())):
+                    yield json.dumps({"index": start + offset, "shap_values": row_values, "base_values": base_value}) + "\n"
+
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Endpoint Flask exposant les métriques du worker au format texte Prometheus
+    (compteurs de requêtes et d'erreurs, histogrammes de latence par endpoint et par étape).
+    """
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+def render_metrics(extra_gauges=None):
+    """
+    Exposition Prometheus commune à Flask et à l'ASGI : métriques des requêtes, modèle actif, cache, journal
+    des features et profil rapide, plus les jauges propres au point d'entrée (`extra_gauges`).
+    """
+    active_entry = registry.active()
+    gauges = {
+        "model_info": ("Modèle actif du worker (valeur constante 1).",
+                       {(("name", active_entry.name), ("version", active_entry.version)): 1}),
+    }
+    if prediction_cache is not None:
+        cache_stats = prediction_cache.stats()
+        gauges["prediction_cache_hit_rate"] = ("Taux de succès du cache des prédictions.", {(): cache_stats["hit_rate"]})
+        gauges["prediction_cache_size"] = ("Nombre de prédictions en cache.", {(): cache_stats["size"]})
+    if feature_logger is not None:
+        log_stats = feature_logger.stats()
+        gauges["feature_log_buffered_rows"] = ("Lignes en attente d'écriture dans le journal des features.", {(): log_stats["buffered_rows"]})
+        gauges["feature_log_dropped_rows"] = ("Lignes abandonnées (tampon plein) depuis le démarrage.", {(): log_stats["dropped_rows"]})
+        gauges["feature_log_written_rows"] = ("Lignes écrites dans le journal des features depuis le démarrage.", {(): log_stats["written_rows"]})
+    if active_entry.profile == "fast":
+        fast_stats = active_entry.model.stats()
+        gauges["fast_profile_early_exit_rate"] = ("Proportion des clients sortis de façon anticipée (profil rapide).", {(): fast_stats["early_exit_rate"]})
+        if fast_stats["audit_agreement"] is not None:
+            gauges["fast_profile_audit_agreement"] = ("Accord des décisions avec le modèle complet (sorties anticipées auditées).", {(): fast_stats["audit_agreement"]})
+    gauges.update(extra_gauges or {})
+    return metrics.render(gauges)
+
+@app.route('/models', methods=['GET'])
+def get_models():
+    """
+    Endpoint Flask listant les versions de modèles chargées par le worker (version active, modèles épinglables)
+    et les statistiques du modèle fantôme.
+    """
+    return jsonify({
+        "pid": os.getpid(),
+        "active_version": registry.active().version,
+        "versions": registry.versions(),
+        "shadow_model": shadow_model or None,
+        "shadow_stats": registry.shadow_stats(),
+    }), 200
+
+@app.route('/models/reload', methods=['POST'])
+def reload_model():
+    """
+    Endpoint Flask forçant la vérification immédiate du fichier du modèle actif dans le worker qui traite la requête.
+    Les autres workers rechargent le modèle à leur prochaine vérification (MODEL_WATCH_INTERVAL_S).
+    """
+    try:
+        previous_version = registry.active().version
+        entry = registry.reload()
+        return jsonify({
+            "pid": os.getpid(),
+            "reloaded": entry.version != previous_version,
+            "previous_version": previous_version,
+            "active_version": entry.version,
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+if preload_explainer:
+    get_explainer()
+
+
 if __name__ == "__main__":
     print("🚀 Lancement de l'API Flask...")
     app.run(host='127.0.0.1', port=5000, debug=True)
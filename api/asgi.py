@@ -0,0 +1,255 @@
+"""
+Point d'entrée ASGI de l'API de scoring (alternative à `app.py` servie par Gunicorn en workers synchrones).
+
+Avec des workers synchrones, un client lent (envoi d'un gros corps JSON, lecture lente de la réponse SHAP)
+immobilise un worker entier. Ici, la réception des requêtes et l'envoi des réponses sont asynchrones :
+la boucle d'évènements continue de servir les autres clients pendant qu'un client lent transmet ses données.
+Seuls les calculs (validation, LightGBM, SHAP) sont confiés à un pool de threads borné ; LightGBM
+libère le GIL pendant la prédiction.
+
+Contre-pression : au-delà de ASGI_MAX_PENDING calculs en cours ou en attente, les requêtes sont rejetées
+immédiatement (503 avec l'en-tête Retry-After) au lieu de s'accumuler et d'allonger toutes les latences.
+
+Le contrat de `/predict` et `/shap_values` est celui de l'application Flask : la logique de scoring,
+le registre des modèles, le cache et les métriques sont partagés avec `app.py`.
+
+Lancement avec la configuration Gunicorn (préchargement du modèle partagé entre les workers) :
+    gunicorn -c gunicorn.conf.py -k uvicorn_worker.UvicornWorker api.asgi:app --bind 0.0.0.0:8000
+ou, en local, avec un seul processus :
+    uvicorn api.asgi:app --port 8000
+"""
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs
+
+# Le parallélisme est assuré par le pool de calcul : un thread OpenMP par prédiction LightGBM
+os.environ.setdefault("LGBM_NUM_THREADS", "1")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import app as scoring
+import binary_codec
+from metrics import NULL_TIMER
+from model_registry import UnknownModelVersion, registry
+
+
+class ScoringASGI:
+    """
+    Application ASGI exposant /predict, /shap_values, /status et /metrics.
+
+    - `max_workers` : threads du pool de calcul.
+    - `max_pending` : calculs en cours ou en attente au-delà desquels les requêtes reçoivent une erreur 503.
+    - `max_body_bytes` : taille maximale du corps d'une requête (erreur 413 au-delà).
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, max_body_bytes=10 * 1024 * 1024):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_body_bytes = max_body_bytes
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scoring")
+        self.pending = 0
+        self.rejected = 0
+        self.routes = {
+            ("POST", "/predict"): ("predict", self.predict),
+            ("GET", "/shap_values"): ("get_shap_values", self.shap_values),
+            ("GET", "/status"): ("status", self.status),
+            ("GET", "/metrics"): ("get_metrics", self.metrics),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        route = self.routes.get((scope["method"], scope["path"]))
+        if route is None:
+            await send_json(send, 404, {"error": f"Route inconnue : {scope['method']} {scope['path']}"})
+            return
+        endpoint, handler = route
+
+        registry.start_watcher(scoring.model_watch_interval_s)
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        # Épinglage de la version du modèle : en-tête X-Model-Version ou paramètre model_version
+        model_version = headers.get("x-model-version") or parse_qs(scope["query_string"].decode()).get("model_version", [None])[0]
+        headers["x-model-version"] = model_version
+        timer = scoring.metrics.start_timer(force=scoring.profiling_enabled and headers.get("x-profile") == "1")
+        status, body, extra_headers = await handler(scope, receive, headers, timer)
+        if timer.stages:
+            timer.mark("respond")
+        scoring.metrics.record(endpoint, scope["method"], status, timer)
+        if timer is not NULL_TIMER and headers.get("x-profile") == "1":
+            extra_headers["Server-Timing"] = timer.server_timing()
+        await send_response(send, status, body, extra_headers)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def offload(self, function, *args):
+        """
+        Exécute un calcul dans le pool borné, ou retourne None si le pool est saturé (contre-pression).
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return None
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self.pending -= 1
+
+    def overloaded(self):
+        return 503, json_body({"error": "Serveur saturé, réessayez plus tard."}), {"Retry-After": "1"}
+
+    async def predict(self, scope, receive, headers, timer):
+        body = await read_body(receive, self.max_body_bytes)
+        if body is None:
+            return 413, json_body({"error": f"Corps de la requête supérieur à {self.max_body_bytes} octets."}), {}
+        timer.mark("receive")
+        result = await self.offload(score_request, body, headers, timer)
+        return result or self.overloaded()
+
+    async def shap_values(self, scope, receive, headers, timer):
+        result = await self.offload(explain_sample, headers.get("x-model-version"), timer)
+        return result or self.overloaded()
+
+    async def status(self, scope, receive, headers, timer):
+        active_entry = registry.active()
+        return 200, json_body({
+            "pid": os.getpid(),
+            "server": "asgi",
+            "model_version": active_entry.version,
+            "n_features": len(active_entry.features_names),
+            "pool_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }), {}
+
+    async def metrics(self, scope, receive, headers, timer):
+        gauges = {
+            "asgi_pending": ("Calculs en cours ou en attente dans le pool.", {(): self.pending}),
+            "asgi_rejected_total": ("Requêtes rejetées (503) par saturation du pool.", {(): self.rejected}),
+        }
+        return 200, scoring.render_metrics(gauges).encode(), {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def score_request(body, headers, timer):
+    """
+    Calcul de /predict (exécuté dans le pool) : décodage (JSON par défaut, ou format binaire négocié comme
+    dans `app.py`), validation, prédiction et sérialisation.
+    """
+    timer.mark("queue")
+    model_version = headers.get("x-model-version")
+    content_type = binary_codec.media_type(headers.get("content-type"))
+    try:
+        entry = registry.get(model_version)
+        response_type = binary_codec.negotiate(headers.get("accept"))
+        if content_type == binary_codec.FLOAT32_MATRIX:
+            if not model_version:
+                return 400, json_body({"error": "Le format binaire nécessite l'en-tête X-Model-Version (ordre des colonnes du modèle)."}), {}
+            input_array, error = binary_codec.decode_float32_matrix(body, entry.schema.n_features, max_rows=1,
+                                                                   nan_policy=entry.schema.nan_policy)
+            if input_array is not None:
+                input_array = input_array.astype(entry.schema.dtype, copy=False)
+            timer.mark("parse")
+        else:
+            try:
+                if content_type == binary_codec.MSGPACK:
+                    input_data = binary_codec.decode_msgpack(body)
+                else:
+                    input_data = json.loads(body)
+            except binary_codec.UnsupportedMediaType as e:
+                return 415, json_body({"error": str(e)}), {}
+            except (json.JSONDecodeError, UnicodeDecodeError, ValueError) as e:
+                return 400, json_body({"error": f"Corps de la requête invalide : {e}"}), {}
+            timer.mark("parse")
+            input_array, error = scoring.build_single_row(entry, input_data)
+        timer.mark("validation")
+        if error:
+            return 400, json_body({"error": error}), {}
+        prediction_proba, cache_status = scoring.score_client(entry, input_array, timer)
+        response_headers = {"X-Cache": cache_status, "X-Model-Version": entry.version, "X-Scoring-Profile": entry.profile}
+        if response_type == binary_codec.FLOAT32_MATRIX:
+            response_headers.update({"Content-Type": binary_codec.FLOAT32_MATRIX, "X-Optimal-Threshold": repr(entry.optimal_threshold),
+                            "X-Margin": repr(scoring.margin), "X-Rows": "1"})
+            return 200, binary_codec.encode_float32([prediction_proba]), response_headers
+        response = scoring.prediction_response(entry, prediction_proba)
+        if response_type == binary_codec.MSGPACK:
+            return 200, binary_codec.encode_msgpack(response), {**response_headers, "Content-Type": binary_codec.MSGPACK}
+        return 200, json_body(response), response_headers
+    except UnknownModelVersion as e:
+        return 404, json_body(scoring.unknown_model_version_response(e.args[0])), {}
+    except Exception as e:
+        return 500, json_body({"error": str(e)}), {}
+
+
+def explain_sample(model_version, timer):
+    """
+    Calcul de /shap_values (exécuté dans le pool).
+    """
+    timer.mark("queue")
+    try:
+        entry = registry.get(model_version)
+        return 200, json_body(scoring.sample_shap_response(entry, timer)), {"X-Model-Version": entry.version}
+    except UnknownModelVersion as e:
+        return 404, json_body(scoring.unknown_model_version_response(e.args[0])), {}
+    except Exception as e:
+        return 500, json_body({"error": str(e)}), {}
+
+
+async def read_body(receive, max_bytes):
+    """
+    Lit le corps de la requête au fil de sa réception, ou retourne None s'il dépasse `max_bytes`.
+    """
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > max_bytes:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def json_body(payload):
+    return json.dumps(payload).encode()
+
+
+async def send_response(send, status, body, extra_headers=None):
+    headers = {"Content-Type": "application/json", "Content-Length": str(len(body)), **(extra_headers or {})}
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, payload):
+    await send_response(send, status, json_body(payload))
+
+
+app = ScoringASGI(
+    max_workers=int(os.getenv("ASGI_POOL_WORKERS", "2")),
+    max_pending=int(os.getenv("ASGI_MAX_PENDING", "32")),
+    max_body_bytes=int(os.getenv("ASGI_MAX_BODY_BYTES", str(10 * 1024 * 1024))),
+)
@@ -0,0 +1,107 @@
+"""
+Formats d'échange compacts des endpoints de scoring (négociation de contenu), JSON restant le format par défaut.
+
+- `application/x-float32-matrix` : matrice de float32 little-endian, ligne par ligne, colonnes dans l'ordre de
+  `features_names` du modèle (`GET /schema`). L'ordre des colonnes dépendant du modèle, la requête doit désigner
+  sa version (en-tête `X-Model-Version` ou paramètre `model_version`). Le corps est lu directement comme un
+  tableau NumPy, sans objet Python par valeur ; NaN représente une valeur manquante.
+  En réponse (en-tête `Accept`), les probabilités de la classe 1 sont retournées au même format (une valeur
+  par client), avec le seuil, la marge et le nombre de clients en en-têtes.
+- `application/msgpack` : mêmes structures que le JSON, encodées en MessagePack (dépendance optionnelle `msgpack`).
+"""
+import numpy as np
+
+JSON = "application/json"
+FLOAT32_MATRIX = "application/x-float32-matrix"
+MSGPACK = "application/msgpack"
+
+# Types de réponse proposés, par ordre de préférence à qualité égale
+RESPONSE_TYPES = (JSON, FLOAT32_MATRIX, MSGPACK)
+
+_FLOAT32_LE = np.dtype("<f4")
+
+
+class UnsupportedMediaType(ValueError):
+    """
+    Format demandé ou envoyé non pris en charge (réponse 415).
+    """
+
+
+def media_type(header):
+    """
+    Type de média d'un en-tête Content-Type ou d'un élément de Accept, sans paramètres (ex. "; charset=utf-8").
+    """
+    return (header or "").split(";")[0].strip().lower()
+
+
+def msgpack_available():
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def negotiate(accept_header):
+    """
+    Choisit le format de la réponse d'après l'en-tête Accept (qualité `q` comprise) ; JSON par défaut.
+    """
+    candidates = []
+    for position, item in enumerate((accept_header or "").split(",")):
+        name = media_type(item)
+        quality = 1.0
+        for param in item.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name == "*/*" or name == "application/*":
+            name = JSON
+        if name in RESPONSE_TYPES and quality > 0 and (name != MSGPACK or msgpack_available()):
+            candidates.append((-quality, position, name))
+    return min(candidates)[2] if candidates else JSON
+
+
+def decode_float32_matrix(body, n_features, max_rows=None, nan_policy="allow"):
+    """
+    Lit un corps `application/x-float32-matrix` ; retourne un tuple (matrice (n x n_features) float32, erreur).
+    La matrice est une vue en lecture seule sur le corps de la requête (aucune copie).
+    """
+    row_bytes = _FLOAT32_LE.itemsize * n_features
+    if not body or len(body) % row_bytes:
+        return None, (f"Taille du corps ({len(body or b'')} octets) incompatible avec des lignes de "
+                      f"{n_features} float32 ({row_bytes} octets).")
+    input_matrix = np.frombuffer(body, dtype=_FLOAT32_LE).reshape(-1, n_features)
+    if max_rows is not None and input_matrix.shape[0] > max_rows:
+        return None, f"Taille du lot ({input_matrix.shape[0]}) supérieure au maximum autorisé ({max_rows})."
+    if np.isinf(input_matrix).any():
+        return None, "Valeurs infinies non autorisées."
+    if nan_policy == "reject" and np.isnan(input_matrix).any():
+        return None, "Valeurs manquantes (NaN) non autorisées."
+    return input_matrix, None
+
+
+def encode_float32(values):
+    """
+    Encode un vecteur (probabilités) en float32 little-endian.
+    """
+    return np.asarray(values, dtype=_FLOAT32_LE).tobytes()
+
+
+def decode_msgpack(body):
+    """
+    Décode un corps MessagePack (mêmes structures que le JSON) ; lève UnsupportedMediaType sans `msgpack`.
+    """
+    try:
+        import msgpack
+    except ImportError:
+        raise UnsupportedMediaType("Format MessagePack non disponible (paquet msgpack non installé).")
+    return msgpack.unpackb(body, raw=False)
+
+
+def encode_msgpack(payload):
+    import msgpack
+
+    return msgpack.packb(payload, use_bin_type=True)
@@ -0,0 +1,160 @@
+"""
+Calcul des valeurs SHAP en masse (audits réglementaires sur des cohortes complètes).
+
+Les clients sont lus par blocs (matrice, DataFrame, fichier CSV ou Parquet) et expliqués
+de façon vectorisée bloc par bloc. Deux moteurs sont disponibles :
+- "shap" : `shap.TreeExplainer` (même calcul que les endpoints /explain et /shap_values) ;
+- "lightgbm" : contributions natives de LightGBM (`pred_contrib=True`).
+
+Pour un modèle LightGBM, `TreeExplainer` s'appuie lui-même sur `pred_contrib` : les deux moteurs
+donnent les mêmes valeurs, mais le moteur "lightgbm" évite l'import de `shap` et la construction
+de l'explainer (voir `benchmarks/bench_shap_engines.py`).
+
+Les résultats sont produits au fil de l'eau (générateur) et peuvent être écrits
+en CSV sans conserver l'ensemble des valeurs en mémoire.
+
+Utilisation en ligne de commande :
+    python api/bulk_explain.py features/app_test_features.csv shap_values.csv --engine lightgbm
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from model_loader import default_model_path, load_model_data
+
+ENGINES = ("shap", "lightgbm")
+ID_COLUMN = "SK_ID_CURR"
+
+
+def iter_feature_chunks(source, features_names, chunk_size=10000):
+    """
+    Parcourt une source de clients par blocs et retourne des tuples (identifiants, matrice float64).
+
+    `source` peut être une matrice numpy, un DataFrame, ou le chemin d'un fichier CSV / Parquet.
+    Les identifiants sont lus dans la colonne SK_ID_CURR si elle existe, sinon ce sont les numéros de ligne.
+    """
+    if isinstance(source, np.ndarray):
+        for start in range(0, source.shape[0], chunk_size):
+            chunk = np.ascontiguousarray(source[start:start + chunk_size], dtype=np.float64)
+            yield np.arange(start, start + chunk.shape[0]), chunk
+        return
+
+    if isinstance(source, pd.DataFrame):
+        chunks = (source.iloc[start:start + chunk_size] for start in range(0, len(source), chunk_size))
+    elif str(source).lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        columns = [col for col in [ID_COLUMN] + list(features_names) if col in parquet_file.schema_arrow.names]
+        chunks = (
+            batch.to_pandas()
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns)
+        )
+    else:
+        chunks = pd.read_csv(source, chunksize=chunk_size)
+
+    offset = 0
+    for chunk in chunks:
+        missing_features = [feat for feat in features_names if feat not in chunk.columns]
+        if missing_features:
+            raise ValueError(f"Features manquantes : {missing_features}")
+        if ID_COLUMN in chunk.columns:
+            ids = chunk[ID_COLUMN].to_numpy()
+        else:
+            ids = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield ids, np.ascontiguousarray(chunk[list(features_names)].to_numpy(dtype=np.float64))
+
+
+def get_booster(model):
+    """
+    Retourne le Booster LightGBM sous-jacent (modèle sklearn `LGBMClassifier` ou Booster natif).
+    """
+    return getattr(model, "booster_", model)
+
+
+class BulkExplainer:
+    """
+    Calcule les valeurs SHAP (classe risquée, en log-odds) d'une matrice de clients avec le moteur choisi.
+    """
+
+    def __init__(self, model, engine="shap", explainer=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Moteur inconnu '{engine}', valeurs possibles : {ENGINES}")
+        self.model = model
+        self.engine = engine
+        self._explainer = explainer
+
+    def explain(self, input_matrix):
+        """
+        Retourne un tuple (valeurs SHAP (n, n_features), valeurs de base (n,)).
+        """
+        if self.engine == "lightgbm":
+            contributions = get_booster(self.model).predict(input_matrix, pred_contrib=True)
+            return contributions[:, :-1], contributions[:, -1]
+
+        if self._explainer is None:
+            import shap
+
+            self._explainer = shap.TreeExplainer(get_booster(self.model))
+        shap_values = self._explainer.shap_values(input_matrix)
+        if isinstance(shap_values, list):
+            shap_values = shap_values[1]  # Selection de la classe risquée (1)
+        base_value = np.ravel(self._explainer.expected_value)[-1]
+        return np.asarray(shap_values), np.full(input_matrix.shape[0], base_value)
+
+
+def iter_shap_chunks(model, source, features_names, engine="shap", chunk_size=10000):
+    """
+    Générateur de tuples (identifiants, valeurs SHAP, valeurs de base), un par bloc de clients.
+    """
+    bulk_explainer = BulkExplainer(model, engine=engine)
+    for ids, input_matrix in iter_feature_chunks(source, features_names, chunk_size=chunk_size):
+        shap_values, base_values = bulk_explainer.explain(input_matrix)
+        yield ids, shap_values, base_values
+
+
+def write_shap_csv(chunks, features_names, output_path):
+    """
+    Écrit les blocs de valeurs SHAP dans un fichier CSV au fur et à mesure de leur calcul.
+    Retourne le nombre de clients écrits.
+    """
+    n_rows = 0
+    header = True
+    for ids, shap_values, base_values in chunks:
+        chunk_df = pd.DataFrame(shap_values, columns=[f"SHAP_{feat}" for feat in features_names])
+        chunk_df.insert(0, ID_COLUMN, ids)
+        chunk_df["BASE_VALUE"] = base_values
+        chunk_df.to_csv(output_path, mode="w" if header else "a", header=header, index=False)
+        header = False
+        n_rows += len(chunk_df)
+    return n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcul des valeurs SHAP en masse par blocs.")
+    parser.add_argument("input", help="Fichier CSV ou Parquet contenant les features des clients.")
+    parser.add_argument("output", help="Fichier CSV de sortie des valeurs SHAP.")
+    parser.add_argument("--engine", choices=ENGINES, default="shap", help="Moteur de calcul des valeurs SHAP.")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Nombre de clients par bloc.")
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", str(default_model_path())), help="Chemin du modèle.")
+    args = parser.parse_args()
+
+    print(f"📌 Chargement du modèle : {args.model}")
+    model_data = load_model_data(args.model)
+    features_names = model_data["features"]
+
+    print(f"📌 Calcul des valeurs SHAP (moteur '{args.engine}', blocs de {args.chunk_size} clients)...")
+    start = time.perf_counter()
+    chunks = iter_shap_chunks(model_data["model"], args.input, features_names, args.engine, args.chunk_size)
+    n_rows = write_shap_csv(chunks, features_names, args.output)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ {n_rows} clients expliqués en {elapsed:.1f} s ({n_rows / max(elapsed, 1e-9):.0f} clients/s) : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
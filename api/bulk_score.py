@@ -0,0 +1,199 @@
+"""
+Scoring hors ligne d'un fichier de features (CSV ou Parquet), par exemple `features/app_test_features.csv`.
+
+Le fichier est lu par blocs de taille fixe ; chaque bloc est scoré de façon vectorisée
+(`predict_proba`) par un pool de processus, puis écrit immédiatement dans le fichier de sortie
+(CSV ou Parquet selon l'extension). Le nombre de blocs en cours de traitement est borné :
+la mémoire utilisée reste constante quelle que soit la taille du fichier d'entrée.
+
+Le chargement du modèle, le seuil optimal et les classes retournées sont ceux de l'API. En option,
+les k features ayant le plus d'impact (valeurs SHAP, contributions natives LightGBM) sont ajoutées
+pour chaque client.
+
+Utilisation :
+    python api/bulk_score.py features/app_test_features.csv scores.csv --processes 4 --top-k 3
+"""
+import argparse
+import os
+import resource
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from bulk_explain import ID_COLUMN, BulkExplainer, iter_feature_chunks
+from model_loader import classify_probabilities, default_model_path, load_model_data
+
+# État du processus de scoring (modèle chargé une fois par processus du pool)
+_worker = {}
+
+
+def init_worker(model_path, num_threads):
+    """
+    Charge le modèle dans un processus du pool.
+    """
+    model_data = load_model_data(model_path)
+    model_data["model"].num_threads = num_threads
+    _worker["model_data"] = model_data
+    _worker["explainer"] = BulkExplainer(model_data["model"], engine="lightgbm")
+
+
+def score_chunk(input_matrix, top_k=0):
+    """
+    Score un bloc de clients : retourne (probabilités de la classe 1, indices et valeurs SHAP des k features
+    les plus influentes, ou None si `top_k` vaut 0).
+    """
+    probabilities = _worker["model_data"]["model"].predict_proba(input_matrix)[:, 1]
+    if not top_k:
+        return probabilities, None
+
+    shap_values, _ = _worker["explainer"].explain(input_matrix)
+    top_k = min(top_k, shap_values.shape[1])
+    # Sélection des k plus grandes valeurs absolues (sans tri complet), puis tri décroissant de ces k valeurs
+    top_indexes = np.argpartition(-np.abs(shap_values), top_k - 1, axis=1)[:, :top_k]
+    top_values = np.take_along_axis(shap_values, top_indexes, axis=1)
+    order = np.argsort(-np.abs(top_values), axis=1)
+    return probabilities, (np.take_along_axis(top_indexes, order, axis=1), np.take_along_axis(top_values, order, axis=1))
+
+
+def build_output_chunk(ids, probabilities, top, features_names, lower_bound, upper_bound):
+    """
+    Construit le DataFrame de sortie d'un bloc : identifiant, probabilité, classe et features les plus influentes.
+    """
+    chunk_df = pd.DataFrame({
+        ID_COLUMN: ids,
+        "PROBABILITY_CLASS_1": probabilities,
+        "PREDICTION": classify_probabilities(probabilities, lower_bound, upper_bound),
+    })
+    if top is not None:
+        top_indexes, top_values = top
+        features_array = np.asarray(features_names)
+        for rank in range(top_indexes.shape[1]):
+            chunk_df[f"TOP{rank + 1}_FEATURE"] = features_array[top_indexes[:, rank]]
+            chunk_df[f"TOP{rank + 1}_SHAP"] = top_values[:, rank]
+    return chunk_df
+
+
+class ChunkWriter:
+    """
+    Écrit les blocs de sortie au fil de l'eau, en CSV ou en Parquet selon l'extension du fichier.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = str(output_path)
+        self.parquet = self.output_path.lower().endswith(".parquet")
+        self._writer = None
+        self._header = True
+
+    def write(self, chunk_df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk_df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.output_path, table.schema)
+            self._writer.write_table(table)
+        else:
+            chunk_df.to_csv(self.output_path, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(input_path, output_path, model_path=None, chunk_size=10000, processes=1, top_k=0, margin=0.0,
+               progress=True):
+    """
+    Score un fichier de features par blocs et écrit les résultats dans `output_path`.
+    Retourne le nombre de clients scorés.
+    """
+    model_path = str(model_path or default_model_path())
+    model_data = load_model_data(model_path)
+    features_names = model_data["features"]
+    lower_bound = model_data["optimal_threshold"] - margin
+    upper_bound = model_data["optimal_threshold"] + margin
+
+    if processes > 1:
+        # "spawn" : les processus ne héritent pas de l'état OpenMP du processus principal ;
+        # chaque processus utilise un seul thread OpenMP, le parallélisme est assuré par le pool
+        executor = ProcessPoolExecutor(max_workers=processes, mp_context=get_context("spawn"),
+                                       initializer=init_worker, initargs=(model_path, 1))
+        submit = executor.submit
+    else:
+        executor = None
+        init_worker(model_path, 0)
+        submit = _run_now
+
+    writer = ChunkWriter(output_path)
+    pending = deque()
+    n_rows = 0
+    start = time.perf_counter()
+
+    def write_oldest():
+        nonlocal n_rows
+        ids, future = pending.popleft()
+        probabilities, top = future.result()
+        writer.write(build_output_chunk(ids, probabilities, top, features_names, lower_bound, upper_bound))
+        n_rows += len(ids)
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"🔄 {n_rows} clients scorés ({n_rows / max(elapsed, 1e-9):.0f} clients/s)", flush=True)
+
+    try:
+        for ids, input_matrix in iter_feature_chunks(input_path, features_names, chunk_size=chunk_size):
+            pending.append((ids, submit(score_chunk, input_matrix, top_k)))
+            # Au plus deux blocs en attente par processus : la mémoire reste bornée
+            while len(pending) >= 2 * max(processes, 1):
+                write_oldest()
+        while pending:
+            write_oldest()
+    finally:
+        writer.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return n_rows
+
+
+class _Done:
+    """
+    Résultat déjà calculé, exposant la même interface qu'un `Future` (exécution sans pool de processus).
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+def _run_now(function, *args):
+    return _Done(function(*args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring par blocs d'un fichier de features CSV ou Parquet.")
+    parser.add_argument("input", help="Fichier CSV ou Parquet contenant les features des clients.")
+    parser.add_argument("output", help="Fichier de sortie (.csv ou .parquet).")
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", str(default_model_path())), help="Chemin du modèle.")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Nombre de clients par bloc.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Processus de scoring.")
+    parser.add_argument("--top-k", type=int, default=0, help="Nombre de features les plus influentes (SHAP) à ajouter.")
+    parser.add_argument("--margin", type=float, default=0.0, help="Marge de la zone grise autour du seuil optimal.")
+    args = parser.parse_args()
+
+    print(f"📌 Scoring de {args.input} (blocs de {args.chunk_size} clients, {args.processes} processus)...")
+    start = time.perf_counter()
+    n_rows = score_file(args.input, args.output, args.model, args.chunk_size, args.processes, args.top_k, args.margin)
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"✅ {n_rows} clients scorés en {elapsed:.1f} s ({n_rows / max(elapsed, 1e-9):.0f} clients/s), "
+          f"mémoire maximale du processus principal : {peak_rss_mb:.0f} Mo : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
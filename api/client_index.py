@@ -0,0 +1,185 @@
+"""
+Index des clients par identifiant (SK_ID_CURR) et recherche des clients similaires.
+
+L'index est construit une seule fois à partir du fichier des features (CSV ou Parquet) et enregistré
+dans un dossier de tableaux numpy :
+- `ids.npy` : identifiants triés (recherche dichotomique, O(log n)) ;
+- `features.npy` : features float64, dans l'ordre des identifiants ;
+- `scaled.npy` / `sq_norms.npy` : features centrées-réduites en float32 (valeurs manquantes remplacées par
+  la moyenne) et leurs normes au carré, pour la recherche des plus proches voisins ;
+- `index.json` : noms des features, moyennes et écarts-types.
+
+Les tableaux sont ouverts en mémoire partagée (`mmap`) : le chargement est immédiat et les pages sont
+partagées par les workers Gunicorn et le tableau de bord Streamlit.
+
+Utilisation :
+    python api/client_index.py features/app_test_features.csv client_index/
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bulk_explain import ID_COLUMN, iter_feature_chunks
+from model_loader import default_model_path, load_model_data
+
+
+class ClientIndex:
+    """
+    Index trié des clients : recherche par identifiant et recherche des k clients les plus proches
+    (distance euclidienne sur les features centrées-réduites).
+    """
+
+    def __init__(self, ids, features, features_names, mean, std, scaled=None, sq_norms=None):
+        self.ids = ids
+        self.features = features
+        self.features_names = list(features_names)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        if scaled is None:
+            scaled = self.scale(features)
+            sq_norms = np.einsum("ij,ij->i", scaled, scaled)
+        self.scaled = scaled
+        self.sq_norms = sq_norms
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_arrays(cls, ids, features, features_names):
+        """
+        Construit l'index en mémoire (identifiants dans un ordre quelconque, uniques).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+        duplicated = ids[1:][ids[1:] == ids[:-1]]
+        if duplicated.size:
+            raise ValueError(f"Identifiants en double : {np.unique(duplicated)[:10].tolist()}")
+        features = np.ascontiguousarray(np.asarray(features, dtype=np.float64)[order])
+        mean = np.nanmean(features, axis=0) if len(features) else np.zeros(features.shape[1])
+        std = np.nanstd(features, axis=0) if len(features) else np.ones(features.shape[1])
+        # Une feature constante (ou entièrement manquante) ne contribue pas à la distance
+        std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+        return cls(ids, features, features_names, np.nan_to_num(mean), std)
+
+    @classmethod
+    def from_frame(cls, data, features_names):
+        ids = data[ID_COLUMN].to_numpy() if ID_COLUMN in data.columns else data.index.to_numpy()
+        return cls.from_arrays(ids, data[list(features_names)].to_numpy(dtype=np.float64), features_names)
+
+    @classmethod
+    def build(cls, source, features_names, chunk_size=50000):
+        """
+        Construit l'index à partir d'un fichier de features (CSV ou Parquet) lu par blocs.
+        """
+        ids, matrices = [], []
+        for chunk_ids, chunk_matrix in iter_feature_chunks(source, features_names, chunk_size=chunk_size):
+            ids.append(chunk_ids)
+            matrices.append(chunk_matrix)
+        features = np.vstack(matrices) if matrices else np.empty((0, len(features_names)))
+        return cls.from_arrays(np.concatenate(ids) if ids else np.empty(0, dtype=np.int64), features, features_names)
+
+    def save(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ("ids", "features", "scaled", "sq_norms"):
+            np.save(directory / f"{name}.npy", getattr(self, name))
+        (directory / "index.json").write_text(json.dumps({
+            "features_names": self.features_names,
+            "mean": self.mean.tolist(),
+            "std": self.std.tolist(),
+            "n_clients": len(self),
+        }), encoding="utf-8")
+
+    @classmethod
+    def open(cls, directory, mmap=True):
+        """
+        Ouvre un index enregistré (tableaux projetés en mémoire avec `mmap`, sans lecture complète).
+        """
+        directory = Path(directory)
+        meta = json.loads((directory / "index.json").read_text(encoding="utf-8"))
+        mode = "r" if mmap else None
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode=mode) for name in ("ids", "features", "scaled", "sq_norms")}
+        return cls(arrays["ids"], arrays["features"], meta["features_names"], meta["mean"], meta["std"],
+                   scaled=arrays["scaled"], sq_norms=arrays["sq_norms"])
+
+    def scale(self, features):
+        """
+        Centre et réduit des features (valeurs manquantes remplacées par la moyenne), en float32.
+        """
+        scaled = (np.asarray(features, dtype=np.float64) - self.mean) / self.std
+        return np.nan_to_num(scaled, nan=0.0).astype(np.float32)
+
+    def positions(self, client_ids):
+        """
+        Positions des identifiants dans l'index (recherche dichotomique vectorisée), -1 pour un identifiant inconnu.
+        """
+        client_ids = np.atleast_1d(np.asarray(client_ids, dtype=np.int64))
+        positions = np.searchsorted(self.ids, client_ids)
+        found = positions < len(self.ids)
+        found[found] = self.ids[positions[found]] == client_ids[found]
+        return np.where(found, positions, -1)
+
+    def lookup(self, client_id):
+        """
+        Retourne les features d'un client (vecteur float64), ou None s'il est inconnu.
+        """
+        position = self.positions(client_id)[0]
+        return None if position < 0 else np.asarray(self.features[position])
+
+    def lookup_record(self, client_id):
+        """
+        Retourne les features d'un client sous forme de dictionnaire JSON (None pour une valeur manquante).
+        """
+        row = self.lookup(client_id)
+        if row is None:
+            return None
+        return {feat: (None if np.isnan(value) else float(value)) for feat, value in zip(self.features_names, row.tolist())}
+
+    def similar(self, client_id=None, k=5, row=None):
+        """
+        Retourne les k clients les plus proches d'un client de l'index (exclu du résultat) ou d'un vecteur de features :
+        tuple (identifiants, distances, positions), du plus proche au plus éloigné.
+        """
+        exclude = -1
+        if row is None:
+            exclude = self.positions(client_id)[0]
+            if exclude < 0:
+                raise KeyError(client_id)
+            query = np.asarray(self.scaled[exclude])
+        else:
+            query = self.scale(np.asarray(row).reshape(1, -1))[0]
+
+        # ||x - q||² = ||x||² - 2 x.q + ||q||² : un seul produit matrice-vecteur, sans matrice temporaire n x k
+        distances = self.sq_norms - 2.0 * (self.scaled @ query) + float(query @ query)
+        if exclude >= 0:
+            distances[exclude] = np.inf
+        k = min(k, len(self) - (exclude >= 0))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64)
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return np.asarray(self.ids[nearest]), np.sqrt(np.maximum(distances[nearest], 0.0)).astype(np.float64), nearest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construction de l'index des clients (recherche par identifiant et clients similaires).")
+    parser.add_argument("input", help="Fichier CSV ou Parquet des features des clients.")
+    parser.add_argument("output", help="Dossier de l'index.")
+    parser.add_argument("--model", default=str(default_model_path()), help="Modèle définissant les features indexées.")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Nombre de clients lus par bloc.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    features_names = load_model_data(args.model)["features"]
+    print(f"📌 Construction de l'index des clients à partir de {args.input}...")
+    index = ClientIndex.build(args.input, features_names, chunk_size=args.chunk_size)
+    index.save(args.output)
+    print(f"✅ {len(index)} clients indexés ({len(features_names)} features) en {time.perf_counter() - start:.1f} s : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
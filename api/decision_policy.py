@@ -0,0 +1,201 @@
+"""
+Évaluation des politiques de décision (seuil et marge de la zone grise) sur l'ensemble du portefeuille.
+
+Les probabilités de défaut du portefeuille sont calculées une seule fois par version du modèle, puis triées.
+Pour un seuil `s` et une marge `m`, les décisions suivent `classify_probability` :
+- accordé (Classe_0) : probabilité < s - m ;
+- zone grise : s - m <= probabilité <= s + m ;
+- refusé (Classe_1) : probabilité > s + m.
+
+Le nombre de clients de chaque décision est obtenu par recherche dichotomique dans les probabilités triées,
+et les défauts parmi les clients accordés ou refusés par sommes cumulées : une requête « et si » ne coûte
+que O(log n) par couple (seuil, marge), quel que soit le nombre de clients.
+
+Coût métier (notebook de modélisation) : `cost_fn` par client en défaut accordé (faux négatif) et `cost_fp`
+par bon client refusé (faux positif), plus `cost_review` par client de la zone grise (étude manuelle).
+Si la colonne TARGET est disponible, les défauts observés sont utilisés ; sinon, les défauts attendus
+(somme des probabilités du modèle).
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from bulk_explain import iter_feature_chunks
+
+TARGET_COLUMN = "TARGET"
+
+# Coûts par défaut de la métrique métier du notebook de modélisation
+DEFAULT_COST_FN = 5.0
+DEFAULT_COST_FP = 1.0
+
+
+class PortfolioScores:
+    """
+    Probabilités triées d'un portefeuille de clients et sommes cumulées des défauts (observés ou attendus).
+    """
+
+    def __init__(self, probabilities, labels=None, model_version=None):
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if labels is not None and len(labels) != len(probabilities):
+            raise ValueError(f"{len(labels)} valeurs de TARGET pour {len(probabilities)} clients.")
+        order = np.argsort(probabilities, kind="stable")
+        self.sorted_probabilities = probabilities[order]
+        self.model_version = model_version
+        self.observed = labels is not None
+        # cum_defaults[i] : défauts parmi les i clients de plus faible probabilité
+        defaults = np.asarray(labels, dtype=np.float64)[order] if self.observed else self.sorted_probabilities
+        self.cum_defaults = np.concatenate([[0.0], np.cumsum(defaults)])
+
+    def __len__(self):
+        return len(self.sorted_probabilities)
+
+    @classmethod
+    def from_model(cls, model, source, features_names, labels=None, model_version=None, chunk_size=50000):
+        """
+        Calcule les probabilités du portefeuille par blocs (fichier CSV / Parquet, DataFrame ou matrice).
+        """
+        probabilities = [
+            model.predict_proba(chunk_matrix)[:, 1]
+            for _, chunk_matrix in iter_feature_chunks(source, features_names, chunk_size=chunk_size)
+        ]
+        probabilities = np.concatenate(probabilities) if probabilities else np.empty(0)
+        return cls(probabilities, labels=labels, model_version=model_version)
+
+    def evaluate(self, thresholds, margins=0.0, cost_fn=DEFAULT_COST_FN, cost_fp=DEFAULT_COST_FP, cost_review=0.0):
+        """
+        Évalue des politiques (seuils et marges, diffusés l'un contre l'autre) : retourne un dictionnaire de tableaux
+        (effectifs et taux par décision, faux négatifs, faux positifs, coût total et coût moyen par client).
+        """
+        thresholds, margins = np.broadcast_arrays(np.asarray(thresholds, dtype=np.float64),
+                                                  np.asarray(margins, dtype=np.float64))
+        n_clients = len(self)
+        # Accordés : probabilité < seuil - marge ; refusés : probabilité > seuil + marge
+        approved_end = np.searchsorted(self.sorted_probabilities, thresholds - margins, side="left")
+        refused_start = np.searchsorted(self.sorted_probabilities, thresholds + margins, side="right")
+        refused_start = np.maximum(refused_start, approved_end)
+        n_approved = approved_end
+        n_refused = n_clients - refused_start
+        n_gray = refused_start - approved_end
+
+        false_negatives = self.cum_defaults[approved_end]
+        false_positives = n_refused - (self.cum_defaults[n_clients] - self.cum_defaults[refused_start])
+        cost = cost_fn * false_negatives + cost_fp * false_positives + cost_review * n_gray
+        rate = 1.0 / n_clients if n_clients else 0.0
+        return {
+            "threshold": thresholds,
+            "margin": margins,
+            "n_approved": n_approved,
+            "n_gray_zone": n_gray,
+            "n_refused": n_refused,
+            "approval_rate": n_approved * rate,
+            "gray_zone_rate": n_gray * rate,
+            "refusal_rate": n_refused * rate,
+            "false_negatives": false_negatives,
+            "false_positives": false_positives,
+            "cost": cost,
+            "cost_per_client": cost * rate,
+        }
+
+
+def policy_records(evaluation):
+    """
+    Convertit le résultat de `PortfolioScores.evaluate` en liste de dictionnaires JSON (une politique par élément).
+    """
+    columns = {name: values.ravel().tolist() for name, values in evaluation.items()}
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def read_labels(source):
+    """
+    Lit la colonne TARGET d'un fichier CSV / Parquet (ou d'un DataFrame), dans l'ordre des lignes ;
+    None si elle est absente ou incomplète (les défauts attendus sont alors utilisés).
+    """
+    labels = _read_target_column(source)
+    if labels is None:
+        return None
+    labels = np.asarray(labels, dtype=np.float64)
+    return None if np.isnan(labels).any() else labels
+
+
+def _read_target_column(source):
+    if isinstance(source, pd.DataFrame):
+        return source[TARGET_COLUMN].to_numpy() if TARGET_COLUMN in source.columns else None
+    if isinstance(source, np.ndarray):
+        return None
+    if str(source).lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        if TARGET_COLUMN not in pq.ParquetFile(source).schema_arrow.names:
+            return None
+        return pq.read_table(source, columns=[TARGET_COLUMN]).column(0).to_numpy()
+    if TARGET_COLUMN not in pd.read_csv(source, nrows=0).columns:
+        return None
+    return pd.read_csv(source, usecols=[TARGET_COLUMN])[TARGET_COLUMN].to_numpy()
+
+
+class PolicyEvaluator:
+    """
+    Cache, par version du modèle, des probabilités du portefeuille (calculées au premier appel du worker).
+    Le portefeuille est scoré par le modèle complet (`entry.exact_model`) : la sortie anticipée du profil rapide
+    n'est exacte qu'autour du seuil optimal, et les courbes portent sur tous les seuils.
+
+    - `source` : fichier CSV / Parquet, DataFrame, ou matrice numpy dont les colonnes sont `source_features`.
+    - `max_versions` : nombre de versions conservées (les plus anciennes sont oubliées).
+    """
+
+    def __init__(self, source, source_features=None, max_versions=3, chunk_size=50000):
+        self.source = source
+        self.source_features = list(source_features) if source_features is not None else None
+        self.max_versions = max_versions
+        self.chunk_size = chunk_size
+        self._portfolios = {}
+        self._labels = None
+        self._labels_loaded = False
+        self._lock = threading.Lock()
+
+    def _matrix_source(self, features_names):
+        """
+        Source réordonnée selon les features du modèle (matrice numpy) ; la source telle quelle sinon.
+        """
+        if self.source_features is None or not isinstance(self.source, np.ndarray):
+            return self.source
+        if self.source_features == list(features_names):
+            return self.source
+        missing = sorted(set(features_names) - set(self.source_features))
+        if missing:
+            raise ValueError(f"Features absentes du portefeuille : {missing}")
+        return self.source[:, [self.source_features.index(feat) for feat in features_names]]
+
+    def get(self, entry):
+        """
+        Retourne les probabilités triées du portefeuille pour une version du modèle (calculées une seule fois).
+        """
+        portfolio = self._portfolios.get(entry.version)
+        if portfolio is not None:
+            return portfolio
+        with self._lock:
+            portfolio = self._portfolios.get(entry.version)
+            if portfolio is not None:
+                return portfolio
+            if not self._labels_loaded:
+                self._labels = read_labels(self.source)
+                self._labels_loaded = True
+            start = time.perf_counter()
+            portfolio = PortfolioScores.from_model(
+                entry.exact_model, self._matrix_source(entry.features_names), entry.features_names,
+                labels=self._labels, model_version=entry.version, chunk_size=self.chunk_size,
+            )
+            print(f"📌 Portefeuille évalué pour la version {entry.version} : "
+                  f"{len(portfolio)} clients en {time.perf_counter() - start:.1f} s")
+            self._portfolios[entry.version] = portfolio
+            while len(self._portfolios) > self.max_versions:
+                self._portfolios.pop(next(iter(self._portfolios)))
+            return portfolio
+
+    def stats(self):
+        return {
+            "versions": list(self._portfolios),
+            "n_clients": {version: len(portfolio) for version, portfolio in self._portfolios.items()},
+        }
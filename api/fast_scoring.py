@@ -0,0 +1,200 @@
+"""
+Profil de scoring rapide : features en float32 et sortie anticipée des arbres loin du seuil.
+
+Le profil rapide évalue d'abord les `num_iteration` premières itérations pour tous les clients. La contribution
+des itérations restantes est estimée par une constante `remaining_offset` (par défaut, sa moyenne sur les données
+d'entraînement, calculée à partir des effectifs des feuilles ; sinon calibrée sur un échantillon avec `calibrate`) :
+- si le score estimé (score partiel + `remaining_offset`) est à plus de `exit_margin` du seuil optimal, en unités
+  de score brut (logit), le client sort de façon anticipée avec la probabilité estimée ;
+- sinon, les itérations restantes sont évaluées : sa probabilité est exactement celle du modèle complet.
+
+Une fraction `audit_rate` des sorties anticipées est aussi évaluée par le modèle complet pour mesurer
+l'accord en production (`/fast_profile/stats`), ainsi que la contribution moyenne observée des itérations
+restantes. Seul le trafic servi (`/predict`, `/predict/batch`) passe par ce profil : le scoring interne
+(portefeuille de `/policy/what_if`, clients similaires) utilise le modèle complet (`ModelEntry.exact_model`). L'accord et le gain de latence hors ligne sont mesurés par `benchmarks/bench_fast_profile.py`.
+"""
+import threading
+
+import numpy as np
+
+from tree_engine import objective_sigmoid
+
+# Profils de scoring : modèle complet en float64, ou profil rapide
+SCORING_PROFILES = ("full", "fast")
+
+
+class EarlyExitClassifier:
+    """
+    Adaptateur exposant `predict_proba` (même interface que `BoosterClassifier`) avec sortie anticipée.
+
+    - `model` : modèle chargé (`BoosterClassifier` ou `CompiledTreeClassifier`).
+    - `num_iteration` : itérations évaluées pour tous les clients (au plus le nombre d'itérations du modèle).
+    - `exit_margin` : écart minimal (score brut) entre le score estimé et le seuil pour une sortie anticipée.
+    - `remaining_offset` : contribution estimée des itérations restantes (None : moyenne sur l'entraînement).
+    - `audit_rate` : proportion des sorties anticipées recalculées avec le modèle complet (mesure de l'accord).
+    """
+
+    def __init__(self, model, optimal_threshold, num_iteration=60, exit_margin=0.3, remaining_offset=None,
+                 audit_rate=0.01):
+        self.model = model
+        self.booster_ = model.booster_
+        self.optimal_threshold = optimal_threshold
+        dump = self.booster_.dump_model()
+        self.sigmoid = objective_sigmoid(dump)
+        self.n_iterations = len(dump["tree_info"])
+        self.num_iteration = min(num_iteration, self.n_iterations)
+        # Seuil optimal exprimé en score brut
+        self.raw_threshold = np.log(optimal_threshold / (1 - optimal_threshold)) / self.sigmoid
+        if remaining_offset is None:
+            remaining_offset = expected_tree_scores(dump)[self.num_iteration:].sum()
+        self.remaining_offset = float(remaining_offset)
+        self.exit_margin = exit_margin
+        self.audit_rate = audit_rate
+        # Échantillonnage systématique : une sortie anticipée sur `_audit_period` est auditée
+        self._audit_period = max(1, round(1 / audit_rate)) if audit_rate else 0
+        self._lock = threading.Lock()
+        if getattr(model, "_early_exit_kernel", None) is not None:
+            # Compilation immédiate du parcours avec sortie anticipée pour les entrées float32
+            model.predict_proba_early_exit(np.zeros((1, self.booster_.num_feature()), dtype=np.float32),
+                                           self.num_iteration, self.remaining_offset, self.raw_threshold, exit_margin)
+        self.reset_stats()
+
+    @property
+    def num_threads(self):
+        return self.model.num_threads
+
+    @num_threads.setter
+    def num_threads(self, value):
+        self.model.num_threads = value
+
+    def raw_score(self, input_matrix, start_iteration=0, num_iteration=None):
+        """
+        Score brut des itérations [start_iteration, start_iteration + num_iteration) (jusqu'à la dernière par défaut).
+        """
+        num_iteration = num_iteration or self.n_iterations - start_iteration
+        if hasattr(self.model, "predict_raw"):
+            return self.model.predict_raw(input_matrix, start_iteration, num_iteration)
+        kwargs = {"num_threads": self.model.num_threads} if self.model.num_threads else {}
+        return self.booster_.predict(input_matrix, raw_score=True, start_iteration=start_iteration,
+                                     num_iteration=num_iteration, **kwargs)
+
+    def probabilities(self, raw_scores):
+        return 1.0 / (1.0 + np.exp(-self.sigmoid * raw_scores))
+
+    def calibrate(self, input_matrix):
+        """
+        Calibre `remaining_offset` sur un échantillon de clients (contribution moyenne des itérations restantes).
+        """
+        input_matrix = np.asarray(input_matrix, dtype=np.float32)
+        if self.num_iteration < self.n_iterations and len(input_matrix):
+            self.remaining_offset = float(np.mean(self.raw_score(input_matrix, self.num_iteration)))
+        return self.remaining_offset
+
+    def predict_proba(self, input_matrix):
+        input_matrix = np.asarray(input_matrix, dtype=np.float32)
+        if getattr(self.model, "_early_exit_kernel", None) is not None:
+            # Moteur compilé : sortie anticipée dans le parcours des arbres, sans appel supplémentaire
+            probabilities, early = self.model.predict_proba_early_exit(
+                input_matrix, self.num_iteration, self.remaining_offset, self.raw_threshold, self.exit_margin)
+            self._record(input_matrix, early, probabilities[:, 1])
+            return probabilities
+        partial_scores = self.raw_score(input_matrix, 0, self.num_iteration)
+        if self.num_iteration >= self.n_iterations:
+            raw_scores = partial_scores
+            early = np.zeros(len(raw_scores), dtype=bool)
+        else:
+            raw_scores = partial_scores + self.remaining_offset
+            # Clients proches du seuil : score complété par les itérations restantes (résultat du modèle complet)
+            early = np.abs(raw_scores - self.raw_threshold) > self.exit_margin
+            if not early.all():
+                undecided = ~early
+                raw_scores[undecided] = partial_scores[undecided] + self.raw_score(input_matrix[undecided], self.num_iteration)
+        probabilities = self.probabilities(raw_scores)
+        self._record(input_matrix, early, probabilities)
+        return np.column_stack([1 - probabilities, probabilities])
+
+    def _record(self, input_matrix, early, probabilities):
+        """
+        Met à jour les compteurs et audite un échantillon des sorties anticipées avec le modèle complet.
+        """
+        n_early = int(np.count_nonzero(early))
+        with self._lock:
+            previous_early_exits = self.early_exits
+            self.n_rows += len(probabilities)
+            self.early_exits += n_early
+        if not n_early or not self._audit_period:
+            return
+        # Sorties anticipées dont le rang global est un multiple de la période d'audit
+        first = (self._audit_period - 1 - previous_early_exits) % self._audit_period
+        if first >= n_early:
+            return
+        audit = np.flatnonzero(early)[first::self._audit_period]
+        remaining = self.raw_score(input_matrix[audit], self.num_iteration)
+        full = self.probabilities(self.raw_score(input_matrix[audit], 0, self.num_iteration) + remaining)
+        diffs = np.abs(full - probabilities[audit])
+        disagreements = int(((full > self.optimal_threshold) != (probabilities[audit] > self.optimal_threshold)).sum())
+        with self._lock:
+            self.audited += audit.size
+            self.disagreements += disagreements
+            self.sum_remaining += float(remaining.sum())
+            self.max_abs_diff = max(self.max_abs_diff, float(diffs.max()))
+
+    def reset_stats(self):
+        with self._lock:
+            self.n_rows = 0
+            self.early_exits = 0
+            self.audited = 0
+            self.disagreements = 0
+            self.max_abs_diff = 0.0
+            self.sum_remaining = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "num_iteration": self.num_iteration,
+                "n_iterations": self.n_iterations,
+                "exit_margin": self.exit_margin,
+                "remaining_offset": self.remaining_offset,
+                "rows": self.n_rows,
+                "early_exits": self.early_exits,
+                "early_exit_rate": self.early_exits / self.n_rows if self.n_rows else 0.0,
+                "audited_rows": self.audited,
+                "audit_agreement": 1 - self.disagreements / self.audited if self.audited else None,
+                "audit_max_abs_diff": self.max_abs_diff,
+                "audit_mean_remaining": self.sum_remaining / self.audited if self.audited else None,
+            }
+
+
+def expected_tree_scores(dump):
+    """
+    Contribution moyenne de chaque arbre sur les données d'entraînement (`Booster.dump_model()`) :
+    valeurs des feuilles pondérées par leurs effectifs.
+    """
+    def leaves(node):
+        if "leaf_value" in node:
+            return [(node["leaf_value"], node.get("leaf_count", 1))]
+        return leaves(node["left_child"]) + leaves(node["right_child"])
+
+    expected = []
+    for tree in dump["tree_info"]:
+        values, counts = np.array(leaves(tree["tree_structure"]), dtype=np.float64).T
+        expected.append(np.average(values, weights=counts) if counts.sum() else values.mean())
+    return np.asarray(expected)
+
+
+def compare_profiles(full_model, fast_model, input_matrix, optimal_threshold):
+    """
+    Compare le profil rapide au modèle complet (float64) sur une matrice de clients : accord des décisions
+    au seuil optimal, écarts de probabilité et proportion de sorties anticipées.
+    """
+    full = full_model.predict_proba(np.asarray(input_matrix, dtype=np.float64))[:, 1]
+    early_exits_before = fast_model.early_exits
+    fast = fast_model.predict_proba(input_matrix)[:, 1]
+    diffs = np.abs(fast - full)
+    return {
+        "rows": len(full),
+        "decision_agreement": float(np.mean((fast > optimal_threshold) == (full > optimal_threshold))),
+        "mean_abs_diff": float(diffs.mean()) if len(full) else 0.0,
+        "max_abs_diff": float(diffs.max()) if len(full) else 0.0,
+        "early_exit_rate": (fast_model.early_exits - early_exits_before) / len(full) if len(full) else 0.0,
+    }
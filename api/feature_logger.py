@@ -0,0 +1,208 @@
+"""
+Journalisation des features et des scores servis par /predict, hors du chemin de la requête.
+
+Chaque ligne scorée est ajoutée à un tampon circulaire en mémoire (opération non bloquante) ;
+un thread d'arrière-plan vide le tampon par lots dans des fichiers Parquet tournants.
+La mémoire est bornée : au-delà de `capacity` lignes en attente, les plus anciennes sont abandonnées
+(et comptées). Un taux d'échantillonnage permet de ne journaliser qu'une partie du trafic.
+
+Un fichier en cours d'écriture porte l'extension `.parquet.tmp` et n'est renommé en `.parquet`
+qu'une fois fermé : le dossier peut être lu à tout moment comme jeu de données « courant »
+(`evidently/generate-evidently-report.py`, `evidently/drift_engine.py`).
+Colonnes : `timestamp`, `model_version`, les features du modèle puis `PROBABILITY_CLASS_1`.
+"""
+import atexit
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+
+class FeatureLogger:
+    """
+    Tampon circulaire de lignes scorées, écrit en Parquet par un thread d'arrière-plan.
+
+    - `directory` : dossier des fichiers Parquet.
+    - `capacity` : nombre maximal de lignes en attente d'écriture.
+    - `sample_rate` : proportion des appels journalisés (entre 0 et 1).
+    - `flush_interval_s` / `flush_rows` : écriture périodique, ou anticipée dès `flush_rows` lignes en attente.
+    - `rotate_rows` / `rotate_s` : rotation du fichier après ce nombre de lignes ou cette durée.
+    - `max_files` : nombre de fichiers conservés (les plus anciens sont supprimés, 0 : pas de limite).
+    """
+
+    def __init__(self, directory, capacity=10000, sample_rate=1.0, flush_interval_s=5.0, flush_rows=1000,
+                 rotate_rows=100000, rotate_s=3600.0, max_files=100):
+        self.directory = Path(directory)
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self.flush_interval_s = flush_interval_s
+        self.flush_rows = flush_rows
+        self.rotate_rows = rotate_rows
+        self.rotate_s = rotate_s
+        self.max_files = max_files
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._buffer = deque()
+        self._buffered_rows = 0
+        self._writer = None
+        self._writer_path = None
+        self._writer_schema_key = None
+        self._writer_rows = 0
+        self._writer_opened_at = 0.0
+        self._file_index = 0
+        self.logged_rows = 0
+        self.sampled_out = 0
+        self.dropped_rows = 0
+        self.written_rows = 0
+        self.files_written = 0
+        self.errors = 0
+
+    def _ensure_started(self):
+        """
+        Démarre le thread d'écriture dans le processus courant.
+        Un thread ne survivant pas à un fork, il est recréé si le PID a changé (workers gunicorn).
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._reset()
+            self._pid = os.getpid()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="feature-logger", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def log(self, entry, input_matrix, probabilities):
+        """
+        Ajoute des lignes scorées (matrice n x n_features et n probabilités) au tampon, sans écriture disque.
+        La matrice est copiée : l'appelant peut réutiliser son tampon.
+        """
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += len(input_matrix)
+            return
+        self._ensure_started()
+        block = (time.time(), entry.version, tuple(entry.features_names),
+                 np.array(input_matrix, dtype=np.float64), np.asarray(probabilities, dtype=np.float64))
+        n_rows = len(block[3])
+        with self._lock:
+            self._buffer.append(block)
+            self._buffered_rows += n_rows
+            self.logged_rows += n_rows
+            # Tampon circulaire : abandon des lignes les plus anciennes au-delà de la capacité
+            while self._buffered_rows > self.capacity and len(self._buffer) > 1:
+                dropped = self._buffer.popleft()
+                self._buffered_rows -= len(dropped[3])
+                self.dropped_rows += len(dropped[3])
+            buffered_rows = self._buffered_rows
+        if buffered_rows >= self.flush_rows:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Erreur lors de l'écriture du journal des features : {e}")
+
+    def flush(self, close=False):
+        """
+        Écrit les lignes en attente dans le fichier courant (rotation si nécessaire).
+        """
+        with self._lock:
+            blocks, self._buffer = self._buffer, deque()
+            self._buffered_rows = 0
+        with self._write_lock:
+            # Regroupement des blocs consécutifs ayant la même version de modèle (même schéma)
+            start = 0
+            for index in range(1, len(blocks) + 1):
+                if index == len(blocks) or blocks[index][1:3] != blocks[start][1:3]:
+                    self._write_blocks([blocks[i] for i in range(start, index)])
+                    start = index
+            if self._writer is not None and (close or self._rotation_due()):
+                self._close_writer()
+
+    def _rotation_due(self):
+        return self._writer_rows >= self.rotate_rows or time.time() - self._writer_opened_at >= self.rotate_s
+
+    def _write_blocks(self, blocks):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        _, model_version, features_names, _, _ = blocks[0]
+        input_matrix = np.vstack([block[3] for block in blocks])
+        timestamps = np.concatenate([np.full(len(block[3]), int(block[0] * 1000), dtype=np.int64) for block in blocks])
+        columns = {
+            "timestamp": pa.array(timestamps, type=pa.timestamp("ms")),
+            "model_version": pa.array([model_version] * len(input_matrix), type=pa.string()),
+        }
+        for position, feat in enumerate(features_names):
+            columns[feat] = pa.array(input_matrix[:, position])
+        columns["PROBABILITY_CLASS_1"] = pa.array(np.concatenate([block[4] for block in blocks]))
+        table = pa.table(columns)
+
+        if self._writer is not None and (self._writer_schema_key != (model_version, features_names) or self._rotation_due()):
+            self._close_writer()
+        if self._writer is None:
+            self._file_index += 1
+            name = f"features-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._file_index:04d}.parquet"
+            self._writer_path = self.directory / name
+            self._writer = pq.ParquetWriter(str(self._writer_path) + ".tmp", table.schema)
+            self._writer_schema_key = (model_version, features_names)
+            self._writer_rows = 0
+            self._writer_opened_at = time.time()
+        self._writer.write_table(table)
+        self._writer_rows += len(input_matrix)
+        self.written_rows += len(input_matrix)
+
+    def _close_writer(self):
+        """
+        Ferme le fichier courant, le rend visible (renommage) et applique la rétention.
+        """
+        self._writer.close()
+        os.replace(str(self._writer_path) + ".tmp", self._writer_path)
+        self._writer = None
+        self.files_written += 1
+        if self.max_files > 0:
+            files = sorted(self.directory.glob("features-*.parquet"), key=lambda path: path.stat().st_mtime)
+            for path in files[:-self.max_files]:
+                path.unlink(missing_ok=True)
+
+    def close(self):
+        """
+        Écrit les lignes restantes et ferme le fichier courant (arrêt du worker).
+        """
+        if self._pid == os.getpid():
+            self.flush(close=True)
+
+    def stats(self):
+        with self._lock:
+            buffered_rows = self._buffered_rows
+        return {
+            "directory": str(self.directory),
+            "sample_rate": self.sample_rate,
+            "capacity": self.capacity,
+            "buffered_rows": buffered_rows,
+            "logged_rows": self.logged_rows,
+            "sampled_out": self.sampled_out,
+            "dropped_rows": self.dropped_rows,
+            "written_rows": self.written_rows,
+            "files_written": self.files_written,
+            "current_file": str(self._writer_path) if self._writer is not None else None,
+            "errors": self.errors,
+        }
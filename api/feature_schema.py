@@ -0,0 +1,317 @@
+"""
+Schéma des features attendues par le modèle, compilé une seule fois au chargement du modèle.
+
+Le schéma contient l'index de colonne de chaque feature, son type déclaré ("number" ou "integer")
+et la politique appliquée aux valeurs manquantes (`null` JSON). Il est utilisé pour :
+- valider un client et remplir directement une ligne float préallouée (/predict, /explain) ;
+- valider un lot de clients et remplir la matrice correspondante (/predict/batch, /explain/batch) ;
+- générer la définition `PredictionRequest` de `api/openapi.yaml`, et compléter la spécification avec les
+  endpoints de suivi du worker (`/status` et compteurs `/.../stats`).
+
+Régénération de la spécification OpenAPI après un changement de modèle :
+    python api/feature_schema.py
+"""
+import argparse
+import math
+import threading
+from pathlib import Path
+
+import numpy as np
+
+NAN_POLICIES = ("allow", "reject")
+
+
+def _monitoring_path(summary, description, properties):
+    """
+    Définition OpenAPI d'un endpoint de suivi (GET, réponse JSON du worker).
+    """
+    return {"get": {
+        "summary": summary,
+        "description": description,
+        "responses": {"200": {
+            "description": "Réponse réussie",
+            "content": {"application/json": {"schema": {"type": "object", "properties": properties}}},
+        }},
+    }}
+
+
+def _enabled():
+    return {"enabled": {"type": "boolean", "description": "Faux si la fonctionnalité est désactivée (seul champ retourné)."}}
+
+# Endpoints de suivi du worker ajoutés à la spécification par `update_openapi_file` s'ils en sont absents
+MONITORING_PATHS = {
+    "/status": _monitoring_path(
+        "État du worker",
+        "Modèle actif (version, format, moteur d'inférence, profil de scoring) et temps de démarrage mesurés.",
+        {"pid": {"type": "integer"}, "model_path": {"type": "string"}, "model_format": {"type": "string"},
+         "model_version": {"type": "string"}, "n_features": {"type": "integer"},
+         "explainer_loaded": {"type": "boolean"}, "lgbm_num_threads": {"type": "integer"},
+         "inference_backend": {"type": "string"}, "scoring_profile": {"type": "string"},
+         "startup_timings": {"type": "object"}},
+    ),
+    "/cache/stats": _monitoring_path(
+        "Compteurs du cache des prédictions",
+        "Taille, succès, échecs, évictions et invalidations du cache du worker (PREDICTION_CACHE_SIZE).",
+        {**_enabled(), "size": {"type": "integer"}, "max_size": {"type": "integer"}, "ttl_s": {"type": "number"},
+         "hits": {"type": "integer"}, "misses": {"type": "integer"}, "hit_rate": {"type": "number"},
+         "evictions": {"type": "integer"}, "invalidations": {"type": "integer"}},
+    ),
+    "/micro_batching/stats": _monitoring_path(
+        "Métriques du micro-batching",
+        "Profondeur de la file, taille réalisée des lots et temps d'attente (MICRO_BATCHING=1).",
+        {**_enabled(), "queue_depth": {"type": "integer"}, "max_queue_depth": {"type": "integer"},
+         "batches": {"type": "integer"}, "rows": {"type": "integer"}, "mean_batch_size": {"type": "number"},
+         "mean_queue_wait_ms": {"type": "number"}, "batch_size_counts": {"type": "object"}},
+    ),
+    "/feature_log/stats": _monitoring_path(
+        "Compteurs de la journalisation des features",
+        "Lignes journalisées, en attente, abandonnées et écrites (FEATURE_LOG_DIR).",
+        {**_enabled(), "buffered_rows": {"type": "integer"}, "logged_rows": {"type": "integer"},
+         "dropped_rows": {"type": "integer"}, "written_rows": {"type": "integer"},
+         "files_written": {"type": "integer"}, "errors": {"type": "integer"}},
+    ),
+    "/fast_profile/stats": _monitoring_path(
+        "Compteurs du profil de scoring rapide",
+        "Sorties anticipées et accord avec le modèle complet sur l'échantillon audité (SCORING_PROFILE=fast), "
+        "pour le trafic servi par /predict et /predict/batch.",
+        {**_enabled(), "model_version": {"type": "string"}, "rows": {"type": "integer"},
+         "early_exits": {"type": "integer"}, "early_exit_rate": {"type": "number"},
+         "audited_rows": {"type": "integer"}, "audit_agreement": {"type": "number", "nullable": True}},
+    ),
+}
+
+# Types JSON acceptés pour une feature numérique (bool est exclu volontairement)
+_NUMERIC_TYPES = (int, float)
+_NUMERIC_CLASSES = frozenset(_NUMERIC_TYPES)
+_MISSING = object()
+
+
+class FeatureSchema:
+    """
+    Schéma compilé des features : index de colonne, types déclarés et politique des valeurs manquantes.
+
+    - `features_names` : features du modèle, dans l'ordre des colonnes.
+    - `feature_types` : types déclarés par feature ("number" par défaut, ou "integer").
+    - `nan_policy` : "allow" (un `null` devient NaN, géré nativement par LightGBM) ou "reject".
+    - `dtype` : type des lignes et matrices produites (float64 par défaut).
+    """
+
+    def __init__(self, features_names, feature_types=None, nan_policy="allow", dtype=np.float64):
+        if nan_policy not in NAN_POLICIES:
+            raise ValueError(f"Politique de valeurs manquantes inconnue '{nan_policy}', valeurs possibles : {NAN_POLICIES}")
+        feature_types = feature_types or {}
+        self.features_names = list(features_names)
+        self.index = {feat: col for col, feat in enumerate(self.features_names)}
+        self.feature_types = {feat: feature_types.get(feat, "number") for feat in self.features_names}
+        self.nan_policy = nan_policy
+        self.dtype = np.dtype(dtype)
+        self._columns = [(feat, col, self.feature_types[feat] == "integer") for col, feat in enumerate(self.features_names)]
+        self._has_integer_features = any(is_integer for _, _, is_integer in self._columns)
+        self._buffers = threading.local()
+
+    @property
+    def n_features(self):
+        return len(self.features_names)
+
+    def _check_value(self, value, is_integer):
+        """
+        Retourne la valeur à stocker (float) ou lève ValueError avec un message explicite.
+        """
+        if value is None:
+            if self.nan_policy == "reject":
+                raise ValueError("valeur manquante (null) non autorisée")
+            return math.nan
+        if value.__class__ not in _NUMERIC_TYPES:
+            raise ValueError(f"type invalide ({type(value).__name__}), nombre attendu")
+        if not math.isfinite(value):
+            # NaN / Infinity sont acceptés par le parseur JSON de Flask : NaN suit la politique des valeurs manquantes
+            if math.isnan(value) and self.nan_policy == "allow":
+                return math.nan
+            raise ValueError(f"valeur non finie ({value}) non autorisée")
+        if is_integer and not float(value).is_integer():
+            raise ValueError(f"entier attendu, reçu {value}")
+        return value
+
+    def fill_row(self, record, out):
+        """
+        Valide un client (dictionnaire JSON) et remplit la ligne `out` (vecteur de taille n_features).
+        Retourne un tuple (features manquantes, erreurs de type par feature).
+        """
+        values = [record.get(feat, _MISSING) for feat in self.features_names]
+
+        # Chemin rapide : uniquement des nombres et aucun type entier à vérifier, une seule copie vers numpy
+        if not self._has_integer_features and {value.__class__ for value in values} <= _NUMERIC_CLASSES:
+            out[:] = values
+            if np.isfinite(out).all():
+                return [], {}
+            # Valeurs non finies (NaN / Infinity) : validation détaillée ci-dessous
+
+        missing_features = []
+        invalid = {}
+        for (feat, col, is_integer), value in zip(self._columns, values):
+            if value is _MISSING:
+                missing_features.append(feat)
+                continue
+            try:
+                out[col] = self._check_value(value, is_integer)
+            except ValueError as e:
+                invalid[feat] = str(e)
+        return missing_features, invalid
+
+    def row_buffer(self):
+        """
+        Retourne la ligne (1 x n_features) préallouée du thread courant.
+        """
+        buffer = getattr(self._buffers, "row", None)
+        if buffer is None:
+            buffer = self._buffers.row = np.empty((1, self.n_features), dtype=self.dtype)
+        return buffer
+
+    def build_row(self, record):
+        """
+        Valide un client et retourne un tuple (ligne (1 x n_features), erreur).
+        La ligne retournée est le tampon préalloué du thread : elle est réécrite à la requête suivante.
+        """
+        if not isinstance(record, dict):
+            return None, "Le corps de la requête doit être un objet JSON."
+        row = self.row_buffer()
+        missing_features, invalid = self.fill_row(record, row[0])
+        error = self.format_errors(missing_features, invalid)
+        return (None, error) if error else (row, None)
+
+    def build_matrix(self, payload, max_rows=None):
+        """
+        Valide un lot de clients et retourne un tuple (matrice (n x n_features), erreur).
+
+        Deux formats sont acceptés :
+        - une liste d'enregistrements clients (ou un dictionnaire {"clients": [...]}) ;
+        - un format colonnaire {feature: [valeurs...]}.
+        """
+        if isinstance(payload, dict) and "clients" in payload:
+            payload = payload["clients"]
+
+        if isinstance(payload, list):
+            n_rows = len(payload)
+        elif isinstance(payload, dict):
+            missing_features = [feat for feat in self.features_names if feat not in payload]
+            if missing_features:
+                return None, f"Features manquantes : {missing_features}"
+            columns = [payload[feat] for feat in self.features_names]
+            if not all(isinstance(column, list) for column in columns):
+                return None, "Le format colonnaire attend une liste de valeurs par feature."
+            lengths = {len(column) for column in columns}
+            if len(lengths) != 1:
+                return None, "Les colonnes du lot n'ont pas toutes la même longueur."
+            n_rows = lengths.pop()
+        else:
+            return None, "Le corps de la requête doit être une liste de clients ou un objet colonnaire."
+
+        if n_rows == 0:
+            return None, "Le lot est vide."
+        if max_rows is not None and n_rows > max_rows:
+            return None, f"Taille du lot ({n_rows}) supérieure au maximum autorisé ({max_rows})."
+
+        input_matrix = np.empty((n_rows, self.n_features), dtype=self.dtype)
+        missing = {}
+        invalid = {}
+
+        if isinstance(payload, list):
+            for index, record in enumerate(payload):
+                if not isinstance(record, dict):
+                    return None, f"L'enregistrement {index} n'est pas un objet JSON."
+                record_missing, record_invalid = self.fill_row(record, input_matrix[index])
+                if record_missing:
+                    missing[index] = record_missing
+                if record_invalid:
+                    invalid[index] = record_invalid
+            if missing:
+                return None, f"Features manquantes : {missing}"
+        else:
+            for feat, col, is_integer in self._columns:
+                column = input_matrix[:, col]
+                for index, value in enumerate(payload[feat]):
+                    try:
+                        column[index] = self._check_value(value, is_integer)
+                    except ValueError as e:
+                        invalid.setdefault(index, {})[feat] = str(e)
+
+        if invalid:
+            return None, f"Valeurs invalides : {invalid}"
+        return input_matrix, None
+
+    @staticmethod
+    def format_errors(missing_features, invalid):
+        """
+        Construit le message d'erreur d'un client, ou None s'il est valide.
+        """
+        if missing_features:
+            return f"Features manquantes : {missing_features}"
+        if invalid:
+            return f"Valeurs invalides : {invalid}"
+        return None
+
+    def openapi_schema(self, examples=None):
+        """
+        Retourne la définition OpenAPI (dictionnaire) d'une requête de prédiction.
+        """
+        examples = examples or {}
+        properties = {}
+        for feat in self.features_names:
+            prop = {"type": self.feature_types[feat]}
+            if self.nan_policy == "allow":
+                prop["nullable"] = True
+            if feat in examples:
+                prop["example"] = examples[feat]
+            properties[feat] = prop
+        return {"type": "object", "required": list(self.features_names), "properties": properties}
+
+
+def update_openapi_file(schema, openapi_path):
+    """
+    Remplace la définition `PredictionRequest` de la spécification OpenAPI par celle du schéma et ajoute les
+    endpoints de suivi absents (`MONITORING_PATHS`). Les exemples existants sont conservés ; le reste du
+    fichier n'est pas modifié.
+    """
+    import yaml
+
+    openapi_path = Path(openapi_path)
+    content = openapi_path.read_text(encoding="utf-8")
+    spec = yaml.safe_load(content)
+    current = spec["components"]["schemas"].get("PredictionRequest", {})
+    examples = {feat: prop["example"] for feat, prop in current.get("properties", {}).items() if "example" in prop}
+
+    block = yaml.safe_dump({"PredictionRequest": schema.openapi_schema(examples)}, sort_keys=False, allow_unicode=True)
+    block = "".join(f"    {line}\n" for line in block.splitlines())
+
+    start = content.index("    PredictionRequest:\n")
+    end = content.index("\n\n    ", start) + 1
+    content = content[:start] + block + content[end:]
+
+    # Endpoints de suivi absents, ajoutés à la fin de la section `paths`
+    missing_paths = {path: definition for path, definition in MONITORING_PATHS.items() if path not in spec["paths"]}
+    if missing_paths:
+        paths_block = yaml.safe_dump(missing_paths, sort_keys=False, allow_unicode=True, width=120)
+        paths_block = "\n".join(f"  {line}" for line in paths_block.splitlines())
+        paths_block = paths_block.replace("\n  /", "\n\n  /")
+        components = content.index("\ncomponents:")
+        content = content[:components].rstrip("\n") + "\n\n" + paths_block + "\n\n" + content[components:].lstrip("\n")
+    openapi_path.write_text(content, encoding="utf-8")
+
+
+def main():
+    from model_loader import load_model_data
+
+    parser = argparse.ArgumentParser(description="Génération de la définition OpenAPI PredictionRequest à partir du modèle.")
+    parser.add_argument("--model", default=None, help="Chemin du modèle (par défaut : modèle de l'API).")
+    parser.add_argument("--openapi", default=str(Path(__file__).resolve().parent / "openapi.yaml"),
+                        help="Chemin de la spécification OpenAPI à mettre à jour.")
+    args = parser.parse_args()
+
+    model_data = load_model_data(args.model)
+    schema = FeatureSchema(model_data["features"], model_data.get("feature_types"))
+    update_openapi_file(schema, args.openapi)
+    print(f"✅ Spécification mise à jour (PredictionRequest : {schema.n_features} features, endpoints de suivi) : {args.openapi}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Instrumentation de l'API : compteurs de requêtes et d'erreurs, histogrammes de latence
+(par endpoint et par étape de traitement), exposés au format texte Prometheus par `GET /metrics`.
+
+Les métriques sont propres à chaque worker (comme `/cache/stats` ou `/micro_batching/stats`) :
+le label `pid` permet de les distinguer lorsqu'elles sont agrégées.
+
+Profilage à la demande : une requête portant l'en-tête `X-Profile: 1` reçoit en retour l'en-tête
+standard `Server-Timing` détaillant la durée de chaque étape (lisible dans les outils de
+développement du navigateur). Lorsque l'instrumentation est désactivée, les étapes sont
+enregistrées par un chronomètre vide et le coût se limite à un appel de méthode sans effet :
+seuls les histogrammes de latence sont alors absents, les compteurs de requêtes et d'erreurs restent tenus.
+"""
+import bisect
+import os
+import threading
+import time
+
+# Bornes (en secondes) des histogrammes de latence
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Quantiles estimés à partir des histogrammes et exposés pour une lecture directe de /metrics
+QUANTILES = (0.5, 0.95, 0.99)
+
+PREFIX = "scoring_api"
+
+
+class Histogram:
+    """
+    Histogramme cumulatif au sens Prometheus : nombre d'observations par borne, somme et total.
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Estime un quantile par interpolation linéaire dans la classe qui le contient
+        (même méthode que `histogram_quantile` de Prometheus).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulated = 0
+        for index, count in enumerate(self.counts):
+            if cumulated + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulated) / count
+            cumulated += count
+        return self.buckets[-1]
+
+
+class RequestTimer:
+    """
+    Chronomètre d'une requête : chaque appel à `mark(étape)` enregistre le temps écoulé depuis l'étape précédente.
+    """
+    __slots__ = ("started_at", "stages", "_last")
+
+    def __init__(self):
+        self.started_at = self._last = time.perf_counter()
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def total(self):
+        return time.perf_counter() - self.started_at
+
+    def server_timing(self):
+        """
+        Valeur de l'en-tête `Server-Timing` (durées en millisecondes).
+        """
+        parts = [f"{stage};dur={duration * 1000:.3f}" for stage, duration in self.stages]
+        parts.append(f"total;dur={self.total() * 1000:.3f}")
+        return ", ".join(parts)
+
+
+class _NullTimer:
+    """
+    Chronomètre vide utilisé lorsque l'instrumentation est désactivée.
+    """
+    __slots__ = ()
+    stages = ()
+
+    def mark(self, stage):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Registre des métriques du worker.
+
+    - `enabled` : active le chronométrage des requêtes et des étapes (sinon seul le profilage à la demande chronomètre ;
+      les compteurs de requêtes et d'erreurs sont toujours tenus).
+    - `buckets` : bornes des histogrammes de latence.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._requests = {}
+        self._errors = {}
+        self._durations = {}
+        self._stages = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def start_timer(self, force=False):
+        """
+        Retourne un chronomètre pour la requête courante, ou le chronomètre vide si l'instrumentation est désactivée.
+        """
+        return RequestTimer() if self.enabled or force else NULL_TIMER
+
+    def record(self, endpoint, method, status, timer):
+        """
+        Enregistre une requête terminée : compteurs, latence totale et durée de chaque étape
+        (histogrammes omis avec le chronomètre vide).
+        """
+        duration = None if timer is NULL_TIMER else timer.total()
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if status >= 400:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            if duration is None:
+                return
+            histogram = self._durations.get(endpoint)
+            if histogram is None:
+                histogram = self._durations[endpoint] = Histogram(self.buckets)
+            histogram.observe(duration)
+            for stage, stage_duration in timer.stages:
+                histogram = self._stages.get((endpoint, stage))
+                if histogram is None:
+                    histogram = self._stages[(endpoint, stage)] = Histogram(self.buckets)
+                histogram.observe(stage_duration)
+
+    def render(self, gauges=None):
+        """
+        Retourne les métriques au format texte Prometheus (version 0.0.4).
+        `gauges` : valeurs instantanées supplémentaires {nom: (description, {labels: valeur})}.
+        """
+        pid = str(os.getpid())
+        with self._lock:
+            requests = dict(self._requests)
+            errors = dict(self._errors)
+            durations = {endpoint: _copy(histogram) for endpoint, histogram in self._durations.items()}
+            stages = {key: _copy(histogram) for key, histogram in self._stages.items()}
+
+        lines = []
+        _header(lines, "requests_total", "counter", "Nombre de requêtes traitées.")
+        for (endpoint, method, status), value in sorted(requests.items()):
+            lines.append(_sample("requests_total", {"pid": pid, "endpoint": endpoint, "method": method, "status": status}, value))
+        _header(lines, "errors_total", "counter", "Nombre de requêtes en erreur (statut HTTP >= 400).")
+        for (endpoint, method, status), value in sorted(errors.items()):
+            lines.append(_sample("errors_total", {"pid": pid, "endpoint": endpoint, "method": method, "status": status}, value))
+
+        _header(lines, "request_duration_seconds", "histogram", "Latence des requêtes, de la réception à la réponse.")
+        for endpoint, histogram in sorted(durations.items()):
+            _histogram_lines(lines, "request_duration_seconds", {"pid": pid, "endpoint": endpoint}, histogram)
+        _header(lines, "stage_duration_seconds", "histogram", "Durée de chaque étape de traitement d'une requête.")
+        for (endpoint, stage), histogram in sorted(stages.items()):
+            _histogram_lines(lines, "stage_duration_seconds", {"pid": pid, "endpoint": endpoint, "stage": stage}, histogram)
+
+        _header(lines, "request_duration_quantile_seconds", "gauge", "Quantiles de latence estimés à partir des histogrammes.")
+        for endpoint, histogram in sorted(durations.items()):
+            for q in QUANTILES:
+                labels = {"pid": pid, "endpoint": endpoint, "quantile": str(q)}
+                lines.append(_sample("request_duration_quantile_seconds", labels, histogram.quantile(q)))
+
+        _header(lines, "uptime_seconds", "gauge", "Durée depuis le chargement de l'API.")
+        lines.append(_sample("uptime_seconds", {"pid": pid}, time.time() - self.started_at))
+        for name, (description, values) in (gauges or {}).items():
+            _header(lines, name, "gauge", description)
+            for labels, value in values.items():
+                lines.append(_sample(name, dict(labels, pid=pid), value))
+        return "\n".join(lines) + "\n"
+
+
+def _copy(histogram):
+    copy = Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.sum = histogram.sum
+    copy.count = histogram.count
+    return copy
+
+
+def _header(lines, name, metric_type, description):
+    lines.append(f"# HELP {PREFIX}_{name} {description}")
+    lines.append(f"# TYPE {PREFIX}_{name} {metric_type}")
+
+
+def _sample(name, labels, value):
+    label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+    return f"{PREFIX}_{name}{{{label_text}}} {value}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(lines, name, labels, histogram):
+    cumulated = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulated += count
+        lines.append(_sample(f"{name}_bucket", dict(labels, le=repr(float(bound))), cumulated))
+    lines.append(_sample(f"{name}_bucket", dict(labels, le="+Inf"), histogram.count))
+    lines.append(_sample(f"{name}_sum", labels, histogram.sum))
+    lines.append(_sample(f"{name}_count", labels, histogram.count))
@@ -0,0 +1,159 @@
+"""
+Ordonnanceur de micro-batching pour le endpoint /predict.
+
+Les requêtes unitaires concurrentes d'un même worker sont mises en file d'attente
+pendant quelques millisecondes (ou jusqu'à N lignes), puis scorées en un seul appel
+vectorisé au modèle. Chaque appelant récupère ensuite la probabilité de sa propre ligne.
+
+Chaque ligne peut désigner son groupe (par exemple la version du modèle résolue par la requête) :
+les lignes d'un lot sont scorées par groupe, sans que le modèle soit résolu à nouveau au moment du scoring.
+"""
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class _PendingRow:
+    """
+    Ligne en attente de scoring, avec l'évènement permettant de réveiller l'appelant.
+    """
+    __slots__ = ("row", "group", "enqueued_at", "event", "result", "error")
+
+    def __init__(self, row, group=None):
+        self.row = row
+        self.group = group
+        self.enqueued_at = time.perf_counter()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Regroupe les lignes soumises par des threads concurrents et les score par lots.
+
+    - `predict_fn` : fonction prenant une matrice (n, n_features), et le groupe des lignes s'il est fourni à
+      `submit`, et retournant n probabilités.
+    - `max_batch_size` : nombre maximal de lignes par lot.
+    - `max_wait_ms` : délai maximal d'attente après la première ligne d'un lot.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, timeout_s=10.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.timeout_s = timeout_s
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._n_batches = 0
+        self._n_rows = 0
+        self._max_queue_depth = 0
+        self._total_wait_s = 0.0
+        self._batch_size_counts = {}
+
+    def _ensure_started(self):
+        """
+        Démarre le thread de scoring dans le processus courant.
+        Un thread ne survivant pas à un fork, il est recréé si le PID a changé (workers gunicorn).
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._stats_lock = threading.Lock()
+            self._reset_stats()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, row, group=None):
+        """
+        Soumet une ligne (vecteur de features) et bloque jusqu'à l'obtention de sa probabilité.
+        Les lignes d'un même `group` sont scorées ensemble par `predict_fn(matrice, group)`.
+        """
+        self._ensure_started()
+        pending = _PendingRow(row, group)
+        self._queue.put(pending)
+
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+
+        if not pending.event.wait(self.timeout_s):
+            raise TimeoutError("Délai dépassé lors de l'attente du micro-batch.")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect_batch(self):
+        """
+        Attend une première ligne, puis complète le lot jusqu'à la taille maximale ou l'expiration du délai.
+        """
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            collected = self._collect_batch()
+            # Un appel au modèle par groupe, dans l'ordre d'arrivée de la première ligne de chaque groupe
+            groups = {}
+            for pending in collected:
+                groups.setdefault(pending.group, []).append(pending)
+            for group, batch in groups.items():
+                self._score(group, batch)
+
+    def _score(self, group, batch):
+        started_at = time.perf_counter()
+        try:
+            input_matrix = np.vstack([pending.row for pending in batch])
+            probabilities = self.predict_fn(input_matrix) if group is None else self.predict_fn(input_matrix, group)
+            for pending, proba in zip(batch, probabilities):
+                pending.result = float(proba)
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        finally:
+            for pending in batch:
+                pending.event.set()
+
+        with self._stats_lock:
+            self._n_batches += 1
+            self._n_rows += len(batch)
+            self._total_wait_s += sum(started_at - pending.enqueued_at for pending in batch)
+            self._batch_size_counts[len(batch)] = self._batch_size_counts.get(len(batch), 0) + 1
+
+    def stats(self):
+        """
+        Retourne les métriques de la file : profondeur, taille réalisée des lots et temps d'attente.
+        """
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_s * 1000.0,
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._n_batches,
+                "rows": self._n_rows,
+                "mean_batch_size": self._n_rows / self._n_batches if self._n_batches else 0.0,
+                "mean_queue_wait_ms": 1000.0 * self._total_wait_s / self._n_rows if self._n_rows else 0.0,
+                "batch_size_counts": {str(size): count for size, count in sorted(self._batch_size_counts.items())},
+            }
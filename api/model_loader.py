@@ -0,0 +1,172 @@
+"""
+Chargement du modèle de scoring, au format pickle historique ou au format compact.
+
+Format compact : booster LightGBM natif au format texte (`<nom>.txt`) accompagné d'un fichier
+JSON (`<nom>.json`) contenant les métadonnées (`features`, `optimal_threshold`). Ce format ne
+dépend pas de la version de scikit-learn utilisée lors de l'entraînement et n'exécute pas de code
+au chargement, contrairement à pickle.
+
+Dans les deux cas, le modèle est exposé sous la forme d'un `BoosterClassifier` : un adaptateur léger
+autour du booster LightGBM, qui évite la validation scikit-learn de `LGBMClassifier.predict_proba`
+à chaque appel.
+
+Conversion d'un modèle pickle vers le format compact :
+    python api/model_loader.py models/lgbm_final_model.pkl
+"""
+import argparse
+import hashlib
+import json
+import pickle
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+models_dir = base_dir / "models"
+
+# Classes retournées selon la position de la probabilité par rapport à la zone grise [seuil - marge, seuil + marge]
+CLASS_RELIABLE = "Classe_0 (fiable)"
+CLASS_RISKY = "Classe_1 (risqué)"
+CLASS_UNCERTAIN = "Zone grise (incertain)"
+
+# Moteurs d'inférence : LightGBM natif, ou arbres exportés évalués par numba / NumPy (voir tree_engine.py)
+INFERENCE_BACKENDS = ("lightgbm", "numba", "numpy")
+
+
+class BoosterClassifier:
+    """
+    Adaptateur exposant `predict_proba` autour d'un booster LightGBM binaire.
+    `num_threads` limite les threads OpenMP utilisés par prédiction (0 : valeur par défaut de LightGBM).
+    """
+
+    def __init__(self, booster, num_threads=0):
+        self.booster_ = booster
+        self.num_threads = num_threads
+
+    def predict_proba(self, input_matrix):
+        if self.num_threads:
+            probabilities = self.booster_.predict(input_matrix, num_threads=self.num_threads)
+        else:
+            probabilities = self.booster_.predict(input_matrix)
+        return np.column_stack([1 - probabilities, probabilities])
+
+
+def classify_probability(prediction_proba, lower_bound, upper_bound):
+    """
+    Retourne la classe associée à une probabilité selon les bornes de la zone grise.
+    """
+    if prediction_proba < lower_bound:
+        return CLASS_RELIABLE
+    elif prediction_proba > upper_bound:
+        return CLASS_RISKY
+    return CLASS_UNCERTAIN
+
+
+def classify_probabilities(probabilities, lower_bound, upper_bound):
+    """
+    Version vectorisée de `classify_probability` : retourne un tableau de classes.
+    """
+    return np.where(probabilities < lower_bound, CLASS_RELIABLE,
+                    np.where(probabilities > upper_bound, CLASS_RISKY, CLASS_UNCERTAIN))
+
+
+def default_model_path():
+    """
+    Retourne l'artefact chargé par défaut : le format compact s'il existe, sinon le pickle historique.
+    """
+    compact_path = models_dir / "lgbm_final_model.txt"
+    return compact_path if compact_path.exists() else models_dir / "lgbm_final_model.pkl"
+
+
+def artifact_version(model_path):
+    """
+    Version d'un artefact : empreinte courte (SHA-256) du contenu du fichier du modèle.
+    """
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def load_model_data(model_path=None, backend="lightgbm"):
+    """
+    Charge un modèle (pickle ou format compact) et retourne un dictionnaire
+    {"model", "features", "feature_types", "optimal_threshold", "format", "version", "backend", "fast_profile"}.
+    `backend` choisit le moteur d'inférence de `predict_proba` (voir INFERENCE_BACKENDS).
+    """
+    model_path = Path(model_path) if model_path is not None else default_model_path()
+
+    if model_path.suffix == ".txt":
+        with open(model_path.with_suffix(".json"), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        booster = lgb.Booster(model_file=str(model_path))
+        model_format = "lightgbm-text"
+    else:
+        with open(model_path, "rb") as f:
+            metadata = pickle.load(f)
+        if not isinstance(metadata, dict) or "model" not in metadata:
+            raise ValueError("Le fichier Pickle ne contient pas la clé 'model'.")
+        booster = getattr(metadata["model"], "booster_", metadata["model"])
+        model_format = "pickle"
+
+    if "optimal_threshold" not in metadata:
+        raise ValueError(f"Le modèle '{model_path.name}' ne contient pas la clé 'optimal_threshold'.")
+
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Moteur d'inférence inconnu : {backend} (choix possibles : {', '.join(INFERENCE_BACKENDS)})")
+    if backend == "lightgbm":
+        model = BoosterClassifier(booster)
+    else:
+        # Import différé : numba n'est chargé que si le moteur compilé est demandé
+        from tree_engine import CompiledTreeClassifier
+
+        model = CompiledTreeClassifier(booster, engine=backend)
+
+    return {
+        "model": model,
+        # Les anciens artefacts ne stockent pas la liste des features : elle est lue dans le booster
+        "features": list(metadata.get("features") or booster.feature_name()),
+        # Types déclarés des features (optionnel, "number" par défaut)
+        "feature_types": metadata.get("feature_types"),
+        "optimal_threshold": float(metadata["optimal_threshold"]),
+        "format": model_format,
+        "version": artifact_version(model_path),
+        "backend": backend,
+        # Calibration du profil de scoring rapide (optionnel, voir fast_scoring.py)
+        "fast_profile": metadata.get("fast_profile"),
+    }
+
+
+def export_compact_artifact(pickle_path, output_path=None):
+    """
+    Convertit un modèle pickle vers le format compact (booster texte + métadonnées JSON).
+    Retourne le chemin du booster texte.
+    """
+    pickle_path = Path(pickle_path)
+    output_path = Path(output_path) if output_path is not None else pickle_path.with_suffix(".txt")
+    model_data = load_model_data(pickle_path)
+
+    model_data["model"].booster_.save_model(str(output_path))
+    metadata = {
+        "features": model_data["features"],
+        "optimal_threshold": model_data["optimal_threshold"],
+    }
+    with open(output_path.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion d'un modèle pickle vers le format compact LightGBM.")
+    parser.add_argument("pickle_path", help="Chemin du modèle pickle à convertir.")
+    parser.add_argument("--output", default=None, help="Chemin du booster texte (par défaut : même nom en .txt).")
+    args = parser.parse_args()
+
+    output_path = export_compact_artifact(args.pickle_path, args.output)
+    print(f"✅ Modèle compact exporté : {output_path} (+ {output_path.with_suffix('.json').name})")
+
+
+if __name__ == "__main__":
+    main()
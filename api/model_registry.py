@@ -0,0 +1,303 @@
+"""
+Registre versionné des modèles chargés par le processus de l'API.
+
+Le registre est conçu pour être rempli une seule fois dans le processus maître de Gunicorn
+(`preload_app`), puis partagé en copie sur écriture par les workers forkés : le booster LightGBM
+et l'explainer SHAP ne sont alors présents qu'une fois en mémoire physique.
+
+Après un fork, seuls les objets propres au processus (verrous, thread de surveillance) sont recréés
+via `after_fork()`, appelé par le hook `post_fork` de `gunicorn.conf.py`.
+
+Rechargement à chaud : chaque worker surveille le fichier du modèle actif. Lorsqu'il change, la
+nouvelle version est chargée en arrière-plan, préchauffée par quelques prédictions, puis substituée
+atomiquement à l'ancienne. Les requêtes en cours conservent leur référence à l'ancienne version, qui
+reste disponible (épinglage par version) dans la limite de `max_versions`. Le préchauffage n'est
+jamais exécuté dans le maître : LightGBM initialiserait OpenMP avant le fork des workers.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from fast_scoring import SCORING_PROFILES, EarlyExitClassifier
+from feature_schema import FeatureSchema
+from model_loader import load_model_data
+
+
+class UnknownModelVersion(KeyError):
+    """
+    Version de modèle demandée absente du registre.
+    """
+
+
+def artifact_signature(path):
+    """
+    Signature (date de modification, taille) du fichier du modèle et de ses métadonnées éventuelles.
+    """
+    path = Path(path)
+    files = [path, path.with_suffix(".json")] if path.suffix == ".txt" else [path]
+    return tuple((f.stat().st_mtime_ns, f.stat().st_size) for f in files if f.exists())
+
+
+class ModelEntry:
+    """
+    Modèle chargé : booster, schéma des features, seuil optimal et explainer SHAP construit à la demande.
+    """
+
+    def __init__(self, path, model_data, nan_policy="allow"):
+        self.path = str(path)
+        self.name = Path(path).name
+        self.model = model_data["model"]
+        # Modèle complet (sans sortie anticipée) pour le scoring interne : portefeuille, clients similaires
+        self.exact_model = model_data.get("exact_model", self.model)
+        self.features_names = model_data["features"]
+        self.optimal_threshold = model_data["optimal_threshold"]
+        self.format = model_data["format"]
+        self.backend = model_data.get("backend", "lightgbm")
+        self.profile = model_data.get("profile", "full")
+        self.version = model_data["version"]
+        # Profil rapide : lignes et matrices de features en float32
+        self.schema = FeatureSchema(self.features_names, model_data.get("feature_types"), nan_policy=nan_policy,
+                                    dtype=np.float32 if self.profile == "fast" else np.float64)
+        self.signature = artifact_signature(path)
+        self.loaded_at = time.time()
+        self.explainer = None
+        self.explainer_load_s = None
+        self._explainer_lock = threading.Lock()
+
+    def get_explainer(self):
+        """
+        Retourne l'explainer SHAP du modèle, construit au premier appel puis mis en cache.
+        """
+        if self.explainer is None:
+            with self._explainer_lock:
+                if self.explainer is None:
+                    # Import différé : shap est lourd et n'est pas nécessaire pour /predict
+                    import shap
+
+                    explainer_begin = time.perf_counter()
+                    self.explainer = shap.TreeExplainer(self.model.booster_)
+                    self.explainer_load_s = time.perf_counter() - explainer_begin
+                    print("✅ Explainer SHAP initialisé.")
+        return self.explainer
+
+    def warm_up(self, n_rows=4):
+        """
+        Préchauffe le modèle par quelques prédictions factices (valeurs nulles et manquantes).
+        """
+        dummy = np.zeros((n_rows, len(self.features_names)), dtype=self.schema.dtype)
+        dummy[n_rows // 2:] = np.nan
+        self.model.predict_proba(dummy[:1])
+        self.model.predict_proba(dummy)
+        if self.profile == "fast":
+            # Les prédictions factices ne sont pas du trafic servi
+            self.model.reset_stats()
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "path": self.path,
+            "format": self.format,
+            "inference_backend": self.backend,
+            "scoring_profile": self.profile,
+            "n_features": len(self.features_names),
+            "optimal_threshold": self.optimal_threshold,
+            "loaded_at": self.loaded_at,
+            "explainer_loaded": self.explainer is not None,
+        }
+
+    def after_fork(self):
+        self._explainer_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Registre des versions de modèles du processus, indexées par version (empreinte du fichier).
+
+    Une version peut être désignée par son empreinte ou par le nom de son fichier
+    (par exemple "lgbm_model.pkl") ; le nom désigne alors la version la plus récente de ce fichier.
+    """
+
+    def __init__(self, num_threads=0, nan_policy="allow", max_versions=3, backend="lightgbm", profile="full",
+                 fast_options=None):
+        self.num_threads = num_threads
+        self.nan_policy = nan_policy
+        self.backend = backend
+        self.profile = profile
+        self.fast_options = fast_options or {}
+        self.max_versions = max_versions
+        self._entries = {}
+        self._kept_names = set()
+        self._active = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._shadow = {"n": 0, "sum_abs_diff": 0.0, "max_abs_diff": 0.0, "class_disagreements": 0}
+        self.pid = os.getpid()
+
+    def configure(self, num_threads=0, nan_policy="allow", max_versions=3, backend="lightgbm", profile="full",
+                  fast_options=None):
+        self.num_threads = num_threads
+        self.nan_policy = nan_policy
+        self.backend = backend
+        self.profile = profile
+        self.fast_options = fast_options or {}
+        self.max_versions = max_versions
+
+    def load(self, path, activate=False, warm_up=False):
+        """
+        Charge un modèle et l'enregistre. Le premier modèle chargé devient le modèle actif ;
+        `activate=True` substitue atomiquement la nouvelle version à la version active.
+        """
+        if self.profile not in SCORING_PROFILES:
+            raise ValueError(f"Profil de scoring inconnu : {self.profile} (choix possibles : {', '.join(SCORING_PROFILES)})")
+        model_data = load_model_data(path, backend=self.backend)
+        model_data["model"].num_threads = self.num_threads
+        if self.profile == "fast":
+            model_data["exact_model"] = model_data["model"]
+            model_data["model"] = self.fast_classifier(model_data)
+        model_data["profile"] = self.profile
+        entry = ModelEntry(path, model_data, nan_policy=self.nan_policy)
+        if warm_up:
+            entry.warm_up()
+
+        with self._lock:
+            self._entries[entry.version] = entry
+            if activate or self._active is None:
+                # Substitution atomique : une simple affectation de référence
+                self._active = entry
+            self._prune()
+        return entry
+
+    def fast_classifier(self, model_data):
+        """
+        Enveloppe le modèle dans le profil de scoring rapide, avec la calibration enregistrée dans les métadonnées
+        du modèle si elle correspond au nombre d'itérations configuré.
+        """
+        options = dict(self.fast_options)
+        calibration = model_data.get("fast_profile") or {}
+        num_iteration = options.get("num_iteration", 60)
+        if calibration.get("num_iteration") == num_iteration and "remaining_offset" not in options:
+            options["remaining_offset"] = calibration["remaining_offset"]
+        return EarlyExitClassifier(model_data["model"], model_data["optimal_threshold"], **options)
+
+    def keep(self, name):
+        """
+        Conserve toujours la dernière version du fichier `name` (modèles chargés pour l'épinglage).
+        """
+        self._kept_names.add(name)
+
+    def _prune(self):
+        """
+        Supprime les versions les plus anciennes au-delà de `max_versions`
+        (hors version active et dernières versions des modèles conservés).
+        """
+        protected = {self._active.version}
+        for name in self._kept_names:
+            latest = self._latest_by_name(name)
+            if latest is not None:
+                protected.add(latest.version)
+        candidates = sorted(
+            (entry for entry in self._entries.values() if entry.version not in protected),
+            key=lambda entry: entry.loaded_at,
+        )
+        while candidates and len(self._entries) > self.max_versions:
+            del self._entries[candidates.pop(0).version]
+
+    def _latest_by_name(self, name):
+        matches = [entry for entry in self._entries.values() if entry.name == name]
+        return max(matches, key=lambda entry: entry.loaded_at) if matches else None
+
+    def active(self):
+        return self._active
+
+    def get(self, version=None):
+        """
+        Retourne la version demandée (empreinte ou nom de fichier), ou la version active si `version` est vide.
+        Lève UnknownModelVersion si la version est inconnue.
+        """
+        if not version:
+            return self._active
+        entry = self._entries.get(version)
+        if entry is None:
+            entry = self._active if self._active.name == version else self._latest_by_name(version)
+        if entry is None:
+            raise UnknownModelVersion(version)
+        return entry
+
+    def versions(self):
+        return [dict(entry.describe(), active=entry is self._active) for entry in list(self._entries.values())]
+
+    def reload(self, path=None):
+        """
+        Recharge le fichier du modèle actif (ou `path`), le préchauffe et l'active.
+        Retourne la nouvelle version, ou la version active si le fichier n'a pas changé.
+        """
+        with self._reload_lock:
+            path = str(path or self._active.path)
+            if path == self._active.path and artifact_signature(path) == self._active.signature:
+                return self._active
+            entry = self.load(path, activate=True, warm_up=True)
+            print(f"🔄 Modèle rechargé : {entry.name} (version {entry.version})")
+            return entry
+
+    def start_watcher(self, interval_s):
+        """
+        Démarre (une fois par processus) la surveillance du fichier du modèle actif.
+        Le rechargement a lieu dans ce thread : les requêtes continuent d'être servies par l'ancienne version.
+        """
+        if interval_s <= 0 or self._watcher is not None:
+            return
+        with self._lock:
+            if self._watcher is not None:
+                return
+
+            def watch():
+                while True:
+                    time.sleep(interval_s)
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        print(f"❌ Erreur lors du rechargement du modèle : {e}")
+
+            self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def record_shadow(self, primary_proba, shadow_proba, threshold):
+        """
+        Enregistre l'écart entre la prédiction servie et celle du modèle fantôme (shadow scoring).
+        """
+        diff = abs(primary_proba - shadow_proba)
+        with self._lock:
+            self._shadow["n"] += 1
+            self._shadow["sum_abs_diff"] += diff
+            self._shadow["max_abs_diff"] = max(self._shadow["max_abs_diff"], diff)
+            self._shadow["class_disagreements"] += int((primary_proba > threshold) != (shadow_proba > threshold))
+
+    def shadow_stats(self):
+        n = self._shadow["n"]
+        return {
+            "n": n,
+            "mean_abs_diff": self._shadow["sum_abs_diff"] / n if n else 0.0,
+            "max_abs_diff": self._shadow["max_abs_diff"],
+            "class_disagreements": self._shadow["class_disagreements"],
+        }
+
+    def after_fork(self):
+        """
+        Réinitialise l'état propre au processus dans un worker fraîchement forké.
+        Les modèles eux-mêmes sont conservés : leurs pages mémoire restent partagées avec le maître.
+        """
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self.pid = os.getpid()
+        for entry in self._entries.values():
+            entry.after_fork()
+
+
+# Registre unique du processus
+registry = ModelRegistry()
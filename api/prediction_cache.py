@@ -0,0 +1,97 @@
+"""
+Cache en mémoire des prédictions (LRU + durée de vie), propre à chaque worker.
+
+La clé est l'empreinte du vecteur de features canonique (ligne au type du schéma, float64 par défaut,
+dans l'ordre des colonnes du modèle, quel que soit l'ordre des clés JSON) et de la version du modèle :
+un client re-scoré à l'identique (relances Streamlit, retries des partenaires) ne rappelle pas `predict_proba`.
+Un client envoyé au format float32 (`binary_codec.py`) n'a la même clé que sa version JSON que si toutes ses
+valeurs sont exactement représentables en float32 (sinon, ses valeurs et donc sa clé sont arrondies).
+Le cache est vidé automatiquement lorsque la version du modèle servi change.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Cache LRU avec durée de vie des probabilités prédites.
+
+    - `max_size` : nombre maximal d'entrées (les moins récemment utilisées sont évincées).
+    - `ttl_s` : durée de vie d'une entrée en secondes (0 : pas d'expiration).
+    """
+
+    def __init__(self, max_size=10000, ttl_s=300.0):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(row, model_version):
+        """
+        Empreinte du vecteur de features canonique et de la version du modèle.
+        """
+        # `+ 0.0` normalise -0.0 en 0.0 pour que deux clients identiques aient la même clé
+        canonical = (row + 0.0).tobytes()
+        return hashlib.blake2b(model_version.encode() + b"|" + canonical, digest_size=16).digest()
+
+    def check_model_version(self, model_version):
+        """
+        Vide le cache si la version du modèle servi a changé depuis le dernier appel.
+        """
+        if model_version != self._model_version:
+            with self._lock:
+                if model_version != self._model_version:
+                    if self._entries:
+                        self.invalidations += 1
+                    self._entries.clear()
+                    self._model_version = model_version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl_s if self.ttl_s else 0.0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            "model_version": self._model_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
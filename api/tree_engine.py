@@ -0,0 +1,280 @@
+"""
+Moteur d'inférence compilé pour les modèles LightGBM binaires.
+
+Pour un seul client, `Booster.predict` passe l'essentiel de son temps hors de l'évaluation des arbres
+(conversion de l'entrée, appel de la bibliothèque C, allocation des sorties). Ce module exporte une fois
+les arbres du booster (`dump_model`) dans des tableaux NumPy aplatis (feature, seuil, enfants, valeurs
+des feuilles, traitement des valeurs manquantes), puis les évalue :
+- "numba" : parcours compilé à la volée (JIT), sans allocation par arbre ; le GIL est libéré pendant le calcul ;
+- "numpy" : parcours vectorisé niveau par niveau sur tous les arbres et toutes les lignes (sans numba).
+
+Les règles de LightGBM sont reproduites à l'identique : comparaison `valeur <= seuil` en double précision,
+branche par défaut pour les valeurs manquantes (`missing_type` NaN ou Zero), valeur manquante remplacée
+par 0 si l'arbre ne les gère pas. Les splits catégoriels et les arbres linéaires ne sont pas pris en charge.
+
+Parité numérique et mesures : `tests/test_tree_engine.py` et `benchmarks/bench_tree_engine.py`.
+"""
+import numpy as np
+
+ENGINES = ("numba", "numpy")
+
+# Types de valeurs manquantes de LightGBM
+_MISSING_NONE, _MISSING_ZERO, _MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {"None": _MISSING_NONE, "Zero": _MISSING_ZERO, "NaN": _MISSING_NAN}
+
+# Seuil en dessous duquel LightGBM considère une valeur comme nulle (kZeroThreshold)
+_ZERO_THRESHOLD = 1e-35
+
+
+def objective_sigmoid(dump):
+    """
+    Paramètre `sigmoid` de l'objectif binaire d'un modèle (`Booster.dump_model()`) : probabilité = 1 / (1 + exp(-sigmoid * score)).
+    Lève ValueError pour un modèle non binaire.
+    """
+    objective = dump.get("objective", "")
+    if dump.get("num_class", 1) != 1 or not objective.startswith("binary"):
+        raise ValueError(f"Modèle non pris en charge (objectif : {objective!r}) : seuls les modèles binaires le sont.")
+    sigmoid = 1.0
+    for param in objective.split()[1:]:
+        if param.startswith("sigmoid:"):
+            sigmoid = float(param.split(":")[1])
+    return sigmoid
+
+
+class TreeEnsemble:
+    """
+    Arbres d'un booster LightGBM aplatis en tableaux : un nœud par indice, feuilles repérées par `feature == -1`.
+    """
+
+    def __init__(self, feature, threshold, left, right, default_left, missing_type, value, roots, max_depth, sigmoid):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.missing_type = missing_type
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.sigmoid = sigmoid
+
+    @classmethod
+    def from_booster(cls, booster):
+        dump = booster.dump_model()
+        sigmoid = objective_sigmoid(dump)
+
+        nodes = {name: [] for name in ("feature", "threshold", "left", "right", "default_left", "missing_type", "value")}
+        roots = []
+        max_depth = 0
+
+        def add_node(node, depth):
+            nonlocal max_depth
+            index = len(nodes["feature"])
+            for values in nodes.values():
+                values.append(0)
+            if "leaf_value" in node:
+                if "leaf_coeff" in node:
+                    raise ValueError("Les arbres linéaires ne sont pas pris en charge par le moteur compilé.")
+                nodes["feature"][index] = -1
+                nodes["value"][index] = node["leaf_value"]
+                max_depth = max(max_depth, depth)
+                return index
+            if node["decision_type"] != "<=":
+                raise ValueError("Les splits catégoriels ne sont pas pris en charge par le moteur compilé.")
+            nodes["feature"][index] = node["split_feature"]
+            nodes["threshold"][index] = node["threshold"]
+            nodes["default_left"][index] = node["default_left"]
+            nodes["missing_type"][index] = _MISSING_TYPES[node["missing_type"]]
+            nodes["left"][index] = add_node(node["left_child"], depth + 1)
+            nodes["right"][index] = add_node(node["right_child"], depth + 1)
+            return index
+
+        for tree in dump["tree_info"]:
+            roots.append(add_node(tree["tree_structure"], 0))
+
+        return cls(
+            feature=np.asarray(nodes["feature"], dtype=np.int32),
+            threshold=np.asarray(nodes["threshold"], dtype=np.float64),
+            left=np.asarray(nodes["left"], dtype=np.int32),
+            right=np.asarray(nodes["right"], dtype=np.int32),
+            default_left=np.asarray(nodes["default_left"], dtype=np.bool_),
+            missing_type=np.asarray(nodes["missing_type"], dtype=np.int8),
+            value=np.asarray(nodes["value"], dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            sigmoid=sigmoid,
+        )
+
+    def arrays(self):
+        return (self.roots, self.feature, self.threshold, self.left, self.right, self.default_left,
+                self.missing_type, self.value)
+
+    def raw_score_numpy(self, input_matrix, roots=None):
+        """
+        Score brut (somme des feuilles des arbres `roots`, tous par défaut) par un parcours vectorisé :
+        tous les arbres et toutes les lignes avancent d'un niveau à chaque itération.
+        """
+        roots = self.roots if roots is None else roots
+        n_rows = input_matrix.shape[0]
+        node = np.repeat(roots[np.newaxis, :], n_rows, axis=0)
+        rows = np.arange(n_rows)[:, np.newaxis]
+        for _ in range(self.max_depth):
+            feature = self.feature[node]
+            internal = feature >= 0
+            if not internal.any():
+                break
+            values = input_matrix[rows, np.where(internal, feature, 0)]
+            missing_type = self.missing_type[node]
+            is_nan = np.isnan(values)
+            values = np.where(is_nan & (missing_type != _MISSING_NAN), 0.0, values)
+            use_default = (((missing_type == _MISSING_ZERO) & (np.abs(values) <= _ZERO_THRESHOLD))
+                           | ((missing_type == _MISSING_NAN) & is_nan))
+            go_left = np.where(use_default, self.default_left[node], values <= self.threshold[node])
+            node = np.where(internal, np.where(go_left, self.left[node], self.right[node]), node)
+        return self.value[node].sum(axis=1)
+
+
+_numba_kernels = None
+
+
+def _get_numba_kernels():
+    """
+    Compile (une fois par processus) le parcours des arbres avec numba : retourne les fonctions
+    (probabilités, score brut, probabilités avec sortie anticipée).
+    """
+    global _numba_kernels
+    if _numba_kernels is None:
+        from numba import njit
+
+        @njit(nogil=True, cache=False, inline="always")
+        def tree_sum(input_matrix, i, roots, feature, threshold, left, right, default_left, missing_type, value):
+            total = 0.0
+            for t in range(roots.shape[0]):
+                node = roots[t]
+                while feature[node] >= 0:
+                    # Valeur convertie en double, comme LightGBM (exact pour une entrée float32)
+                    fval = np.float64(input_matrix[i, feature[node]])
+                    kind = missing_type[node]
+                    if np.isnan(fval) and kind != 2:
+                        fval = 0.0
+                    if (kind == 1 and abs(fval) <= 1e-35) or (kind == 2 and np.isnan(fval)):
+                        node = left[node] if default_left[node] else right[node]
+                    elif fval <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                total += value[node]
+            return total
+
+        @njit(nogil=True, cache=False)
+        def predict_proba(input_matrix, roots, feature, threshold, left, right, default_left, missing_type, value,
+                          sigmoid, out):
+            # Probabilités écrites directement dans la sortie (n x 2) : aucune allocation intermédiaire
+            for i in range(input_matrix.shape[0]):
+                total = tree_sum(input_matrix, i, roots, feature, threshold, left, right, default_left,
+                                 missing_type, value)
+                probability = 1.0 / (1.0 + np.exp(-sigmoid * total))
+                out[i, 0] = 1.0 - probability
+                out[i, 1] = probability
+
+        @njit(nogil=True, cache=False)
+        def raw_score(input_matrix, roots, feature, threshold, left, right, default_left, missing_type, value, out):
+            for i in range(input_matrix.shape[0]):
+                out[i] = tree_sum(input_matrix, i, roots, feature, threshold, left, right, default_left,
+                                  missing_type, value)
+
+        @njit(nogil=True, cache=False)
+        def predict_proba_early_exit(input_matrix, roots, feature, threshold, left, right, default_left, missing_type,
+                                     value, num_iteration, remaining_offset, raw_threshold, exit_margin, sigmoid,
+                                     out, early):
+            # Itérations restantes évaluées seulement si le score estimé est proche du seuil (voir fast_scoring.py)
+            first_roots, last_roots = roots[:num_iteration], roots[num_iteration:]
+            for i in range(input_matrix.shape[0]):
+                total = tree_sum(input_matrix, i, first_roots, feature, threshold, left, right, default_left,
+                                 missing_type, value)
+                early[i] = last_roots.shape[0] > 0 and abs(total + remaining_offset - raw_threshold) > exit_margin
+                if early[i]:
+                    total += remaining_offset
+                else:
+                    total += tree_sum(input_matrix, i, last_roots, feature, threshold, left, right, default_left,
+                                      missing_type, value)
+                probability = 1.0 / (1.0 + np.exp(-sigmoid * total))
+                out[i, 0] = 1.0 - probability
+                out[i, 1] = probability
+
+        _numba_kernels = (predict_proba, raw_score, predict_proba_early_exit)
+    return _numba_kernels
+
+
+def numba_available():
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class CompiledTreeClassifier:
+    """
+    Adaptateur exposant `predict_proba` (même interface que `BoosterClassifier`) avec le moteur compilé.
+    Le booster LightGBM reste accessible (`booster_`) pour les explications SHAP.
+
+    - `engine` : "numba" (par défaut si numba est installé) ou "numpy".
+    - `num_threads` : conservé pour compatibilité ; chaque prédiction utilise un seul thread.
+    """
+
+    def __init__(self, booster, num_threads=0, engine=None):
+        self.booster_ = booster
+        self.num_threads = num_threads
+        self.ensemble = TreeEnsemble.from_booster(booster)
+        self.engine = engine or ("numba" if numba_available() else "numpy")
+        if self.engine not in ENGINES:
+            raise ValueError(f"Moteur inconnu : {self.engine} (choix possibles : {', '.join(ENGINES)})")
+        self._arrays = self.ensemble.arrays()
+        self._kernel, self._raw_kernel, self._early_exit_kernel = (
+            _get_numba_kernels() if self.engine == "numba" else (None, None, None))
+        if self._kernel is not None:
+            # Compilation immédiate (au chargement plutôt qu'à la première requête)
+            self.predict_proba(np.zeros((1, booster.num_feature())))
+
+    @staticmethod
+    def _as_input(input_matrix):
+        # Entrée float32 conservée telle quelle (profil rapide), sinon convertie en float64
+        if isinstance(input_matrix, np.ndarray) and input_matrix.dtype == np.float32:
+            return np.ascontiguousarray(input_matrix)
+        return np.ascontiguousarray(input_matrix, dtype=np.float64)
+
+    def predict_raw(self, input_matrix, start_iteration=0, num_iteration=None):
+        """
+        Score brut des itérations [start_iteration, start_iteration + num_iteration) (toutes par défaut),
+        comme `Booster.predict(raw_score=True, start_iteration=..., num_iteration=...)`.
+        """
+        input_matrix = self._as_input(input_matrix)
+        stop = None if not num_iteration or num_iteration <= 0 else start_iteration + num_iteration
+        roots = self.ensemble.roots[start_iteration:stop]
+        if self._raw_kernel is None:
+            return self.ensemble.raw_score_numpy(input_matrix, roots)
+        out = np.empty(input_matrix.shape[0])
+        self._raw_kernel(input_matrix, roots, *self._arrays[1:], out)
+        return out
+
+    def predict_proba_early_exit(self, input_matrix, num_iteration, remaining_offset, raw_threshold, exit_margin):
+        """
+        Probabilités avec sortie anticipée en un seul parcours compilé (moteur "numba" uniquement) :
+        retourne le tuple (probabilités n x 2, masque des sorties anticipées). Voir `fast_scoring.py`.
+        """
+        input_matrix = self._as_input(input_matrix)
+        out = np.empty((input_matrix.shape[0], 2))
+        early = np.empty(input_matrix.shape[0], dtype=np.bool_)
+        self._early_exit_kernel(input_matrix, *self._arrays, num_iteration, remaining_offset, raw_threshold,
+                                exit_margin, self.ensemble.sigmoid, out, early)
+        return out, early
+
+    def predict_proba(self, input_matrix):
+        input_matrix = self._as_input(input_matrix)
+        if self._kernel is None:
+            probabilities = 1.0 / (1.0 + np.exp(-self.ensemble.sigmoid * self.ensemble.raw_score_numpy(input_matrix)))
+            return np.column_stack([1 - probabilities, probabilities])
+        out = np.empty((input_matrix.shape[0], 2))
+        self._kernel(input_matrix, *self._arrays, self.ensemble.sigmoid, out)
+        return out
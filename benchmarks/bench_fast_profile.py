@@ -0,0 +1,110 @@
+"""
+Accord et gain de latence du profil de scoring rapide (float32 et sortie anticipée, `api/fast_scoring.py`)
+par rapport au modèle complet.
+
+La contribution des itérations restantes (`remaining_offset`) est calibrée sur les premiers clients du fichier,
+puis chaque configuration (itérations évaluées, marge de sortie) est évaluée sur les clients suivants :
+- accord des décisions au seuil optimal, écarts de probabilité et taux de sortie anticipée ;
+- latence médiane d'un appel sur 1 client et sur un lot, modèle complet (LightGBM natif et moteur compilé)
+  et profil rapide.
+
+`--save-calibration` enregistre la calibration de la première configuration dans les métadonnées du modèle
+(format compact) : elle est utilisée par l'API avec SCORING_PROFILE=fast et le même FAST_NUM_ITERATION.
+
+Utilisation :
+    python benchmarks/bench_fast_profile.py features/app_test_features.csv --num-iteration 60 --exit-margin 0.3
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir / "api"))
+sys.path.insert(0, str(base_dir / "benchmarks"))
+
+from bench_tree_engine import time_calls
+from bulk_explain import iter_feature_chunks
+from fast_scoring import EarlyExitClassifier, compare_profiles
+from model_loader import default_model_path, load_model_data
+
+
+def read_rows(source, features_names, n_rows):
+    """
+    Lit les `n_rows` premiers clients d'un fichier CSV / Parquet (matrice float64).
+    """
+    matrices, total = [], 0
+    for _, chunk_matrix in iter_feature_chunks(source, features_names, chunk_size=50000):
+        matrices.append(chunk_matrix)
+        total += len(chunk_matrix)
+        if total >= n_rows:
+            break
+    return np.vstack(matrices)[:n_rows]
+
+
+def single_row_latency(predict_proba, rows, min_time_s):
+    """
+    Latence médiane sur 1 client, moyenne sur plusieurs clients (le nombre d'arbres évalués dépend du client).
+    """
+    return float(np.mean([time_calls(predict_proba, row, min_time_s / len(rows)) for row in rows]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accord et gain de latence du profil de scoring rapide.")
+    parser.add_argument("input", help="Fichier CSV ou Parquet des clients.")
+    parser.add_argument("--model", default=str(default_model_path()), help="Modèle évalué.")
+    parser.add_argument("--num-iteration", type=int, nargs="+", default=[60], help="Itérations évaluées pour tous les clients.")
+    parser.add_argument("--exit-margin", type=float, nargs="+", default=[0.3], help="Marges de sortie anticipée (score brut).")
+    parser.add_argument("--calibration-rows", type=int, default=10000, help="Clients utilisés pour la calibration.")
+    parser.add_argument("--rows", type=int, default=50000, help="Clients utilisés pour la mesure de l'accord.")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Taille du lot pour la mesure de latence.")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Durée minimale de mesure par configuration (s).")
+    parser.add_argument("--save-calibration", action="store_true", help="Enregistre la calibration dans les métadonnées du modèle.")
+    args = parser.parse_args()
+
+    models = {backend: load_model_data(args.model, backend=backend) for backend in ("lightgbm", "numba")}
+    for model_data in models.values():
+        model_data["model"].num_threads = 1
+    model_data = models["numba"]
+    optimal_threshold = model_data["optimal_threshold"]
+    matrix = read_rows(args.input, model_data["features"], args.calibration_rows + args.rows)
+    calibration, evaluation = matrix[:args.calibration_rows], matrix[args.calibration_rows:]
+    batch = np.ascontiguousarray(evaluation[:args.batch_size])
+    rows = [np.ascontiguousarray(evaluation[i:i + 1]) for i in range(min(100, len(evaluation)))]
+    print(f"📌 {len(calibration)} clients de calibration, {len(evaluation)} clients d'évaluation, seuil {optimal_threshold:.3f}")
+
+    print(f"{'Profil':<28}{'Accord':>9}{'Sorties':>9}{'Écart max':>11}{'1 client (µs)':>15}{'Lot (ms)':>10}")
+    for backend, full_data in models.items():
+        full_model = full_data["model"]
+        print(f"{'complet (' + backend + ')':<28}{1:>9.4f}{0:>9.1%}{0:>11.1e}"
+              f"{single_row_latency(full_model.predict_proba, rows, args.min_time) * 1e6:>15.1f}"
+              f"{time_calls(full_model.predict_proba, batch, args.min_time) * 1e3:>10.1f}")
+
+    saved = False
+    for num_iteration in args.num_iteration:
+        for exit_margin in args.exit_margin:
+            fast_model = EarlyExitClassifier(model_data["model"], optimal_threshold, num_iteration=num_iteration,
+                                             exit_margin=exit_margin, audit_rate=0)
+            remaining_offset = fast_model.calibrate(calibration)
+            report = compare_profiles(models["lightgbm"]["model"], fast_model, evaluation, optimal_threshold)
+            single_s = single_row_latency(fast_model.predict_proba, [row.astype(np.float32) for row in rows], args.min_time)
+            batch_s = time_calls(fast_model.predict_proba, batch.astype(np.float32), args.min_time)
+            print(f"{f'rapide ({num_iteration} it., marge {exit_margin})':<28}{report['decision_agreement']:>9.4f}"
+                  f"{report['early_exit_rate']:>9.1%}{report['max_abs_diff']:>11.1e}{single_s * 1e6:>15.1f}{batch_s * 1e3:>10.1f}")
+
+            if args.save_calibration and not saved:
+                metadata_path = Path(args.model).with_suffix(".json")
+                if Path(args.model).suffix != ".txt":
+                    print("⚠️ Calibration non enregistrée : seul le format compact (.txt + .json) est pris en charge.")
+                else:
+                    metadata = json.loads(metadata_path.read_text(encoding="utf-8"))
+                    metadata["fast_profile"] = {"num_iteration": fast_model.num_iteration, "remaining_offset": remaining_offset}
+                    metadata_path.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+                    print(f"✅ Calibration enregistrée dans {metadata_path.name} (remaining_offset = {remaining_offset:.4f})")
+                saved = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark des modes de service WSGI (Gunicorn, workers synchrones) et ASGI (`api/asgi.py`, workers Uvicorn)
+en présence de clients lents.
+
+Des clients rapides envoient des requêtes /predict en boucle pendant que des clients lents transmettent
+un gros corps JSON octet par octet (plusieurs secondes par requête). Avec des workers synchrones, chaque
+client lent immobilise un worker ; en ASGI, la réception est asynchrone et seuls les calculs occupent
+le pool borné. Pour chaque mode sont mesurés le débit et les latences des clients rapides, sans puis
+avec clients lents, ainsi que le nombre de rejets 503 (contre-pression).
+
+Utilisation :
+    python benchmarks/bench_slow_clients.py --workers 2 --fast-clients 4 --slow-clients 2 --duration 10
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir / "api"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from load_test import synthetic_clients
+
+
+def server_command(mode, workers, port):
+    if mode == "wsgi":
+        return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers), "--threads", "1",
+                "api.app:app", "--bind", f"127.0.0.1:{port}"]
+    return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers), "-k", "uvicorn_worker.UvicornWorker",
+            "api.asgi:app", "--bind", f"127.0.0.1:{port}"]
+
+
+def start_server(mode, workers, port):
+    env = dict(os.environ, MODEL_WATCH_INTERVAL_S="0", PREDICTION_CACHE_SIZE="0", LGBM_NUM_THREADS="1")
+    process = subprocess.Popen(server_command(mode, workers, port), cwd=base_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(120):
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/status", timeout=1).status_code == 200:
+                time.sleep(2)  # Laisse le temps aux autres workers de démarrer
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Le serveur {mode} n'a pas démarré.")
+
+
+def slow_client(port, body, upload_s, stop):
+    """
+    Envoie en boucle une requête /predict dont le corps est transmis par petits morceaux pendant `upload_s` secondes.
+    """
+    chunk_size = max(1, len(body) // 50)
+    delay = upload_s / 50
+    header = (f"POST /predict HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+              f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode()
+    while not stop.is_set():
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=60) as sock:
+                sock.sendall(header)
+                for start in range(0, len(body), chunk_size):
+                    sock.sendall(body[start:start + chunk_size])
+                    time.sleep(delay)
+                while sock.recv(65536):
+                    pass
+        except OSError:
+            time.sleep(0.1)
+
+
+def fast_client(port, clients, stop, latencies, statuses):
+    session = requests.Session()
+    index = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            status = session.post(f"http://127.0.0.1:{port}/predict", json=clients[index % len(clients)], timeout=30).status_code
+        except requests.exceptions.RequestException:
+            status = 0
+        latencies.append(time.perf_counter() - start)
+        statuses.append(status)
+        index += 1
+
+
+def run_load(port, clients, n_fast, n_slow, duration_s, slow_body, upload_s):
+    stop = threading.Event()
+    latencies, statuses = [], []
+    threads = [threading.Thread(target=slow_client, args=(port, slow_body, upload_s, stop)) for _ in range(n_slow)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5 if n_slow else 0)  # Les clients lents occupent déjà le serveur
+    threads_fast = [threading.Thread(target=fast_client, args=(port, clients, stop, latencies, statuses)) for _ in range(n_fast)]
+    for thread in threads_fast:
+        thread.start()
+    time.sleep(duration_s)
+    stop.set()
+    for thread in threads_fast + threads:
+        thread.join()
+
+    statuses = np.array(statuses)
+    ok = np.array(latencies)[statuses == 200]
+    p50, p99 = np.percentile(ok, [50, 99]) * 1000 if len(ok) else (float("nan"), float("nan"))
+    return {
+        "throughput_rps": len(ok) / duration_s,
+        "p50_ms": p50,
+        "p99_ms": p99,
+        "rejected_503": int((statuses == 503).sum()),
+        "errors": int(((statuses != 200) & (statuses != 503)).sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WSGI vs ASGI en présence de clients lents.")
+    parser.add_argument("--workers", type=int, default=2, help="Workers Gunicorn (synchrones ou Uvicorn).")
+    parser.add_argument("--fast-clients", type=int, default=4, help="Clients rapides simultanés.")
+    parser.add_argument("--slow-clients", type=int, default=2, help="Clients lents simultanés.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée de chaque mesure (s).")
+    parser.add_argument("--upload-s", type=float, default=3.0, help="Durée d'envoi du corps d'un client lent (s).")
+    parser.add_argument("--body-kb", type=int, default=64, help="Taille du corps envoyé par un client lent (Ko).")
+    parser.add_argument("--port", type=int, default=8767, help="Port local utilisé pour la mesure.")
+    args = parser.parse_args()
+
+    from model_loader import load_model_data
+
+    features_names = load_model_data()["features"]
+    clients = synthetic_clients(features_names, 1000)
+    slow_record = dict(clients[0], padding=" " * (args.body_kb * 1024))
+    slow_body = json.dumps(slow_record).encode()
+
+    print(f"{'Mode':<6}{'Clients lents':>15}{'Débit (req/s)':>15}{'p50 (ms)':>11}{'p99 (ms)':>11}{'503':>7}{'Erreurs':>9}")
+    for mode in ("wsgi", "asgi"):
+        process = start_server(mode, args.workers, args.port)
+        try:
+            for n_slow in (0, args.slow_clients):
+                result = run_load(args.port, clients, args.fast_clients, n_slow, args.duration, slow_body, args.upload_s)
+                print(f"{mode:<6}{n_slow:>15}{result['throughput_rps']:>15.1f}{result['p50_ms']:>11.1f}"
+                      f"{result['p99_ms']:>11.1f}{result['rejected_503']:>7}{result['errors']:>9}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
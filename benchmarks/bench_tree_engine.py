@@ -0,0 +1,80 @@
+"""
+Benchmark des moteurs d'inférence de `predict_proba` par taille de lot (1, 100 et 10 000 clients).
+
+Moteurs comparés :
+- "sklearn" : `LGBMClassifier.predict_proba` du modèle pickle historique (validation scikit-learn comprise) ;
+- "lightgbm" : `Booster.predict` natif (moteur par défaut de l'API) ;
+- "numba" / "numpy" : arbres exportés en tableaux et évalués par `api/tree_engine.py`.
+
+Pour chaque moteur et chaque taille de lot, la latence médiane d'un appel et le débit sont reportés,
+ainsi que l'écart maximal avec les probabilités de LightGBM.
+
+Utilisation :
+    python benchmarks/bench_tree_engine.py --batch-sizes 1 100 10000
+"""
+import argparse
+import pickle
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir / "api"))
+
+from model_loader import INFERENCE_BACKENDS, load_model_data
+
+
+def time_calls(function, input_matrix, min_time_s=1.0, max_calls=100000):
+    """
+    Latence médiane (s) d'un appel, mesurée sur au moins `min_time_s` secondes.
+    """
+    function(input_matrix)
+    durations = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time_s and len(durations) < max_calls:
+        call_start = time.perf_counter()
+        function(input_matrix)
+        durations.append(time.perf_counter() - call_start)
+    return float(np.median(durations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des moteurs d'inférence par taille de lot.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10000], help="Tailles de lot mesurées.")
+    parser.add_argument("--model", default=None, help="Modèle évalué (format compact par défaut).")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Durée minimale de mesure par configuration (s).")
+    args = parser.parse_args()
+
+    models = {backend: load_model_data(args.model, backend=backend) for backend in INFERENCE_BACKENDS}
+    for model_data in models.values():
+        model_data["model"].num_threads = 1
+    predict_functions = {backend: model_data["model"].predict_proba for backend, model_data in models.items()}
+    pickle_path = base_dir / "models" / "lgbm_final_model.pkl"
+    if args.model is None and pickle_path.exists():
+        with open(pickle_path, "rb") as f:
+            sklearn_model = pickle.load(f)["model"]
+        # Avertissement scikit-learn à chaque appel sur une matrice sans noms de colonnes
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        warnings.filterwarnings("ignore", category=FutureWarning)
+        predict_functions = {"sklearn": sklearn_model.predict_proba, **predict_functions}
+
+    n_features = len(models["lightgbm"]["features"])
+    rng = np.random.default_rng(42)
+    input_matrix = rng.normal(size=(max(args.batch_sizes), n_features)) * 1000.0
+    input_matrix[rng.random(input_matrix.shape) < 0.1] = np.nan
+    reference = models["lightgbm"]["model"].predict_proba(input_matrix)[:, 1]
+
+    print(f"{'Moteur':<10}{'Lot':>8}{'Latence (µs)':>15}{'Clients/s':>14}{'Écart max':>12}")
+    for name, predict_proba in predict_functions.items():
+        max_diff = np.max(np.abs(predict_proba(input_matrix)[:, 1] - reference))
+        for batch_size in args.batch_sizes:
+            batch = np.ascontiguousarray(input_matrix[:batch_size])
+            latency_s = time_calls(predict_proba, batch, args.min_time)
+            print(f"{name:<10}{batch_size:>8}{latency_s * 1e6:>15.1f}{batch_size / latency_s:>14.0f}{max_diff:>12.1e}")
+
+
+if __name__ == "__main__":
+    main()
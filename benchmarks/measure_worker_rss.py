@@ -0,0 +1,91 @@
+"""
+Mesure de la mémoire des workers Gunicorn avec et sans préchargement du modèle (`preload_app`).
+
+Pour chaque configuration, Gunicorn est lancé localement, les endpoints /predict et /explain
+sont sollicités, puis la mémoire de chaque worker est lue dans /proc (Linux uniquement) :
+- RSS : mémoire résidente, pages partagées comprises ;
+- PSS : pages partagées réparties entre les processus qui les partagent ;
+- USS : pages privées du worker (ce qu'un worker supplémentaire coûte réellement).
+
+Utilisation :
+    python benchmarks/measure_worker_rss.py --workers 2
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir / "tests"))
+
+from test_api import SAMPLE_DATA
+
+
+def read_memory_kb(pid):
+    """
+    Retourne (RSS, PSS, USS) en Ko à partir de /proc/<pid>/smaps_rollup.
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(":")] = int(parts[1])
+    uss = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values.get("Rss", 0), values.get("Pss", 0), uss
+
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children", "r") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def measure(preload, workers, port):
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0", GUNICORN_WORKERS=str(workers),
+               PRELOAD_EXPLAINER="1")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "api.app:app", "--bind", f"127.0.0.1:{port}"],
+        cwd=base_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        for _ in range(120):
+            try:
+                requests.get(f"{url}/status", timeout=1)
+                if len(worker_pids(process.pid)) == workers:
+                    break
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.5)
+
+        # Sollicitation des endpoints pour que chaque worker touche le modèle et l'explainer
+        for _ in range(20 * workers):
+            requests.post(f"{url}/predict", json=SAMPLE_DATA)
+            requests.post(f"{url}/explain", json=SAMPLE_DATA)
+
+        return [read_memory_kb(pid) for pid in worker_pids(process.pid)]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure de la mémoire des workers Gunicorn.")
+    parser.add_argument("--workers", type=int, default=2, help="Nombre de workers Gunicorn.")
+    parser.add_argument("--port", type=int, default=8765, help="Port local utilisé pour la mesure.")
+    args = parser.parse_args()
+
+    print(f"{'Configuration':<22}{'RSS (Mo)':>10}{'PSS (Mo)':>10}{'USS (Mo)':>10}   (moyenne par worker)")
+    for preload in (False, True):
+        memory = measure(preload, args.workers, args.port)
+        rss, pss, uss = (sum(values) / len(memory) / 1024 for values in zip(*memory))
+        label = "preload_app=True" if preload else "preload_app=False"
+        print(f"{label:<22}{rss:>10.1f}{pss:>10.1f}{uss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
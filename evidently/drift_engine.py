@@ -0,0 +1,361 @@
+"""
+Moteur incrémental de détection du data drift (alternative légère au rapport Evidently complet).
+
+1. Une **référence compacte** est construite une seule fois à partir du jeu d'entraînement : pour chaque
+   feature, des bornes de classes (quantiles estimés sur un échantillon), les effectifs de chaque classe
+   et le taux de valeurs manquantes. Le fichier est lu par blocs (deux passages), sans être chargé en mémoire.
+2. Une **fenêtre courante** accumule les effectifs des mêmes classes à partir de blocs successifs
+   (fichiers CSV / Parquet, dossier de journaux Parquet) ou de requêtes /predict journalisées (JSON).
+   Les fenêtres sont additives : elles peuvent être fusionnées ou sauvegardées puis reprises.
+3. Le **rapport** compare, pour chaque feature, la distribution courante à la référence :
+   PSI (Population Stability Index, valeurs manquantes comprises) et statistique de Kolmogorov-Smirnov
+   calculée sur les fonctions de répartition aux bornes des classes. Il est produit au format JSON.
+
+Le rapport HTML Evidently complet reste disponible en option (`--html`), sur des échantillons des deux jeux.
+
+Utilisation :
+    python evidently/drift_engine.py build-reference features/app_train_features.csv reference.json
+    python evidently/drift_engine.py report reference.json features/app_test_features.csv --output drift.json
+"""
+import argparse
+import json
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Colonnes exclues de l'analyse (identifiant et cible)
+EXCLUDED_COLUMNS = ("SK_ID_CURR", "TARGET")
+
+# Seuils usuels : PSI > 0,2 (changement significatif de population), p-value KS < 0,05
+PSI_THRESHOLD = 0.2
+KS_PVALUE_THRESHOLD = 0.05
+
+# Effectif minimal utilisé à la place d'une classe vide dans le calcul du PSI
+_PSI_EPSILON = 1e-4
+
+
+def iter_chunks(source, chunk_size=50000, columns=None):
+    """
+    Parcourt une source par blocs de DataFrame : fichier CSV, Parquet, JSON lines (requêtes /predict
+    journalisées), dossier de fichiers Parquet, DataFrame ou liste d'enregistrements JSON.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_size):
+            yield source.iloc[start:start + chunk_size]
+        return
+    if isinstance(source, list):
+        for start in range(0, len(source), chunk_size):
+            yield pd.DataFrame.from_records(source[start:start + chunk_size])
+        return
+
+    path = Path(source)
+    if path.is_dir():
+        for file_path in sorted(path.glob("*.parquet")):
+            yield from iter_chunks(file_path, chunk_size, columns)
+    elif path.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        available = parquet_file.schema_arrow.names
+        selected = [col for col in columns if col in available] if columns is not None else None
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=selected):
+            yield batch.to_pandas()
+    elif path.suffix.lower() in (".jsonl", ".ndjson"):
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=lambda col: columns is None or col in columns)
+
+
+class ReferenceSketch:
+    """
+    Référence compacte par feature : bornes des classes, effectifs de référence et valeurs manquantes.
+
+    - `edges` : {feature: bornes intérieures croissantes}, la classe i contient les valeurs de ]edges[i-1], edges[i]].
+    - `counts` : {feature: effectifs par classe (len(edges) + 1 classes)}.
+    - `missing` : {feature: nombre de valeurs manquantes}.
+    """
+
+    def __init__(self, edges, counts, missing, n_rows):
+        self.edges = {feat: np.asarray(values, dtype=np.float64) for feat, values in edges.items()}
+        self.counts = {feat: np.asarray(values, dtype=np.int64) for feat, values in counts.items()}
+        self.missing = dict(missing)
+        self.n_rows = n_rows
+
+    @property
+    def features(self):
+        return list(self.edges)
+
+    @classmethod
+    def build(cls, source, n_bins=20, sample_size=100000, chunk_size=50000, features=None, seed=42):
+        """
+        Construit la référence en deux passages par blocs : estimation des quantiles sur un échantillon
+        aléatoire (réservoir de `sample_size` lignes), puis comptage exact de toutes les lignes.
+        """
+        sample = reservoir_sample(iter_chunks(source, chunk_size), sample_size, seed=seed)
+        if features is None:
+            features = [col for col in sample.select_dtypes("number").columns if col not in EXCLUDED_COLUMNS]
+
+        edges = {}
+        for feat in features:
+            values = sample[feat].to_numpy(dtype=np.float64)
+            values = values[~np.isnan(values)]
+            if values.size == 0:
+                edges[feat] = np.array([])
+                continue
+            quantiles = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])
+            edges[feat] = np.unique(quantiles)
+
+        window = CurrentWindow(edges)
+        for chunk in iter_chunks(source, chunk_size, columns=features):
+            window.update(chunk)
+        return cls(edges, window.counts, window.missing, window.n_rows)
+
+    def to_dict(self):
+        return {
+            "n_rows": self.n_rows,
+            "features": {
+                feat: {"edges": self.edges[feat].tolist(), "counts": self.counts[feat].tolist(), "missing": self.missing[feat]}
+                for feat in self.edges
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        features = data["features"]
+        return cls(
+            {feat: values["edges"] for feat, values in features.items()},
+            {feat: values["counts"] for feat, values in features.items()},
+            {feat: values["missing"] for feat, values in features.items()},
+            data["n_rows"],
+        )
+
+    def save(self, path):
+        Path(path).write_text(json.dumps(self.to_dict()), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+class CurrentWindow:
+    """
+    Effectifs courants par classe de la référence, mis à jour bloc par bloc.
+    """
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.counts = {feat: np.zeros(len(feat_edges) + 1, dtype=np.int64) for feat, feat_edges in edges.items()}
+        self.missing = {feat: 0 for feat in edges}
+        self.n_rows = 0
+
+    @classmethod
+    def for_reference(cls, reference):
+        return cls(reference.edges)
+
+    def update(self, chunk):
+        """
+        Ajoute un bloc de clients (DataFrame, ou liste d'enregistrements JSON tels que reçus par /predict).
+        Une feature absente du bloc est comptée comme manquante.
+        """
+        if not isinstance(chunk, pd.DataFrame):
+            chunk = pd.DataFrame.from_records(chunk)
+        n_rows = len(chunk)
+        for feat, feat_edges in self.edges.items():
+            if feat not in chunk.columns:
+                self.missing[feat] += n_rows
+                continue
+            values = pd.to_numeric(chunk[feat], errors="coerce").to_numpy(dtype=np.float64)
+            is_missing = np.isnan(values)
+            self.missing[feat] += int(is_missing.sum())
+            bins = np.searchsorted(feat_edges, values[~is_missing], side="left")
+            self.counts[feat] += np.bincount(bins, minlength=len(feat_edges) + 1)
+        self.n_rows += n_rows
+        return self
+
+    def merge(self, other):
+        for feat in self.edges:
+            self.counts[feat] += other.counts[feat]
+            self.missing[feat] += other.missing[feat]
+        self.n_rows += other.n_rows
+        return self
+
+    def to_dict(self):
+        return {
+            "n_rows": self.n_rows,
+            "counts": {feat: counts.tolist() for feat, counts in self.counts.items()},
+            "missing": dict(self.missing),
+        }
+
+    @classmethod
+    def from_dict(cls, reference, data):
+        window = cls.for_reference(reference)
+        window.counts = {feat: np.asarray(counts, dtype=np.int64) for feat, counts in data["counts"].items()}
+        window.missing = dict(data["missing"])
+        window.n_rows = data["n_rows"]
+        return window
+
+
+def population_stability_index(reference_counts, current_counts):
+    """
+    PSI entre deux distributions données par leurs effectifs par classe.
+    """
+    reference_share = np.maximum(reference_counts / max(reference_counts.sum(), 1), _PSI_EPSILON)
+    current_share = np.maximum(current_counts / max(current_counts.sum(), 1), _PSI_EPSILON)
+    return float(np.sum((current_share - reference_share) * np.log(current_share / reference_share)))
+
+
+def ks_statistic(reference_counts, current_counts):
+    """
+    Statistique de Kolmogorov-Smirnov (écart maximal entre fonctions de répartition) aux bornes des classes
+    et p-value asymptotique associée.
+    """
+    n_reference, n_current = reference_counts.sum(), current_counts.sum()
+    if not n_reference or not n_current:
+        return 0.0, 1.0
+    statistic = float(np.max(np.abs(np.cumsum(reference_counts) / n_reference - np.cumsum(current_counts) / n_current)))
+    from scipy.special import kolmogorov
+
+    effective_n = n_reference * n_current / (n_reference + n_current)
+    return statistic, float(kolmogorov(statistic * math.sqrt(effective_n)))
+
+
+def drift_report(reference, window, psi_threshold=PSI_THRESHOLD, ks_pvalue_threshold=KS_PVALUE_THRESHOLD):
+    """
+    Compare la fenêtre courante à la référence et retourne le rapport de drift (dictionnaire JSON).
+    Une feature est considérée en drift si son PSI dépasse `psi_threshold`.
+    """
+    features = {}
+    for feat in reference.features:
+        reference_counts = np.append(reference.counts[feat], reference.missing[feat])
+        current_counts = np.append(window.counts[feat], window.missing[feat])
+        statistic, p_value = ks_statistic(reference.counts[feat], window.counts[feat])
+        psi = population_stability_index(reference_counts, current_counts)
+        features[feat] = {
+            "psi": psi,
+            "ks_statistic": statistic,
+            "ks_p_value": p_value,
+            "missing_rate_reference": reference.missing[feat] / max(reference.n_rows, 1),
+            "missing_rate_current": window.missing[feat] / max(window.n_rows, 1),
+            "drift_detected": psi > psi_threshold,
+        }
+
+    drifted = sorted((feat for feat, values in features.items() if values["drift_detected"]),
+                     key=lambda feat: -features[feat]["psi"])
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "n_rows_reference": reference.n_rows,
+        "n_rows_current": window.n_rows,
+        "thresholds": {"psi": psi_threshold, "ks_p_value": ks_pvalue_threshold},
+        "n_features": len(features),
+        "n_drifted_features": len(drifted),
+        "share_drifted_features": len(drifted) / max(len(features), 1),
+        "drifted_features": drifted,
+        "features": features,
+    }
+
+
+def reservoir_sample(chunks, sample_size, seed=42):
+    """
+    Échantillon aléatoire uniforme de `sample_size` lignes d'une suite de blocs (algorithme du réservoir),
+    sans conserver plus de `sample_size` lignes en mémoire.
+    """
+    rng = np.random.default_rng(seed)
+    sample = None
+    seen = 0
+    for chunk in chunks:
+        chunk = chunk.reset_index(drop=True)
+        if sample is None:
+            sample = chunk.iloc[:0].copy()
+        free = sample_size - len(sample)
+        if free > 0:
+            sample = pd.concat([sample, chunk.iloc[:free]], ignore_index=True)
+        rest = chunk.iloc[max(free, 0):]
+        if len(rest):
+            # Chaque ligne i (numérotation globale) remplace une ligne du réservoir avec une probabilité sample_size / (i + 1)
+            positions = seen + max(free, 0) + np.arange(len(rest))
+            slots = (rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+            selected = slots < sample_size
+            rows = np.flatnonzero(selected)
+            for position in range(sample.shape[1]):
+                sample.iloc[slots[selected], position] = rest.iloc[rows, position].to_numpy()
+        seen += len(chunk)
+    return sample if sample is not None else pd.DataFrame()
+
+
+def save_evidently_html(reference_source, current_source, output_path, sample_size=50000, features=None):
+    """
+    Génère le rapport HTML Evidently complet (DataDriftPreset) sur des échantillons des deux jeux de données.
+    """
+    from evidently.metric_preset import DataDriftPreset
+    from evidently.report import Report
+
+    reference_data = reservoir_sample(iter_chunks(reference_source), sample_size)
+    current_data = reservoir_sample(iter_chunks(current_source), sample_size)
+    columns = features or [col for col in reference_data.columns if col in current_data.columns and col not in EXCLUDED_COLUMNS]
+    report = Report(metrics=[DataDriftPreset()])
+    report.run(reference_data=reference_data[columns], current_data=current_data[columns])
+    report.save_html(str(output_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Détection incrémentale du data drift.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build-reference", help="Construit la référence compacte du jeu d'entraînement.")
+    build_parser.add_argument("input", help="Jeu de référence (CSV, Parquet ou dossier Parquet).")
+    build_parser.add_argument("output", help="Fichier JSON de la référence.")
+    build_parser.add_argument("--bins", type=int, default=20, help="Nombre de classes par feature (quantiles).")
+    build_parser.add_argument("--sample-size", type=int, default=100000, help="Lignes utilisées pour estimer les quantiles.")
+    build_parser.add_argument("--chunk-size", type=int, default=50000, help="Lignes lues par bloc.")
+
+    report_parser = subparsers.add_parser("report", help="Calcule le drift d'un jeu courant par rapport à la référence.")
+    report_parser.add_argument("reference", help="Fichier JSON de la référence.")
+    report_parser.add_argument("current", nargs="+", help="Jeux courants (CSV, Parquet, JSON lines ou dossier de journaux).")
+    report_parser.add_argument("--output", default="drift_report.json", help="Fichier JSON du rapport.")
+    report_parser.add_argument("--window", default=None, help="Fenêtre courante (JSON) à reprendre puis mettre à jour.")
+    report_parser.add_argument("--psi-threshold", type=float, default=PSI_THRESHOLD, help="Seuil de PSI signalant un drift.")
+    report_parser.add_argument("--chunk-size", type=int, default=50000, help="Lignes lues par bloc.")
+    report_parser.add_argument("--html", default=None, help="Génère aussi le rapport HTML Evidently complet (optionnel).")
+    report_parser.add_argument("--reference-data", default=None, help="Jeu de référence brut, requis avec --html.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "build-reference":
+        print(f"📌 Construction de la référence à partir de {args.input}...")
+        reference = ReferenceSketch.build(args.input, n_bins=args.bins, sample_size=args.sample_size, chunk_size=args.chunk_size)
+        reference.save(args.output)
+        print(f"✅ Référence de {len(reference.features)} features ({reference.n_rows} lignes) en "
+              f"{time.perf_counter() - start:.1f} s : {args.output}")
+        return
+
+    reference = ReferenceSketch.load(args.reference)
+    window = CurrentWindow.for_reference(reference)
+    if args.window and Path(args.window).exists():
+        window = CurrentWindow.from_dict(reference, json.loads(Path(args.window).read_text(encoding="utf-8")))
+    for current in args.current:
+        print(f"📌 Mise à jour de la fenêtre courante avec {current}...")
+        for chunk in iter_chunks(current, args.chunk_size, columns=reference.features):
+            window.update(chunk)
+    if args.window:
+        Path(args.window).write_text(json.dumps(window.to_dict()), encoding="utf-8")
+
+    report = drift_report(reference, window, psi_threshold=args.psi_threshold)
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"✅ Drift détecté sur {report['n_drifted_features']}/{report['n_features']} features "
+          f"({window.n_rows} lignes courantes) en {time.perf_counter() - start:.1f} s : {args.output}")
+    for feat in report["drifted_features"]:
+        print(f"   - {feat} : PSI {report['features'][feat]['psi']:.3f}")
+
+    if args.html:
+        if not args.reference_data:
+            parser.error("--reference-data est requis avec --html")
+        print("📌 Génération du rapport HTML Evidently...")
+        save_evidently_html(args.reference_data, args.current[0], args.html, features=reference.features)
+        print(f"✅ Rapport HTML Evidently : {args.html}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,12 @@ from evidently.report import Report
 from evidently.metric_preset import DataDriftPreset
 
 # 📂 Définition des chemins mis à jour
-base_dir = "D:/Pro/OpenClassrooms/Projet_7/3_dossier_code_012025"
+base_dir = os.getenv("BASE_DIR", "D:/Pro/OpenClassrooms/Projet_7/3_dossier_code_012025")
 features_train_path = os.path.join(base_dir, "features", "app_train_features.csv")
-features_test_path = os.path.join(base_dir, "features", "app_test_features.csv")
+# Jeu "courant" : features de test par défaut, ou journal des features servies par l'API
+# (CURRENT_DATA_PATH : dossier FEATURE_LOG_DIR de fichiers Parquet, fichier Parquet ou CSV)
+features_test_path = os.getenv("CURRENT_DATA_PATH", os.path.join(base_dir, "features", "app_test_features.csv"))
+current_label = os.getenv("CURRENT_DATA_LABEL", "app. test features data set")
 report_dir = os.path.join(base_dir, "evidently", "report")
 nom = os.getenv("NOM", "Nom")
 prenom = os.getenv("PRENOM", "Prenom")
@@ -19,10 +22,17 @@ os.makedirs(report_dir, exist_ok=True)
 # 📌 Chargement des données
 print("📌 Chargement des données d'entraînement et de test...")
 train_data = pd.read_csv(features_train_path)
-test_data = pd.read_csv(features_test_path)
+if os.path.isdir(features_test_path):
+    # Fichiers Parquet terminés du journal des features (les fichiers en cours d'écriture sont ignorés)
+    log_files = sorted(f for f in os.listdir(features_test_path) if f.endswith(".parquet"))
+    test_data = pd.concat([pd.read_parquet(os.path.join(features_test_path, f)) for f in log_files], ignore_index=True)
+elif features_test_path.endswith(".parquet"):
+    test_data = pd.read_parquet(features_test_path)
+else:
+    test_data = pd.read_csv(features_test_path)
 
 # 📌 Suppression des colonnes non pertinentes si besoin
-id_columns = ["SK_ID_CURR"]  # Exclusion des identifiants
+id_columns = ["SK_ID_CURR", "timestamp", "model_version"]  # Exclusion des identifiants et métadonnées du journal
 train_data = train_data.drop(columns=id_columns, errors='ignore')
 test_data = test_data.drop(columns=id_columns, errors='ignore')
 
@@ -51,7 +61,7 @@ with open(html_report_path, "r", encoding="utf-8") as file:
 
 # 🔄 Ajout de (train) et (test) après "Reference Distribution" et "Current Distribution"
 html_content = html_content.replace("Reference Distribution", "Reference Distribution (app. train features data set)")
-html_content = html_content.replace("Current Distribution", "Current Distribution     (app. test features data set)")
+html_content = html_content.replace("Current Distribution", f"Current Distribution     ({current_label})")
 
 # 💾 Sauvegarder les modifications
 with open(html_report_path, "w", encoding="utf-8") as file:
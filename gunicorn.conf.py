@@ -0,0 +1,35 @@
+"""
+Configuration Gunicorn de l'API de scoring.
+
+Le modèle est chargé une seule fois dans le processus maître (`preload_app`), puis partagé
+en copie sur écriture par les workers. Chaque worker exécute l'inférence LightGBM (CPU) avec
+un nombre de threads OpenMP limité pour ne pas surcharger les coeurs disponibles.
+
+Toutes les valeurs sont configurables par variables d'environnement.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Threads OpenMP par prédiction LightGBM : les coeurs sont répartis entre les workers
+os.environ.setdefault("LGBM_NUM_THREADS", str(max(1, multiprocessing.cpu_count() // workers)))
+
+
+def when_ready(server):
+    # Gel des objets du maître : le ramasse-miettes des workers ne les parcourt plus,
+    # ce qui évite de dupliquer leurs pages mémoire (copie sur écriture)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Réinitialisation de l'état propre au processus (verrous) dans chaque worker ;
+    # sans préchargement, le registre n'est pas encore importé et il n'y a rien à réinitialiser
+    model_registry = sys.modules.get("model_registry")
+    if model_registry is not None:
+        model_registry.registry.after_fork()
@@ -0,0 +1,180 @@
+"""
+Client HTTP de l'API de scoring utilisé par le tableau de bord Streamlit.
+
+- Une session `requests` persistante (connexions keep-alive réutilisées, pas de nouvelle poignée de main TLS
+  à chaque interaction) ;
+- des délais maximaux de connexion et de lecture : une réponse lente de l'API ne bloque pas le tableau de bord ;
+- des nouvelles tentatives avec délai exponentiel sur les erreurs de connexion, les délais dépassés et les
+  réponses 502 / 503 / 504 (l'en-tête Retry-After est respecté) ;
+- un cache des réponses par client et par version du modèle (en-tête `X-Model-Version`) : les interactions
+  qui ne changent pas de client (curseur de la zone grise) ne rappellent pas l'API ;
+- la prédiction (`/predict`) et l'explication (`/explain`) d'un client sont demandées en parallèle.
+"""
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ApiError(Exception):
+    """
+    Erreur retournée par l'API (statut HTTP et message), ou erreur de connexion (statut None).
+    """
+
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code} : {message}" if status_code else message)
+        self.status_code = status_code
+        self.message = message
+
+
+class ScoringApiClient:
+    """
+    Client de l'API de scoring.
+
+    - `base_url` : adresse de l'API (ex. `https://prediction-api.azurewebsites.net`).
+    - `connect_timeout_s` / `read_timeout_s` : délais maximaux d'établissement de la connexion et de réponse.
+    - `retries` / `backoff_s` : nombre de nouvelles tentatives et délai initial (doublé à chaque tentative).
+    - `cache_size` / `cache_ttl_s` : nombre de réponses conservées et durée de vie (0 : cache désactivé).
+    """
+
+    def __init__(self, base_url, connect_timeout_s=3.05, read_timeout_s=10.0, retries=3, backoff_s=0.5,
+                 cache_size=256, cache_ttl_s=300.0, pool_size=4):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout_s, read_timeout_s)
+        self.cache_size = cache_size
+        self.cache_ttl_s = cache_ttl_s
+        self.model_version = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="api-client")
+        self.hits = 0
+        self.misses = 0
+
+        # /predict et /explain sont sans effet de bord : les POST peuvent être rejoués sans risque
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_s,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method, path, payload=None, params=None):
+        """
+        Envoie une requête et retourne le corps JSON de la réponse ; lève ApiError en cas d'échec.
+        """
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", json=payload, params=params,
+                                            timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise ApiError(None, f"Erreur de connexion à l'API : {e}") from e
+        if "X-Model-Version" in response.headers:
+            self.model_version = response.headers["X-Model-Version"]
+        if response.status_code != 200:
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            raise ApiError(response.status_code, message)
+        return response.json()
+
+    @staticmethod
+    def normalize_record(record):
+        """
+        Convertit les valeurs d'un client en types JSON (float, None pour une valeur manquante).
+        """
+        normalized = {}
+        for feat, value in record.items():
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                normalized[feat] = None
+            elif hasattr(value, "item"):
+                value = value.item()  # Scalaire numpy
+                normalized[feat] = None if isinstance(value, float) and math.isnan(value) else value
+            else:
+                normalized[feat] = value
+        return normalized
+
+    def _cached_post(self, path, record):
+        """
+        POST mis en cache par (endpoint, client, version du modèle servie lors du dernier appel).
+        """
+        record = self.normalize_record(record)
+        if not self.cache_size:
+            return self._request("POST", path, record)
+
+        client_key = hashlib.blake2b(json.dumps(record, sort_keys=True).encode(), digest_size=16).hexdigest()
+        key = (path, client_key, self.model_version)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and (not self.cache_ttl_s or now - cached[0] < self.cache_ttl_s):
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        response = self._request("POST", path, record)
+        with self._lock:
+            # Clé définitive : version du modèle ayant réellement servi la requête
+            self._cache[(path, client_key, self.model_version)] = (now, response)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return response
+
+    def predict(self, record):
+        """
+        Probabilité de défaut et classe d'un client (`POST /predict`).
+        """
+        return self._cached_post("/predict", record)
+
+    def explain(self, record):
+        """
+        Valeurs SHAP d'un client (`POST /explain`, même format que `/shap_values`).
+        """
+        return self._cached_post("/explain", record)
+
+    def predict_and_explain(self, record):
+        """
+        Demande en parallèle la prédiction et l'explication d'un client ; retourne le tuple (prédiction, explication).
+        """
+        prediction = self._executor.submit(self.predict, record)
+        explanation = self._executor.submit(self.explain, record)
+        return prediction.result(), explanation.result()
+
+    def shap_values(self):
+        """
+        Valeurs SHAP d'un échantillon aléatoire (`GET /shap_values`, non mis en cache).
+        """
+        return self._request("GET", "/shap_values")
+
+    def policy_what_if(self, threshold=None, margin=0.0, curve_points=101):
+        """
+        Effet d'une politique (seuil, marge de la zone grise) sur tout le portefeuille (`GET /policy/what_if`).
+        """
+        params = {"margin": margin, "curve_points": curve_points}
+        if threshold is not None:
+            params["threshold"] = threshold
+        return self._request("GET", "/policy/what_if", params=params)
+
+    def status(self):
+        return self._request("GET", "/status")
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._cache), "hits": self.hits, "misses": self.misses, "model_version": self.model_version}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
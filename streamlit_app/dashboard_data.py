@@ -0,0 +1,108 @@
+"""
+Chargement et préparation des données du tableau de bord Streamlit.
+
+Les fonctions de ce module sont appelées une seule fois par processus Streamlit (mise en cache par
+`st.cache_resource` dans `streamlit_app.py`) et non à chaque interaction : lecture du jeu de données
+(colonnes utiles uniquement), filtrage des clients complets et statistiques de la population.
+
+Le jeu de données peut être lu au format Parquet (colonnes en float32) pour un démarrage plus rapide
+et une empreinte mémoire réduite. Conversion du fichier CSV :
+    python streamlit_app/dashboard_data.py features/app_test_features.csv features/app_test_features.parquet
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+ID_COLUMN = "SK_ID_CURR"
+
+STATUS_INSIDE = "🟩 Dans l'intervalle"
+STATUS_OUTSIDE = "🟥 Hors de l'intervalle"
+
+
+def load_features(path, features_names=None, float32=False):
+    """
+    Charge le jeu de données (CSV ou Parquet), limité à l'identifiant et aux features du modèle si elles sont fournies.
+    Avec `float32`, les colonnes numériques float64 sont converties en float32 (mémoire divisée par deux).
+    """
+    columns = None if features_names is None else [ID_COLUMN, *features_names]
+    if str(path).lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        available = pq.read_schema(path).names
+        data = pd.read_parquet(path, columns=None if columns is None else [col for col in columns if col in available])
+    else:
+        data = pd.read_csv(path, usecols=None if columns is None else lambda col: col in columns)
+    if float32:
+        float_columns = data.select_dtypes("float64").columns
+        data[float_columns] = data[float_columns].astype(np.float32)
+    return data
+
+
+def population_stats(data_clean, features_names):
+    """
+    Moyenne et écart-type de chaque feature sur la population (accumulation en float64, même si les colonnes sont en float32).
+    """
+    matrix = data_clean[features_names].to_numpy()
+    return pd.DataFrame(
+        {"mean": matrix.mean(axis=0, dtype=np.float64), "std": matrix.std(axis=0, ddof=1, dtype=np.float64)},
+        index=features_names,
+    )
+
+
+def prepare_dashboard_data(path, features_names, float32=False):
+    """
+    Précalcule les données du tableau de bord : clients sans valeurs manquantes, nombre total de clients
+    et statistiques de la population.
+    """
+    data = load_features(path, features_names, float32=float32)
+    data_clean = data.dropna(subset=features_names)
+    return {
+        "n_clients": len(data),
+        "data_clean": data_clean,
+        "stats": population_stats(data_clean, features_names),
+    }
+
+
+def comparison_table(client_row, stats):
+    """
+    Compare les features d'un client (Series) à la moyenne ± un écart-type de la population, de façon vectorisée.
+    """
+    client_values = client_row[stats.index].to_numpy(dtype=np.float64)
+    mean_values = stats["mean"].to_numpy()
+    std_values = stats["std"].to_numpy()
+    inside = (client_values >= mean_values - std_values) & (client_values <= mean_values + std_values)
+    return pd.DataFrame({
+        "Feature": stats.index,
+        "Valeur Client": client_values,
+        "Moyenne": mean_values,
+        "Écart-Type": std_values,
+        "Statut": np.where(inside, STATUS_INSIDE, STATUS_OUTSIDE),
+    })
+
+
+def convert_to_parquet(csv_path, parquet_path, float32=True):
+    """
+    Convertit le fichier CSV des features en Parquet (colonnes float64 converties en float32 par défaut).
+    """
+    data = load_features(csv_path, float32=float32)
+    data.to_parquet(parquet_path, index=False)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion du jeu de données du tableau de bord au format Parquet.")
+    parser.add_argument("input", help="Fichier CSV des features.")
+    parser.add_argument("output", help="Fichier Parquet produit.")
+    parser.add_argument("--float64", action="store_true", help="Conserve les colonnes en float64.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = convert_to_parquet(args.input, args.output, float32=not args.float64)
+    print(f"✅ {len(data)} clients convertis en {time.perf_counter() - start:.1f} s "
+          f"({data.memory_usage(deep=True).sum() / 1024 ** 2:.0f} Mo en mémoire) : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,20 @@ import numpy as np
 import logging
 logging.getLogger('matplotlib').setLevel(logging.WARNING)
 import matplotlib.pyplot as plt
-import requests
 import shap
 import pickle
 import os
+import sys
 import warnings
+from pathlib import Path
+
+# Ajout des dossiers de l'application et de l'API au chemin d'import (modules du tableau de bord, index des clients)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from api_client import ApiError, ScoringApiClient
+from client_index import ClientIndex
+from dashboard_data import ID_COLUMN, comparison_table, prepare_dashboard_data
 
 
 # 🔧 Configuration des logs
@@ -16,9 +25,80 @@ logging.basicConfig(level=logging.DEBUG, format="DEBUG:%(message)s")
 warnings.simplefilter("always")  # Activer tous les warnings
 
 # 📂 Définition des chemins
-base_dir = "D:/Pro/OpenClassrooms/Projet_7/3_dossier_code_012025"
-model_path = os.path.join(base_dir, "models", "lgbm_final_model.pkl")
-features_path = os.path.join(base_dir, "features", "app_test_features.csv")
+base_dir = os.getenv("BASE_DIR", "D:/Pro/OpenClassrooms/Projet_7/3_dossier_code_012025")
+model_path = os.getenv("MODEL_PATH", os.path.join(base_dir, "models", "lgbm_final_model.pkl"))
+# Jeu de données : CSV, ou Parquet pour un démarrage plus rapide (voir dashboard_data.py)
+features_path = os.getenv("FEATURES_PATH", os.path.join(base_dir, "features", "app_test_features.csv"))
+# Conversion des features en float32 au chargement (mémoire divisée par deux)
+features_float32 = os.getenv("FEATURES_FLOAT32", "0") == "1"
+# 🔗 URL de l'API (ex. http://127.0.0.1:5000 en local), délai maximal de réponse et nouvelles tentatives
+api_base_url = os.getenv("API_URL", "https://prediction-api.azurewebsites.net")
+api_timeout_s = float(os.getenv("API_TIMEOUT_S", "10"))
+api_retries = int(os.getenv("API_RETRIES", "3"))
+# Index des clients construit par `api/client_index.py` (sinon construit en mémoire à partir du jeu de données)
+client_index_dir = os.getenv("CLIENT_INDEX_DIR", "")
+
+
+@st.cache_resource
+def load_model(path):
+    """
+    Charge le modèle une seule fois par processus Streamlit (partagé entre les sessions et les interactions).
+    """
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+@st.cache_resource
+def load_dashboard_data(path, features_names, float32):
+    """
+    Charge le jeu de données et précalcule les statistiques de la population une seule fois par processus.
+    Les données retournées sont partagées (non copiées) : elles ne doivent pas être modifiées.
+    """
+    return prepare_dashboard_data(path, list(features_names), float32=float32)
+
+
+@st.cache_resource
+def load_client_index(index_dir, path, features_names, float32):
+    """
+    Ouvre l'index des clients (recherche par SK_ID_CURR et clients similaires) une seule fois par processus.
+    """
+    if index_dir:
+        return ClientIndex.open(index_dir)
+    return ClientIndex.from_frame(load_dashboard_data(path, features_names, float32)["data_clean"], list(features_names))
+
+
+@st.cache_resource
+def get_api_client(base_url, timeout_s, retries):
+    """
+    Client de l'API partagé par les sessions et les interactions (connexions persistantes, cache des réponses).
+    """
+    return ScoringApiClient(base_url, read_timeout_s=timeout_s, retries=retries)
+
+
+api_client = get_api_client(api_base_url, api_timeout_s, api_retries)
+
+
+def select_client_by_id():
+    """
+    Sélectionne le client saisi dans le champ de recherche (recherche dichotomique dans l'index).
+    """
+    search = st.session_state.client_search.strip()
+    if not search:
+        return
+    try:
+        client_id = int(search)
+    except ValueError:
+        st.session_state.client_search_error = f"Identifiant invalide : {search}"
+        return
+    row = client_index.lookup(client_id)
+    if row is None:
+        st.session_state.client_search_error = f"Client introuvable : {client_id}"
+        return
+    st.session_state.client_search_error = None
+    st.session_state.selected_client = pd.DataFrame([[client_id, *row]], columns=[ID_COLUMN, *client_index.features_names])
+    if "shap_values_data" in st.session_state:
+        del st.session_state.shap_values_data
+
 
 # 🎯 Initialisation des états de session
 if "selected_client" not in st.session_state:
@@ -29,14 +109,15 @@ if "margin" not in st.session_state:
 # 📌 1. Chargement du Modèle et des Données
 st.header("📌 1. Chargement")
 try:
-    with open(model_path, "rb") as f:
-        model_data = pickle.load(f)
+    model_data = load_model(model_path)
     model = model_data["model"]
     features_names = model_data["features"]
     optimal_threshold = model_data["optimal_threshold"]
     st.success("✅ Modèle chargé avec succès !")
 
-    data = pd.read_csv(features_path)
+    dashboard_data = load_dashboard_data(features_path, tuple(features_names), features_float32)
+    data_clean = dashboard_data["data_clean"]
+    client_index = load_client_index(client_index_dir, features_path, tuple(features_names), features_float32)
     st.success("✅ Données chargées avec succès !")
 
     # ℹ️ Infobulle sur le seuil optimal
@@ -49,7 +130,7 @@ try:
         )
 
     st.write(f"🔹 **Seuil optimal** : {optimal_threshold:.3f}")
-    st.write(f"🔹 **Nombre total de clients dans le dataset** : {data.shape[0]}")
+    st.write(f"🔹 **Nombre total de clients dans le dataset** : {dashboard_data['n_clients']}")
 except Exception as e:
     st.error(f"❌ Erreur lors du chargement des fichiers : {e}")
 
@@ -59,13 +140,17 @@ st.header("📌 2. Sélection d'un client")
 # 🎲 Bouton pour sélectionner un autre client aléatoire
 if st.button("🎲 Sélectionner un autre client aléatoire"):
     st.session_state.selected_client = None  # Réinitialiser la sélection
+    st.session_state.client_search_error = None
     if "shap_values_data" in st.session_state:
         del st.session_state.shap_values_data  # Suppression des valeurs SHAP pour forcer la mise à jour
 
-try:
-    # 🔎 Filtrer les clients sans valeurs manquantes
-    data_clean = data.dropna()
+# 🔎 Recherche d'un client par identifiant
+st.text_input("🔎 Rechercher un client par identifiant (SK_ID_CURR)", key="client_search", on_change=select_client_by_id)
+if st.session_state.get("client_search_error"):
+    st.warning(f"⚠️ {st.session_state.client_search_error}")
 
+try:
+    # 🔎 Clients sans valeurs manquantes (filtrés une seule fois au chargement)
     if data_clean.empty:
         st.warning("⚠️ Aucun client sans valeurs manquantes trouvé.")
     else:
@@ -76,41 +161,15 @@ try:
             st.session_state.selected_client = data_clean.sample(1, random_state=np.random.randint(1000))
 
         random_client = st.session_state.selected_client
-        client_id = random_client.index[0]
+        client_id = random_client[ID_COLUMN].iloc[0] if ID_COLUMN in random_client.columns else random_client.index[0]
 
         st.subheader(f"👤 **Client sélectionné (ID : {client_id})**")
 
         # 📊 **Comparaison aux clients de la même classe**
         st.subheader("📊 **Comparaison aux clients de la même classe**")
 
-        # 📌 Calcul des statistiques pour chaque feature
-        mean_std = data_clean[features_names].agg(["mean", "std"])
-
-        # Remplissage du DataFrame
-        rows_list = []  # Stockage des lignes
-
-        for feature in features_names:
-            val_client = random_client[feature].values[0]
-            mean_val = mean_std.loc["mean", feature]
-            std_val = mean_std.loc["std", feature]
-            lower_bound, upper_bound = mean_val - std_val, mean_val + std_val
-
-            if lower_bound <= val_client <= upper_bound:
-                statut = "🟩 Dans l'intervalle"
-            else:
-                statut = "🟥 Hors de l'intervalle"
-
-            # Ligne sous forme de dictionnaire
-            rows_list.append({
-                "Feature": feature,
-                "Valeur Client": val_client,
-                "Moyenne": mean_val,
-                "Écart-Type": std_val,
-                "Statut": statut
-            })
-
-        # Création du DataFrame final
-        comparison_df = pd.DataFrame(rows_list)
+        # 📌 Comparaison à la moyenne ± écart-type (statistiques précalculées, calcul vectorisé)
+        comparison_df = comparison_table(random_client.iloc[0], dashboard_data["stats"])
 
         # Affichage
         st.dataframe(
@@ -118,6 +177,16 @@ try:
             use_container_width=True
             )
 
+        # 👥 **Clients les plus proches** (features centrées-réduites, index des clients)
+        st.subheader("👥 **Clients similaires**")
+        similar_ids, similar_distances, similar_positions = client_index.similar(row=random_client[features_names].to_numpy()[0], k=6)
+        similar_df = pd.DataFrame(np.asarray(client_index.features[similar_positions]), columns=client_index.features_names)
+        similar_df.insert(0, "Distance", similar_distances)
+        similar_df.insert(0, ID_COLUMN, similar_ids)
+        # Le client lui-même (distance nulle) n'est pas affiché
+        similar_df = similar_df[similar_df[ID_COLUMN] != client_id].head(5)
+        st.dataframe(similar_df, use_container_width=True, hide_index=True)
+
 except Exception as e:
     st.error(f"❌ Erreur lors de la sélection du client : {e}")
 
@@ -128,76 +197,87 @@ try:
     # 📌 Préparation des données pour la prédiction
     input_data = random_client[features_names].to_dict(orient='records')[0]
 
-    # 🔗 URL de l'API (endpoint predict)
-    # api_url = "http://127.0.0.1:5000/predict"
-    api_url= "https://prediction-api.azurewebsites.net/predict"
-
     # 🚀 Debugging avant l'appel API
     print(f"🔍 Vérification - Envoi de la requête API avec les données suivantes : {input_data}")
-    print(f"🔍 API URL: {api_url}")
+    print(f"🔍 API URL: {api_client.base_url}")
 
-    # 🚀 Envoi de la requête à l'API
-    response = requests.post(api_url, json=input_data)
+    # 🚀 Prédiction et valeurs SHAP du client demandées en parallèle (réponses en cache si le client n'a pas changé)
+    prediction, st.session_state.shap_values_data = api_client.predict_and_explain(input_data)
 
-    if response.status_code == 200:
-        prediction = response.json()
+    # 📌 **Gestion de la Zone Grise**
+    st.subheader("⚙️ **Réglage du seuil de définition de zone grise (optionnel)**")
 
-        # 📌 **Gestion de la Zone Grise**
-        st.subheader("⚙️ **Réglage du seuil de définition de zone grise (optionnel)**")
+    st.session_state.margin = st.slider(
+        "Marge de la zone grise (%)", min_value=0.0, max_value=0.10, value=0.00, step=0.01, key="zone_grise_slider"
+    )
+
+    # 📌 **Calcul des seuils dynamiques**
+    margin_value = st.session_state.margin
+    lower_bound = optimal_threshold - margin_value
+    upper_bound = optimal_threshold + margin_value
+    probability_class_1 = prediction['probability_class_1']
 
-        st.session_state.margin = st.slider(
-            "Marge de la zone grise (%)", min_value=0.0, max_value=0.10, value=0.00, step=0.01, key="zone_grise_slider"
+    # ℹ️ Infobulle sur la zone grise
+    with st.expander("ℹ️ **Comment fonctionne la zone grise ?**"):
+        st.write(
+            f"🔹 Si la **probabilité d'appartenir à la classe risquée** se situe entre "
+            f"les limites définies par le seuil ± marge, le client sera classé dans une **zone d'incertitude**.\n\n"
+            f"🔹 **Intervalle dynamique actuel** : [{lower_bound:.3f}, {upper_bound:.3f}]"
         )
 
-        # 📌 **Calcul des seuils dynamiques**
-        margin_value = st.session_state.margin
-        lower_bound = optimal_threshold - margin_value
-        upper_bound = optimal_threshold + margin_value
-        probability_class_1 = prediction['probability_class_1']
-
-        # ℹ️ Infobulle sur la zone grise
-        with st.expander("ℹ️ **Comment fonctionne la zone grise ?**"):
-            st.write(
-                f"🔹 Si la **probabilité d'appartenir à la classe risquée** se situe entre "
-                f"les limites définies par le seuil ± marge, le client sera classé dans une **zone d'incertitude**.\n\n"
-                f"🔹 **Intervalle dynamique actuel** : [{lower_bound:.3f}, {upper_bound:.3f}]"
-            )
+    # 📌 **Calcul des seuils dynamiques**
+    margin_value = st.session_state.margin
+    lower_bound = optimal_threshold - margin_value
+    upper_bound = optimal_threshold + margin_value
+    probability_class_1 = prediction.get('probability_class_1', None)
+    if probability_class_1 is None:
+        st.error("❌ Erreur : La réponse de l'API ne contient pas la clé 'probability_class_1'. Vérifiez l'API.")
+
+    # 📌 **Verdict final**
+    if probability_class_1 < lower_bound:
+        verdict = "Classe_0 (Fiable)"
+        verdict_color = "lightgreen"
+    elif probability_class_1 > upper_bound:
+        verdict = "Classe_1 (Risqué)"
+        verdict_color = "#FFCCCB"  # Rouge clair
+    else:
+        verdict = "Zone Grise (Incertitude)"
+        verdict_color = "#FFD700"  # Jaune
+
+    # 📌 **Affichage de la probabilité
+    st.markdown(
+        f'<div style="background-color: #333333; padding: 10px; border-radius: 10px; '
+        f'text-align: center; font-size: 18px; font-weight: bold; color: white; margin-bottom: 20px;">'
+        f'📊 **Probabilité d\'être un client risqué** : {probability_class_1:.2%}'
+        '</div>',
+        unsafe_allow_html=True
+    )
 
-        # 📌 **Calcul des seuils dynamiques**
-        margin_value = st.session_state.margin
-        lower_bound = optimal_threshold - margin_value
-        upper_bound = optimal_threshold + margin_value
-        probability_class_1 = prediction.get('probability_class_1', None)
-        if probability_class_1 is None:
-            st.error("❌ Erreur : La réponse de l'API ne contient pas la clé 'probability_class_1'. Vérifiez l'API.")
-
-        # 📌 **Verdict final**
-        if probability_class_1 < lower_bound:
-            verdict = "Classe_0 (Fiable)"
-            verdict_color = "lightgreen"
-        elif probability_class_1 > upper_bound:
-            verdict = "Classe_1 (Risqué)"
-            verdict_color = "#FFCCCB"  # Rouge clair
-        else:
-            verdict = "Zone Grise (Incertitude)"
-            verdict_color = "#FFD700"  # Jaune
-
-        # 📌 **Affichage de la probabilité
-        st.markdown(
-            f'<div style="background-color: #333333; padding: 10px; border-radius: 10px; '
-            f'text-align: center; font-size: 18px; font-weight: bold; color: white; margin-bottom: 20px;">'
-            f'📊 **Probabilité d\'être un client risqué** : {probability_class_1:.2%}'
-            '</div>',
-            unsafe_allow_html=True
-        )
+    # 📌 **Affichage du Verdict**
+    st.markdown(
+        f'<div style="background-color: {verdict_color}; padding: 15px; border-radius: 10px;">'
+        f'<h3 style="text-align: center; color: black;">🔮 {verdict}</h3>'
+        '</div>',
+        unsafe_allow_html=True
+    )
 
-        # 📌 **Affichage du Verdict**
-        st.markdown(
-            f'<div style="background-color: {verdict_color}; padding: 15px; border-radius: 10px;">'
-            f'<h3 style="text-align: center; color: black;">🔮 {verdict}</h3>'
-            '</div>',
-            unsafe_allow_html=True
-        )
+    # 📌 **Effet de la marge sur l'ensemble du portefeuille** (simulation côté API, sans rescorer les clients)
+    st.subheader("📈 **Effet de la politique sur le portefeuille**")
+    try:
+        what_if = api_client.policy_what_if(optimal_threshold, margin_value)
+        policy, current_policy = what_if["policy"], what_if["current_policy"]
+        col_approved, col_gray, col_cost = st.columns(3)
+        col_approved.metric("Taux d'accord", f"{policy['approval_rate']:.1%}",
+                            f"{policy['approval_rate'] - current_policy['approval_rate']:+.1%}")
+        col_gray.metric("Zone grise", f"{policy['n_gray_zone']} clients", f"{policy['gray_zone_rate']:.1%}",
+                        delta_color="off")
+        col_cost.metric("Coût métier moyen", f"{policy['cost_per_client']:.3f}",
+                        f"{policy['cost_per_client'] - current_policy['cost_per_client']:+.3f}", delta_color="inverse")
+        curve = what_if["cost_curve"]
+        st.line_chart(pd.DataFrame({"Coût moyen par client": curve["cost_per_client"]},
+                                   index=pd.Index(curve["threshold"], name="Seuil")))
+    except ApiError as e:
+        st.info(f"ℹ️ Simulation du portefeuille indisponible : {e.message}")
 
 except Exception as e:
     st.error(f"❌ Erreur lors de la requête à l'API : {e}")
@@ -217,22 +297,6 @@ with st.expander("ℹ️ **Comment lire ce graphique ?**"):
         "- 🟦 **Facteurs réduisant le risque** : Ces features diminuent la probabilité que le client soit risqué."
     )
 
-# 📌 Endpoint de l'API pour récupérer les SHAP values
-# api_shap_url = "http://127.0.0.1:5000/shap_values"
-api_shap_url = "https://prediction-api.azurewebsites.net/shap_values"
-
-# 📌 Vérification et récupération des données SHAP avec mise en cache
-if "shap_values_data" not in st.session_state:
-    try:
-        response = requests.get(api_shap_url)
-
-        if response.status_code == 200:
-            st.session_state.shap_values_data = response.json()
-        else:
-            st.error(f"❌ Erreur API SHAP : {response.status_code}, {response.text}")
-    except requests.exceptions.RequestException as e:
-        st.error(f"❌ Erreur de connexion à l'API SHAP : {e}")
-
 # 📌 Utilisation des données SHAP en cache si disponibles
 if "shap_values_data" in st.session_state:
     shap_data = st.session_state.shap_values_data
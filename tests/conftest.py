@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Ajout du dossier de l'API au chemin d'import pour les tests unitaires des modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
@@ -1,32 +1,35 @@
+import json
 import requests
 import os
 
 API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
 
+SAMPLE_DATA = {
+    "AMT_ANNUITY": 15000,
+    "AMT_CREDIT": 200000,
+    "AMT_GOODS_PRICE": 180000,
+    "CREDIT_TERM": 60,
+    "DAYS_BIRTH": -12000,
+    "DAYS_ID_PUBLISH": -3000,
+    "DAYS_REGISTRATION": -4000,
+    "EXT_SOURCE_1": 0.5,
+    "EXT_SOURCE_2": 0.7,
+    "EXT_SOURCE_3": 0.6,
+    "DEBT_CREDIT_RATIO": 0.3,
+    "ANNUITY_BIRTH_RATIO": 0.02,
+    "ANNUITY_INCOME_PERCENT": 0.1,
+    "CREDIT_GOODS_RATIO": 1.1,
+    "INSTA_AMT_PAYMENT": 10000,
+    "INSTA_NUM_INSTALMENT_VERSION": 3,
+    "POS_CNT_INSTALMENT_FUTURE": 2,
+    "PREV_CNT_PAYMENT": 12
+}
+
 def test_predict_endpoint():
     """ Vérifie que le endpoint /predict fonctionne bien et retourne une réponse correcte. """
     print(f"Testing API at: {API_URL}")
 
-    sample_data = {
-        "AMT_ANNUITY": 15000,
-        "AMT_CREDIT": 200000,
-        "AMT_GOODS_PRICE": 180000,
-        "CREDIT_TERM": 60,
-        "DAYS_BIRTH": -12000,
-        "DAYS_ID_PUBLISH": -3000,
-        "DAYS_REGISTRATION": -4000,
-        "EXT_SOURCE_1": 0.5,
-        "EXT_SOURCE_2": 0.7,
-        "EXT_SOURCE_3": 0.6,
-        "DEBT_CREDIT_RATIO": 0.3,
-        "ANNUITY_BIRTH_RATIO": 0.02,
-        "ANNUITY_INCOME_PERCENT": 0.1,
-        "CREDIT_GOODS_RATIO": 1.1,
-        "INSTA_AMT_PAYMENT": 10000,
-        "INSTA_NUM_INSTALMENT_VERSION": 3,
-        "POS_CNT_INSTALMENT_FUTURE": 2,
-        "PREV_CNT_PAYMENT": 12
-    }
+    sample_data = dict(SAMPLE_DATA)
 
     response = requests.post(f"{API_URL}/predict", json=sample_data)
     print("Response:", response.json())
@@ -34,6 +37,8 @@ def test_predict_endpoint():
     response_data = response.json()
     assert "prediction" in response_data
     assert "probability_class_1" in response_data
+    # Profil de scoring servi (probabilité exacte avec le profil complet)
+    assert response_data["approximate"] == (response.headers["X-Scoring-Profile"] == "fast")
 
 def test_shap_values_endpoint():
     """ Vérifie que le endpoint /shap_values retourne bien les valeurs SHAP. """
@@ -42,3 +47,94 @@ def test_shap_values_endpoint():
     response_data = response.json()
     assert "shap_values" in response_data
     assert "features_names" in response_data
+
+def test_predict_batch_endpoint():
+    """ Vérifie que le endpoint /predict/batch score un lot et reste cohérent avec /predict. """
+    single = requests.post(f"{API_URL}/predict", json=SAMPLE_DATA).json()
+
+    records = [SAMPLE_DATA, dict(SAMPLE_DATA, EXT_SOURCE_3=0.1)]
+    response = requests.post(f"{API_URL}/predict/batch", json=records)
+    assert response.status_code == 200, f"Erreur API : {response.status_code}"
+    response_data = response.json()
+    assert response_data["n_clients"] == 2
+    assert abs(response_data["predictions"][0]["probability_class_1"] - single["probability_class_1"]) < 1e-9
+
+    # Format colonnaire indexé par les noms de features
+    columnar = {feat: [value, value] for feat, value in SAMPLE_DATA.items()}
+    response = requests.post(f"{API_URL}/predict/batch", json=columnar)
+    assert response.status_code == 200, f"Erreur API : {response.status_code}"
+    assert len(response.json()["predictions"]) == 2
+
+def test_predict_batch_missing_features():
+    """ Vérifie que le endpoint /predict/batch rejette un lot incomplet. """
+    incomplete = dict(SAMPLE_DATA)
+    del incomplete["AMT_CREDIT"]
+    response = requests.post(f"{API_URL}/predict/batch", json=[SAMPLE_DATA, incomplete])
+    assert response.status_code == 400
+    assert "AMT_CREDIT" in response.json()["error"]
+
+def test_explain_endpoint():
+    """ Vérifie que le endpoint /explain retourne les valeurs SHAP du client envoyé. """
+    response = requests.post(f"{API_URL}/explain", json=SAMPLE_DATA)
+    assert response.status_code == 200, f"Erreur API : {response.status_code}"
+    response_data = response.json()
+    assert len(response_data["shap_values"][0]) == len(response_data["features_names"])
+    sample_values = dict(zip(response_data["features_names"], response_data["sample_values"][0]))
+    assert sample_values["AMT_CREDIT"] == SAMPLE_DATA["AMT_CREDIT"]
+
+    # Troncature aux k features les plus influentes
+    response = requests.post(f"{API_URL}/explain?top_k=5", json=SAMPLE_DATA)
+    assert response.status_code == 200, f"Erreur API : {response.status_code}"
+    top_values = response.json()["shap_values"][0]
+    assert len(top_values) == 5
+    assert top_values[0] ** 2 == max(value ** 2 for value in response_data["shap_values"][0])
+
+def test_explain_batch_endpoint():
+    """ Vérifie que le endpoint /explain/batch retourne une ligne NDJSON par client pour chaque moteur. """
+    records = [SAMPLE_DATA, dict(SAMPLE_DATA, EXT_SOURCE_3=0.1), dict(SAMPLE_DATA, EXT_SOURCE_2=0.2)]
+    lines = {}
+    for engine in ("shap", "lightgbm"):
+        response = requests.post(f"{API_URL}/explain/batch?engine={engine}&chunk_size=2", json=records)
+        assert response.status_code == 200, f"Erreur API : {response.status_code}"
+        lines[engine] = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["index"] for line in lines[engine]] == [0, 1, 2]
+    for shap_line, lgbm_line in zip(lines["shap"], lines["lightgbm"]):
+        assert max(abs(a - b) for a, b in zip(shap_line["shap_values"], lgbm_line["shap_values"])) < 1e-6
+
+def test_predict_invalid_type():
+    """ Vérifie que le endpoint /predict rejette une valeur non numérique avec une erreur par feature. """
+    response = requests.post(f"{API_URL}/predict", json=dict(SAMPLE_DATA, AMT_CREDIT="abc"))
+    assert response.status_code == 400
+    assert "AMT_CREDIT" in response.json()["error"]
+
+def test_predict_cache_header():
+    """ Vérifie que /predict indique l'utilisation du cache et que le résultat reste identique. """
+    first = requests.post(f"{API_URL}/predict", json=SAMPLE_DATA)
+    second = requests.post(f"{API_URL}/predict", json=SAMPLE_DATA)
+    assert first.headers["X-Cache"] in ("HIT", "MISS")
+    assert first.json() == second.json()
+    assert requests.get(f"{API_URL}/cache/stats").status_code == 200
+
+def test_model_version_pinning():
+    """ Vérifie l'en-tête X-Model-Version et l'épinglage d'une version de modèle inconnue. """
+    response = requests.post(f"{API_URL}/predict", json=SAMPLE_DATA)
+    models = requests.get(f"{API_URL}/models").json()
+    assert response.headers["X-Model-Version"] == models["active_version"]
+
+    pinned = requests.post(f"{API_URL}/predict", json=SAMPLE_DATA, headers={"X-Model-Version": models["active_version"]})
+    assert pinned.json()["probability_class_1"] == response.json()["probability_class_1"]
+
+    response = requests.post(f"{API_URL}/predict?model_version=inconnu.pkl", json=SAMPLE_DATA)
+    assert response.status_code == 404
+    assert "available_versions" in response.json()
+
+def test_metrics_endpoint_and_profiling():
+    """ Vérifie l'exposition des métriques Prometheus et le détail par étape demandé par l'en-tête X-Profile. """
+    response = requests.post(f"{API_URL}/predict", json=SAMPLE_DATA, headers={"X-Profile": "1"})
+    assert "validation;dur=" in response.headers["Server-Timing"]
+    assert "Server-Timing" not in requests.post(f"{API_URL}/predict", json=SAMPLE_DATA).headers
+
+    response = requests.get(f"{API_URL}/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert "scoring_api_requests_total{" in response.text
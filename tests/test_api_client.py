@@ -0,0 +1,103 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "streamlit_app"))
+
+from api_client import ApiError, ScoringApiClient
+
+
+class StandInApi(BaseHTTPRequestHandler):
+    """ Serveur local remplaçant l'API de scoring : réponses fixes, pannes et lenteurs simulées. """
+    protocol_version = "HTTP/1.1"  # Connexions keep-alive
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests.append(self.path)
+            server.ports.add(self.client_address[1])
+            failing = server.failures > 0
+            server.failures -= failing
+        time.sleep(server.delay_s)
+        if failing:
+            self.send_json(503, {"error": "Serveur saturé"}, {"Retry-After": "0"})
+        elif self.path == "/predict":
+            self.send_json(200, {"probability_class_1": body["A"] / 10})
+        else:
+            self.send_json(200, {"shap_values": [[0.1]], "base_values": 0.0, "features_names": ["A"], "sample_values": [[body["A"]]]})
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Model-Version", self.server.model_version)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInApi)
+    server.lock = threading.Lock()
+    server.requests, server.ports = [], set()
+    server.failures, server.delay_s, server.model_version = 0, 0.0, "v1"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_api_client_reuses_connection_and_caches_per_model_version(stand_in_api):
+    """ Vérifie la connexion persistante et le cache des réponses par client et version du modèle. """
+    server, url = stand_in_api
+    client = ScoringApiClient(url)
+    assert client.predict({"A": 3.0})["probability_class_1"] == pytest.approx(0.3)
+    assert client.predict({"A": 3.0}) == {"probability_class_1": pytest.approx(0.3)}
+    client.predict({"A": 4.0})
+    assert server.requests == ["/predict", "/predict"] and len(server.ports) == 1
+    assert client.stats()["hits"] == 1
+
+    server.model_version = "v2"
+    client.predict({"A": 5.0})  # Réponse servie par la nouvelle version
+    client.predict({"A": 3.0})  # Cache de la version v1 ignoré
+    assert len(server.requests) == 4 and client.model_version == "v2"
+    client.close()
+
+
+def test_api_client_retries_timeouts_and_parallel_calls(stand_in_api):
+    """ Vérifie les nouvelles tentatives sur 503, le délai maximal de réponse et les appels parallèles. """
+    server, url = stand_in_api
+    client = ScoringApiClient(url, retries=3, backoff_s=0.01, cache_size=0)
+    server.failures = 2
+    assert client.predict({"A": 1.0})["probability_class_1"] == pytest.approx(0.1)
+    assert len(server.requests) == 3
+
+    server.failures = 10
+    with pytest.raises(ApiError) as error:
+        client.predict({"A": 1.0})
+    assert error.value.status_code == 503
+
+    server.failures, server.delay_s = 0, 0.3
+    start = time.perf_counter()
+    prediction, explanation = client.predict_and_explain({"A": 2.0})
+    assert time.perf_counter() - start < 0.55  # Les deux appels sont simultanés
+    assert prediction["probability_class_1"] == pytest.approx(0.2) and explanation["sample_values"] == [[2.0]]
+
+    slow_client = ScoringApiClient(url, read_timeout_s=0.1, retries=0)
+    start = time.perf_counter()
+    with pytest.raises(ApiError) as error:
+        slow_client.predict({"A": 1.0})
+    assert error.value.status_code is None and time.perf_counter() - start < 0.3
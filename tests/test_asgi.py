@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from test_api import SAMPLE_DATA
+
+import asgi
+
+
+def call(application, method, path, body=b"", headers=()):
+    """ Appelle l'application ASGI sans serveur et retourne (statut, en-têtes, corps). """
+    messages = []
+    request = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        return request.pop(0) if request else {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"",
+             "headers": [(name.lower().encode(), value.encode()) for name, value in headers]}
+    asyncio.run(application(scope, receive, send))
+    response_headers = {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+    return messages[0]["status"], response_headers, messages[1]["body"]
+
+
+def test_asgi_predict_matches_flask_contract():
+    """ Vérifie que /predict en ASGI retourne la même réponse que la logique de l'application Flask. """
+    status, headers, body = call(asgi.app, "POST", "/predict", json.dumps(SAMPLE_DATA).encode())
+    assert status == 200
+    assert headers["x-model-version"] == asgi.registry.active().version
+
+    entry = asgi.registry.active()
+    input_array, _ = asgi.scoring.build_single_row(entry, SAMPLE_DATA)
+    expected = asgi.scoring.prediction_response(entry, entry.model.predict_proba(input_array)[0][1])
+    assert json.loads(body) == expected
+
+    assert call(asgi.app, "POST", "/predict", b"{invalide")[0] == 400
+    assert call(asgi.app, "POST", "/predict", json.dumps({"AMT_CREDIT": 1}).encode())[0] == 400
+    assert call(asgi.app, "GET", "/inconnu")[0] == 404
+
+    # Version inconnue : même contrat d'erreur que Flask (versions disponibles comprises)
+    status, _, body = call(asgi.app, "POST", "/predict", json.dumps(SAMPLE_DATA).encode(), [("X-Model-Version", "inconnue")])
+    assert status == 404
+    flask_response = asgi.scoring.app.test_client().post("/predict", json=SAMPLE_DATA, headers={"X-Model-Version": "inconnue"})
+    assert flask_response.status_code == 404 and json.loads(body) == flask_response.get_json()
+    assert entry.version in json.loads(body)["available_versions"]
+
+
+def test_asgi_backpressure_returns_503():
+    """ Vérifie qu'une requête est rejetée avec 503 lorsque le pool de calcul est saturé. """
+    saturated = asgi.ScoringASGI(max_workers=1, max_pending=0)
+    status, headers, body = call(saturated, "POST", "/predict", json.dumps(SAMPLE_DATA).encode())
+    assert status == 503
+    assert headers["retry-after"] == "1"
+    assert saturated.rejected == 1
+
+
+def test_asgi_metrics_share_flask_gauges():
+    """ Vérifie que /metrics en ASGI expose les mêmes jauges que Flask (modèle actif, cache), plus celles du pool. """
+    status, _, body = call(asgi.app, "GET", "/metrics")
+    assert status == 200
+    text = body.decode()
+    flask_text = asgi.scoring.app.test_client().get("/metrics").get_data(as_text=True)
+    for gauge in ("scoring_api_model_info", "scoring_api_prediction_cache_hit_rate"):
+        assert f"# TYPE {gauge} gauge" in text and f"# TYPE {gauge} gauge" in flask_text
+    assert "scoring_api_asgi_pending" in text
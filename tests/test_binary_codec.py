@@ -0,0 +1,62 @@
+import numpy as np
+
+from test_api import SAMPLE_DATA
+
+import app
+import binary_codec
+from binary_codec import FLOAT32_MATRIX, JSON, MSGPACK
+
+
+def test_negotiate_and_decode_float32_matrix():
+    """ Vérifie la négociation du format de réponse et le décodage (et ses erreurs) d'une matrice float32. """
+    assert binary_codec.negotiate(None) == JSON
+    assert binary_codec.negotiate("*/*") == JSON
+    assert binary_codec.negotiate("text/html, application/x-float32-matrix") == FLOAT32_MATRIX
+    assert binary_codec.negotiate("application/x-float32-matrix;q=0.5, application/json;q=0.9") == JSON
+    assert binary_codec.negotiate("application/x-float32-matrix;q=0, */*") == JSON
+    assert binary_codec.negotiate(MSGPACK) == (MSGPACK if binary_codec.msgpack_available() else JSON)
+
+    matrix = np.array([[1.5, np.nan, -3.0], [0.0, 2.0, 4.0]], dtype="<f4")
+    decoded, error = binary_codec.decode_float32_matrix(matrix.tobytes(), 3)
+    assert error is None and decoded.shape == (2, 3)
+    np.testing.assert_array_equal(decoded, matrix)
+
+    assert binary_codec.decode_float32_matrix(matrix.tobytes()[:-4], 3)[1] is not None
+    assert binary_codec.decode_float32_matrix(b"", 3)[1] is not None
+    assert binary_codec.decode_float32_matrix(matrix.tobytes(), 3, max_rows=1)[1] is not None
+    assert binary_codec.decode_float32_matrix(matrix.tobytes(), 3, nan_policy="reject")[1] is not None
+    infinite = np.array([[np.inf, 0, 0]], dtype="<f4")
+    assert binary_codec.decode_float32_matrix(infinite.tobytes(), 3)[1] is not None
+
+
+def test_predict_batch_float32_matches_json():
+    """ Vérifie que /predict/batch au format float32 retourne les mêmes probabilités que le JSON. """
+    client = app.app.test_client()
+    records = [SAMPLE_DATA, dict(SAMPLE_DATA, EXT_SOURCE_3=0.1)]
+    json_response = client.post("/predict/batch", json=records)
+    assert json_response.status_code == 200
+    version = json_response.headers["X-Model-Version"]
+    features = client.get("/schema").get_json()["required"]  # ordre des colonnes du modèle
+    matrix = np.array([[record[feat] for feat in features] for record in records], dtype="<f4")
+
+    headers = {"Accept": FLOAT32_MATRIX, "X-Model-Version": version}
+    response = client.post("/predict/batch", data=matrix.tobytes(), content_type=FLOAT32_MATRIX, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == FLOAT32_MATRIX
+    assert response.headers["X-Rows"] == "2"
+    probabilities = np.frombuffer(response.data, dtype="<f4")
+    expected = [prediction["probability_class_1"] for prediction in json_response.get_json()["predictions"]]
+    np.testing.assert_allclose(probabilities, expected, atol=1e-6)
+
+    # Requête binaire et réponse JSON : mêmes décisions que le JSON
+    response = client.post("/predict/batch", data=matrix.tobytes(), content_type=FLOAT32_MATRIX,
+                           headers={"X-Model-Version": version})
+    assert [p["prediction"] for p in response.get_json()["predictions"]] == \
+        [p["prediction"] for p in json_response.get_json()["predictions"]]
+
+    # Sans version du modèle, l'ordre des colonnes est ambigu ; corps de taille incorrecte
+    assert client.post("/predict/batch", data=matrix.tobytes(), content_type=FLOAT32_MATRIX).status_code == 400
+    assert client.post("/predict/batch", data=matrix.tobytes()[:-4], content_type=FLOAT32_MATRIX,
+                       headers=headers).status_code == 400
+    if not binary_codec.msgpack_available():
+        assert client.post("/predict", data=b"\x80", content_type=MSGPACK).status_code == 415
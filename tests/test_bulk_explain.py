@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from bulk_explain import get_booster, iter_shap_chunks, write_shap_csv
+from model_loader import load_model_data
+
+
+def test_engines_agree_and_stream_by_chunk(tmp_path):
+    """ Vérifie que les deux moteurs donnent les mêmes valeurs SHAP et que l'écriture se fait par blocs. """
+    model_data = load_model_data()
+    features_names = model_data["features"]
+    input_matrix = np.random.default_rng(0).normal(size=(250, len(features_names))) * 1000.0
+
+    results = {}
+    for engine in ("shap", "lightgbm"):
+        chunks = list(iter_shap_chunks(model_data["model"], input_matrix, features_names, engine, chunk_size=100))
+        assert [len(ids) for ids, _, _ in chunks] == [100, 100, 50]
+        results[engine] = np.vstack([shap_values for _, shap_values, _ in chunks])
+    np.testing.assert_allclose(results["shap"], results["lightgbm"], atol=1e-6)
+
+    # Les valeurs SHAP et la valeur de base reconstituent le score brut du modèle
+    _, shap_values, base_values = next(iter_shap_chunks(model_data["model"], input_matrix[:10], features_names, "lightgbm"))
+    raw_scores = get_booster(model_data["model"]).predict(input_matrix[:10], raw_score=True)
+    np.testing.assert_allclose(shap_values.sum(axis=1) + base_values, raw_scores, atol=1e-6)
+
+    # Écriture CSV depuis un fichier d'entrée lu par blocs
+    input_path = tmp_path / "clients.csv"
+    input_df = pd.DataFrame(input_matrix, columns=features_names)
+    input_df.insert(0, "SK_ID_CURR", np.arange(1000, 1250))
+    input_df.to_csv(input_path, index=False)
+    output_path = tmp_path / "shap.csv"
+    n_rows = write_shap_csv(iter_shap_chunks(model_data["model"], input_path, features_names, "lightgbm", 64),
+                            features_names, output_path)
+    output_df = pd.read_csv(output_path)
+    assert n_rows == len(output_df) == 250
+    assert output_df["SK_ID_CURR"].tolist() == list(range(1000, 1250))
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from bulk_score import score_file
+from model_loader import classify_probabilities, load_model_data
+
+
+def test_score_file_matches_model_and_streams_by_chunk(tmp_path):
+    """ Vérifie que le scoring par blocs (avec et sans pool de processus) donne les probabilités du modèle. """
+    model_data = load_model_data()
+    features_names = model_data["features"]
+    input_matrix = np.random.default_rng(0).normal(size=(250, len(features_names))) * 1000.0
+    input_df = pd.DataFrame(input_matrix, columns=features_names)
+    input_df.insert(0, "SK_ID_CURR", np.arange(1000, 1250))
+    input_path = tmp_path / "clients.csv"
+    input_df.to_csv(input_path, index=False)
+
+    expected = model_data["model"].predict_proba(input_df[features_names].to_numpy())[:, 1]
+    threshold = model_data["optimal_threshold"]
+
+    output_path = tmp_path / "scores.csv"
+    assert score_file(input_path, output_path, chunk_size=64, top_k=2, progress=False) == 250
+    output_df = pd.read_csv(output_path)
+    assert output_df["SK_ID_CURR"].tolist() == list(range(1000, 1250))
+    np.testing.assert_allclose(output_df["PROBABILITY_CLASS_1"], expected, rtol=1e-9)
+    assert output_df["PREDICTION"].tolist() == classify_probabilities(expected, threshold, threshold).tolist()
+    assert set(output_df["TOP1_FEATURE"]) <= set(features_names)
+    assert (output_df["TOP1_SHAP"].abs() >= output_df["TOP2_SHAP"].abs()).all()
+
+    parquet_path = tmp_path / "scores.parquet"
+    assert score_file(input_path, parquet_path, chunk_size=100, processes=2, progress=False) == 250
+    parquet_df = pd.read_parquet(parquet_path)
+    assert parquet_df["SK_ID_CURR"].tolist() == list(range(1000, 1250))
+    np.testing.assert_allclose(parquet_df["PROBABILITY_CLASS_1"], expected, rtol=1e-9)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from client_index import ClientIndex
+
+
+def test_client_index_lookup_and_similar(tmp_path):
+    """ Vérifie la recherche par identifiant, la recherche des plus proches voisins et la réouverture en mmap. """
+    rng = np.random.default_rng(0)
+    features_names = ["A", "B", "C"]
+    features = rng.normal(size=(1000, 3)) * [1.0, 100.0, 1e4]
+    features[5, 1] = np.nan
+    ids = rng.permutation(np.arange(100000, 101000))
+    data = pd.DataFrame(features, columns=features_names)
+    data.insert(0, "SK_ID_CURR", ids)
+    csv_path = tmp_path / "features.csv"
+    data.to_csv(csv_path, index=False)
+
+    ClientIndex.build(csv_path, features_names, chunk_size=300).save(tmp_path / "index")
+    index = ClientIndex.open(tmp_path / "index")
+    assert len(index) == 1000 and isinstance(index.features, np.memmap)
+    np.testing.assert_array_equal(index.lookup(ids[10]), features[10])
+    assert index.lookup(5) is None
+    assert index.lookup_record(ids[5])["B"] is None
+    assert index.positions([ids[3], 99, 200000]).tolist()[1:] == [-1, -1]
+
+    # Plus proches voisins : comparaison avec un calcul direct des distances centrées-réduites
+    scaled = np.nan_to_num((features - np.nanmean(features, axis=0)) / np.nanstd(features, axis=0))
+    distances = np.sqrt(((scaled - scaled[10]) ** 2).sum(axis=1))
+    distances[10] = np.inf
+    expected = np.argsort(distances)[:5]
+    similar_ids, similar_distances, _ = index.similar(ids[10], k=5)
+    assert similar_ids.tolist() == ids[expected].tolist()
+    np.testing.assert_allclose(similar_distances, distances[expected], rtol=1e-4)
+    assert ids[10] not in similar_ids
+
+    nearest_ids, nearest_distances, _ = index.similar(row=features[10], k=1)
+    assert nearest_ids.tolist() == [ids[10]] and nearest_distances[0] < 1e-3
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "streamlit_app"))
+
+from dashboard_data import STATUS_INSIDE, STATUS_OUTSIDE, comparison_table, convert_to_parquet, prepare_dashboard_data
+
+
+def test_prepare_dashboard_data_from_csv_and_float32_parquet(tmp_path):
+    """ Vérifie le précalcul des statistiques, la comparaison vectorisée et le chargement Parquet float32. """
+    rng = np.random.default_rng(0)
+    features_names = ["A", "B", "C"]
+    data = pd.DataFrame(rng.normal(size=(500, 3)) * [1, 100, 1e4], columns=features_names)
+    data.insert(0, "SK_ID_CURR", np.arange(500))
+    data["OTHER"] = "x"
+    data.loc[::7, "B"] = np.nan
+    csv_path = tmp_path / "features.csv"
+    data.to_csv(csv_path, index=False)
+
+    prepared = prepare_dashboard_data(csv_path, features_names)
+    expected_clean = data.dropna()
+    assert prepared["n_clients"] == 500
+    assert list(prepared["data_clean"].columns) == ["SK_ID_CURR", *features_names]
+    assert prepared["data_clean"]["SK_ID_CURR"].tolist() == expected_clean["SK_ID_CURR"].tolist()
+    expected_stats = expected_clean[features_names].agg(["mean", "std"])
+    np.testing.assert_allclose(prepared["stats"]["mean"], expected_stats.loc["mean"])
+    np.testing.assert_allclose(prepared["stats"]["std"], expected_stats.loc["std"])
+
+    client = prepared["data_clean"].iloc[3]
+    table = comparison_table(client, prepared["stats"])
+    for _, row in table.iterrows():
+        inside = abs(client[row["Feature"]] - row["Moyenne"]) <= row["Écart-Type"]
+        assert row["Statut"] == (STATUS_INSIDE if inside else STATUS_OUTSIDE)
+
+    parquet_path = tmp_path / "features.parquet"
+    convert_to_parquet(csv_path, parquet_path)
+    prepared32 = prepare_dashboard_data(parquet_path, features_names, float32=True)
+    assert (prepared32["data_clean"][features_names].dtypes == np.float32).all()
+    np.testing.assert_allclose(prepared32["stats"]["mean"], expected_stats.loc["mean"], rtol=1e-5)
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from decision_policy import PolicyEvaluator, PortfolioScores, policy_records
+from model_loader import CLASS_RELIABLE, CLASS_RISKY, classify_probabilities
+
+
+def test_what_if_matches_direct_classification():
+    """ Vérifie les effectifs et le coût métier obtenus par recherche dichotomique contre un calcul direct. """
+    rng = np.random.default_rng(0)
+    probabilities = np.round(rng.beta(2, 5, size=5000), 3)  # valeurs répétées, égales à certains seuils
+    labels = (rng.random(5000) < probabilities).astype(int)
+
+    for portfolio_labels in (labels, None):
+        portfolio = PortfolioScores(probabilities, labels=portfolio_labels)
+        defaults = labels if portfolio_labels is not None else probabilities
+        for threshold, margin in [(0.47, 0.0), (0.3, 0.05), (0.25, 0.25), (0.0, 0.0), (1.0, 0.1)]:
+            record = policy_records(portfolio.evaluate(threshold, margin, cost_fn=5, cost_fp=1, cost_review=0.5))[0]
+            classes = classify_probabilities(probabilities, threshold - margin, threshold + margin)
+            approved, refused = classes == CLASS_RELIABLE, classes == CLASS_RISKY
+            false_negatives = defaults[approved].sum()
+            false_positives = (1 - defaults[refused]).sum()
+            n_gray = int((~approved & ~refused).sum())
+            assert (record["n_approved"], record["n_gray_zone"], record["n_refused"]) == (approved.sum(), n_gray, refused.sum())
+            assert np.isclose(record["cost"], 5 * false_negatives + false_positives + 0.5 * n_gray)
+
+    curve = PortfolioScores(probabilities).evaluate(np.linspace(0, 1, 11), 0.02)
+    assert np.all(np.diff(curve["approval_rate"]) >= 0) and curve["approval_rate"][-1] == 1.0
+
+
+class ConstantFeatureModel:
+    """ Modèle de test : probabilité égale à la première feature. """
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict_proba(self, input_matrix):
+        self.calls += 1
+        return np.column_stack([1 - input_matrix[:, 0], input_matrix[:, 0]])
+
+
+class Entry:
+    def __init__(self, version, model, features_names):
+        self.version, self.exact_model, self.features_names = version, model, features_names
+
+
+def test_policy_evaluator_caches_per_model_version(tmp_path):
+    """ Vérifie le calcul unique des probabilités par version, la lecture de TARGET et le réordonnancement des colonnes. """
+    data = pd.DataFrame({"SK_ID_CURR": [1, 2, 3, 4], "B": [0.0] * 4, "A": [0.1, 0.9, 0.4, 0.6], "TARGET": [0, 1, 1, 0]})
+    data.to_csv(tmp_path / "portfolio.csv", index=False)
+    model = ConstantFeatureModel()
+
+    evaluator = PolicyEvaluator(tmp_path / "portfolio.csv", chunk_size=3)
+    portfolio = evaluator.get(Entry("v1", model, ["A", "B"]))
+    assert evaluator.get(Entry("v1", model, ["A", "B"])) is portfolio and model.calls == 2
+    assert portfolio.observed and len(portfolio) == 4
+    record = policy_records(portfolio.evaluate(0.5, 0.0))[0]
+    assert (record["n_approved"], record["false_negatives"], record["false_positives"]) == (2, 1.0, 1.0)
+
+    matrix_evaluator = PolicyEvaluator(data[["B", "A"]].to_numpy(), ["B", "A"])
+    matrix_portfolio = matrix_evaluator.get(Entry("v2", model, ["A", "B"]))
+    assert not matrix_portfolio.observed
+    np.testing.assert_allclose(matrix_portfolio.sorted_probabilities, [0.1, 0.4, 0.6, 0.9])
+
+
+def test_what_if_curve_independent_of_scoring_profile():
+    """ Vérifie que le portefeuille est scoré par le modèle complet, quel que soit le profil de scoring servi. """
+    from test_api import SAMPLE_DATA
+
+    from model_loader import default_model_path
+    from model_registry import ModelRegistry
+
+    entries = {profile: ModelRegistry(profile=profile, fast_options={"num_iteration": 30, "exit_margin": 0.2})
+               .load(default_model_path(), warm_up=True) for profile in ("full", "fast")}
+    features_names = entries["full"].features_names
+    rng = np.random.default_rng(0)
+    base = np.array([SAMPLE_DATA[feat] for feat in features_names], dtype=np.float64)
+    matrix = base * rng.lognormal(sigma=0.5, size=(2000, len(base)))
+
+    thresholds = np.linspace(0, 1, 21)
+    curves = {profile: PolicyEvaluator(matrix, features_names).get(entry).evaluate(thresholds, 0.05)
+              for profile, entry in entries.items()}
+    for name in ("n_approved", "n_gray_zone", "n_refused", "cost"):
+        np.testing.assert_array_equal(curves["fast"][name], curves["full"][name])
+    # Le scoring du portefeuille ne compte pas dans les statistiques du trafic servi
+    assert entries["fast"].model.stats()["rows"] == 0
+
+
+def test_what_if_endpoint_validates_curve_points(monkeypatch):
+    """ Vérifie la validation des paramètres : curve_points entier (pas de troncature) et coûts finis. """
+    import app
+
+    entry = app.registry.active()
+    matrix = np.random.default_rng(0).random((100, len(entry.features_names)))
+    monkeypatch.setattr(app, "policy_evaluator", PolicyEvaluator(matrix, entry.features_names))
+    client = app.app.test_client()
+
+    response = client.get("/policy/what_if", query_string={"curve_points": 11})
+    assert response.status_code == 200 and len(response.get_json()["cost_curve"]["threshold"]) == 11
+    for invalid in ("2.9", "abc", "1"):
+        assert client.get("/policy/what_if", query_string={"curve_points": invalid}).status_code == 400
+    # Coûts non finis : la réponse contiendrait Infinity / NaN (JSON invalide)
+    for name in ("cost_fn", "cost_fp", "cost_review"):
+        for invalid in ("inf", "nan"):
+            assert client.get("/policy/what_if", query_string={name: invalid}).status_code == 400
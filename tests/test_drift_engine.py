@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "evidently"))
+
+from drift_engine import CurrentWindow, ReferenceSketch, drift_report
+
+
+def test_incremental_window_detects_shifted_feature(tmp_path):
+    """ Vérifie que la fenêtre mise à jour par blocs détecte le drift d'une seule feature. """
+    rng = np.random.default_rng(0)
+    reference_df = pd.DataFrame({
+        "SK_ID_CURR": np.arange(20000),
+        "STABLE": rng.normal(size=20000),
+        "SHIFTED": rng.normal(size=20000),
+    })
+    reference_df.loc[::10, "STABLE"] = np.nan
+    reference_path = tmp_path / "reference.csv"
+    reference_df.to_csv(reference_path, index=False)
+
+    reference = ReferenceSketch.build(reference_path, n_bins=10, sample_size=5000, chunk_size=3000)
+    assert reference.features == ["STABLE", "SHIFTED"]
+    assert reference.n_rows == 20000 and reference.missing["STABLE"] == 2000
+    reference_path_json = tmp_path / "reference.json"
+    reference.save(reference_path_json)
+    reference = ReferenceSketch.load(reference_path_json)
+
+    stable = rng.normal(size=6000)
+    stable[::10] = np.nan
+    current_df = pd.DataFrame({"STABLE": stable, "SHIFTED": rng.normal(loc=1.0, size=6000)})
+    window = CurrentWindow.for_reference(reference)
+    for start in range(0, 6000, 1000):
+        window.update(current_df.iloc[start:start + 1000])
+    # Requêtes /predict journalisées : enregistrements JSON
+    window.update(current_df.iloc[:2].to_dict(orient="records"))
+
+    report = drift_report(reference, window)
+    assert report["n_rows_current"] == 6002
+    assert report["drifted_features"] == ["SHIFTED"]
+    assert report["features"]["SHIFTED"]["ks_p_value"] < 0.05
+    assert report["features"]["STABLE"]["psi"] < 0.05
+
+    # Une fenêtre sauvegardée puis reprise donne le même rapport
+    restored = CurrentWindow.from_dict(reference, window.to_dict())
+    assert drift_report(reference, restored)["features"] == report["features"]
@@ -0,0 +1,68 @@
+import json
+import shutil
+
+import lightgbm as lgb
+import numpy as np
+
+from fast_scoring import EarlyExitClassifier, compare_profiles
+from model_loader import BoosterClassifier, default_model_path
+from model_registry import ModelRegistry
+from tree_engine import CompiledTreeClassifier
+
+
+def train_booster():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, 4))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = (np.nan_to_num(X[:, 0]) + 0.5 * np.nan_to_num(X[:, 1]) + rng.normal(scale=0.5, size=3000) > 0).astype(int)
+    params = {"objective": "binary", "num_leaves": 8, "learning_rate": 0.05, "verbose": -1}
+    return lgb.train(params, lgb.Dataset(X, y), num_boost_round=80), X
+
+
+def test_early_exit_agreement_and_fallback():
+    """ Vérifie la sortie anticipée (moteurs LightGBM et compilé), le repli sur le modèle complet et l'audit. """
+    booster, X = train_booster()
+    threshold = 0.4
+    full = booster.predict(X.astype(np.float32))
+    for model in (BoosterClassifier(booster), CompiledTreeClassifier(booster, engine="numba")):
+        # Marge infinie : aucun client ne sort de façon anticipée, probabilités du modèle complet
+        exact = EarlyExitClassifier(model, threshold, num_iteration=20, exit_margin=np.inf, audit_rate=0)
+        np.testing.assert_allclose(exact.predict_proba(X)[:, 1], full, atol=1e-12)
+        assert exact.stats()["early_exits"] == 0
+
+        fast = EarlyExitClassifier(model, threshold, num_iteration=40, exit_margin=0.5, audit_rate=0.5)
+        fast.calibrate(X[:1000])
+        report = compare_profiles(BoosterClassifier(booster), fast, X[1000:], threshold)
+        assert 0.2 < report["early_exit_rate"] < 1 and report["decision_agreement"] == 1.0
+        stats = fast.stats()
+        assert stats["audited_rows"] == stats["early_exits"] // 2 and stats["audit_agreement"] == 1.0
+
+    # Les deux moteurs prennent les mêmes décisions de sortie anticipée
+    probabilities = [EarlyExitClassifier(model, threshold, num_iteration=40, exit_margin=0.5, remaining_offset=0.1,
+                                         audit_rate=0).predict_proba(X)
+                     for model in (BoosterClassifier(booster), CompiledTreeClassifier(booster, engine="numba"))]
+    np.testing.assert_allclose(probabilities[0], probabilities[1], atol=1e-12)
+
+
+def test_registry_fast_profile(tmp_path):
+    """ Vérifie le profil rapide du registre : features float32 et calibration lue dans les métadonnées. """
+    source_path = default_model_path()
+    if source_path.suffix != ".txt":
+        return
+    model_path = tmp_path / source_path.name
+    shutil.copy(source_path, model_path)
+    metadata = json.loads(source_path.with_suffix(".json").read_text(encoding="utf-8"))
+    metadata["fast_profile"] = {"num_iteration": 30, "remaining_offset": 0.25}
+    model_path.with_suffix(".json").write_text(json.dumps(metadata), encoding="utf-8")
+
+    registry = ModelRegistry(profile="fast", fast_options={"num_iteration": 30, "audit_rate": 0})
+    entry = registry.load(model_path)
+    assert entry.profile == "fast" and entry.describe()["scoring_profile"] == "fast"
+    assert entry.schema.dtype == np.float32 and entry.model.remaining_offset == 0.25
+    row, _ = entry.schema.build_row({name: 1.0 for name in entry.features_names})
+    assert row.dtype == np.float32 and entry.model.predict_proba(row).shape == (1, 2)
+
+    # Réponses signalées comme approchées (probabilité éventuellement estimée par sortie anticipée)
+    from app import batch_response, prediction_response
+
+    assert prediction_response(entry, 0.2)["approximate"] and batch_response(entry, np.array([0.2]))["approximate"]
@@ -0,0 +1,53 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from feature_logger import FeatureLogger
+
+
+def test_feature_logger_writes_rotating_parquet_files(tmp_path):
+    """ Vérifie l'écriture en arrière-plan, la rotation des fichiers et la relecture du dossier comme jeu courant. """
+    entry = SimpleNamespace(version="v1", features_names=["A", "B"])
+    logger = FeatureLogger(tmp_path, capacity=1000, flush_interval_s=0.05, rotate_rows=30)
+    row = np.zeros((1, 2))
+    for i in range(50):
+        row[0] = [i, -i]  # Tampon réutilisé par l'appelant : la ligne doit être copiée
+        logger.log(entry, row, [i / 100])
+    wait_written(logger, 50)
+    logger.log(entry, np.ones((10, 2)), np.full(10, 0.5))
+    wait_written(logger, 60)
+    logger.close()
+
+    stats = logger.stats()
+    assert stats["written_rows"] == 60 and stats["dropped_rows"] == 0 and stats["buffered_rows"] == 0
+    files = sorted(tmp_path.glob("features-*.parquet"))
+    assert len(files) == stats["files_written"] >= 2
+    assert not list(tmp_path.glob("*.tmp"))
+    current = pd.read_parquet(tmp_path).sort_values("timestamp", kind="stable")
+    assert list(current.columns) == ["timestamp", "model_version", "A", "B", "PROBABILITY_CLASS_1"]
+    assert current["A"].tolist() == list(range(50)) + [1.0] * 10
+    assert (current["model_version"] == "v1").all()
+
+
+def wait_written(logger, n_rows, timeout_s=5.0):
+    deadline = time.time() + timeout_s
+    while logger.stats()["written_rows"] < n_rows and time.time() < deadline:
+        time.sleep(0.02)
+
+
+def test_feature_logger_bounds_memory_and_samples(tmp_path):
+    """ Vérifie l'abandon des lignes les plus anciennes au-delà de la capacité et l'échantillonnage. """
+    entry = SimpleNamespace(version="v1", features_names=["A"])
+    logger = FeatureLogger(tmp_path, capacity=10, flush_interval_s=60, flush_rows=1000)
+    for i in range(25):
+        logger.log(entry, np.array([[i]]), [0.1])
+    stats = logger.stats()
+    assert stats["buffered_rows"] == 10 and stats["dropped_rows"] == 15
+    logger.close()
+    assert pd.read_parquet(tmp_path)["A"].tolist() == list(range(15, 25))
+
+    sampled = FeatureLogger(tmp_path / "sampled", sample_rate=0.0)
+    sampled.log(entry, np.array([[1.0]]), [0.1])
+    assert sampled.stats()["sampled_out"] == 1 and sampled.stats()["logged_rows"] == 0
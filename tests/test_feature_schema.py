@@ -0,0 +1,93 @@
+import math
+
+import numpy as np
+
+from feature_schema import FeatureSchema
+
+FEATURES = ["AMT_CREDIT", "CREDIT_TERM", "EXT_SOURCE_1"]
+
+
+def test_build_row_fills_columns_in_model_order():
+    """ Vérifie que la ligne est remplie dans l'ordre des features, les features en trop étant ignorées. """
+    schema = FeatureSchema(FEATURES)
+    row, error = schema.build_row({"EXT_SOURCE_1": 0.5, "AMT_CREDIT": 200000, "CREDIT_TERM": 60, "OTHER": "x"})
+    assert error is None
+    assert row.dtype == np.float64
+    np.testing.assert_array_equal(row, [[200000, 60, 0.5]])
+
+
+def test_build_row_reports_per_field_errors():
+    """ Vérifie les erreurs par feature : feature manquante, type invalide, entier attendu, null refusé. """
+    schema = FeatureSchema(FEATURES, feature_types={"CREDIT_TERM": "integer"}, nan_policy="reject")
+    _, error = schema.build_row({"AMT_CREDIT": 1.0, "CREDIT_TERM": 60})
+    assert error == "Features manquantes : ['EXT_SOURCE_1']"
+
+    _, error = schema.build_row({"AMT_CREDIT": "200000", "CREDIT_TERM": 60.5, "EXT_SOURCE_1": None})
+    assert "AMT_CREDIT" in error and "str" in error
+    assert "CREDIT_TERM" in error and "entier" in error
+    assert "EXT_SOURCE_1" in error and "null" in error
+
+    row, error = FeatureSchema(FEATURES).build_row({"AMT_CREDIT": 1.0, "CREDIT_TERM": 60, "EXT_SOURCE_1": None})
+    assert error is None and math.isnan(row[0, 2])
+
+
+
+def test_non_finite_values_follow_nan_policy():
+    """ Vérifie que NaN / Infinity (acceptés par le parseur JSON) sont refusés sur le chemin rapide et colonnaire. """
+    strict, lenient = FeatureSchema(FEATURES, nan_policy="reject"), FeatureSchema(FEATURES)
+    record = {"AMT_CREDIT": 1.0, "CREDIT_TERM": 60.0, "EXT_SOURCE_1": math.nan}
+    _, error = strict.build_row(record)
+    assert "EXT_SOURCE_1" in error and "non finie" in error
+    row, error = lenient.build_row(record)
+    assert error is None and math.isnan(row[0, 2])
+
+    for schema in (strict, lenient):
+        _, error = schema.build_row(dict(record, EXT_SOURCE_1=math.inf))
+        assert "EXT_SOURCE_1" in error
+        _, error = schema.build_matrix({"AMT_CREDIT": [1.0], "CREDIT_TERM": [60.0], "EXT_SOURCE_1": [-math.inf]})
+        assert "EXT_SOURCE_1" in error
+
+
+def test_build_matrix_records_and_columnar_agree():
+    """ Vérifie que les formats enregistrements et colonnaire produisent la même matrice. """
+    schema = FeatureSchema(FEATURES)
+    records = [{"AMT_CREDIT": 1.0, "CREDIT_TERM": 2, "EXT_SOURCE_1": 0.3},
+               {"AMT_CREDIT": 4.0, "CREDIT_TERM": 5, "EXT_SOURCE_1": None}]
+    columnar = {feat: [record[feat] for record in records] for feat in FEATURES}
+
+    from_records, error = schema.build_matrix(records)
+    assert error is None
+    from_columns, error = schema.build_matrix(columnar)
+    assert error is None
+    np.testing.assert_array_equal(from_records, from_columns)
+
+    _, error = schema.build_matrix(records, max_rows=1)
+    assert "maximum" in error
+    _, error = schema.build_matrix(dict(columnar, CREDIT_TERM=[2, "5"]))
+    assert error.startswith("Valeurs invalides") and "CREDIT_TERM" in error
+
+
+def test_update_openapi_file_covers_api_routes(tmp_path):
+    """ Vérifie que la spécification régénérée couvre toutes les routes de l'API (endpoints de suivi compris). """
+    import re
+    import shutil
+    from pathlib import Path
+
+    import yaml
+
+    import app
+    from feature_schema import MONITORING_PATHS, update_openapi_file
+
+    openapi_path = tmp_path / "openapi.yaml"
+    shutil.copy(Path(app.__file__).with_name("openapi.yaml"), openapi_path)
+    content = openapi_path.read_text(encoding="utf-8")
+    for path in MONITORING_PATHS:
+        # Spécification antérieure aux endpoints de suivi : ils sont ajoutés par le générateur
+        content = re.sub(rf"\n  {re.escape(path)}:\n.*?(?=\n\n)", "", content, flags=re.S)
+    openapi_path.write_text(content, encoding="utf-8")
+
+    update_openapi_file(app.registry.active().schema, openapi_path)
+    update_openapi_file(app.registry.active().schema, openapi_path)  # idempotent
+    paths = yaml.safe_load(openapi_path.read_text(encoding="utf-8"))["paths"]
+    routes = {re.sub(r"<(?:\w+:)?(\w+)>", r"{\1}", rule.rule) for rule in app.app.url_map.iter_rules()}
+    assert routes - {"/", "/static/{filename}"} <= set(paths)
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from load_test import compare_to_baseline, synthetic_clients
+
+
+def test_compare_to_baseline_detects_regressions():
+    """ Vérifie la détection des régressions de débit, de latence et d'erreurs par rapport à la référence. """
+    reference = {"errors": 0, "throughput_rps": 100.0, "p95_ms": 10.0, "memory_mb": 200.0}
+    baseline = {"inprocess": {"predict_single": reference, "shap_values": reference}}
+
+    within = {"inprocess": {"predict_single": dict(reference, throughput_rps=90.0, p95_ms=11.0)}}
+    assert compare_to_baseline(within, baseline, threshold=0.2) == []
+
+    slower = {"inprocess": {
+        "predict_single": dict(reference, throughput_rps=70.0),
+        "shap_values": dict(reference, p95_ms=15.0, errors=2),
+        "predict_batch_10": dict(reference, p95_ms=100.0),  # absent de la référence : ignoré
+    }}
+    regressions = compare_to_baseline(slower, baseline, threshold=0.2)
+    assert len(regressions) == 3
+    assert regressions[0].startswith("inprocess/predict_single : throughput_rps")
+
+
+def test_synthetic_clients_use_model_features():
+    """ Vérifie que les clients synthétiques sont reproductibles et indexés par les features du modèle. """
+    clients = synthetic_clients(["A", "B"], 3, seed=1)
+    assert len(clients) == 3 and set(clients[0]) == {"A", "B"}
+    assert clients == synthetic_clients(["A", "B"], 3, seed=1)
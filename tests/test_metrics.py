@@ -0,0 +1,42 @@
+import pytest
+
+from metrics import NULL_TIMER, Histogram, Metrics, RequestTimer
+
+
+def test_histogram_quantiles():
+    """ Vérifie l'estimation des quantiles par interpolation dans les classes de l'histogramme. """
+    histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+    for value in [0.0005] * 50 + [0.005] * 45 + [0.05] * 5:
+        histogram.observe(value)
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == pytest.approx(0.001)
+    assert histogram.quantile(0.95) == pytest.approx(0.01)
+    assert histogram.quantile(0.99) == pytest.approx(0.082)
+
+
+def test_metrics_render_prometheus_text():
+    """ Vérifie les compteurs, les histogrammes par étape et le chronomètre vide lorsque l'instrumentation est désactivée. """
+    metrics = Metrics()
+    timer = metrics.start_timer()
+    timer.mark("parse")
+    timer.mark("predict")
+    metrics.record("predict", "POST", 200, timer)
+    metrics.record("predict", "POST", 400, RequestTimer())
+
+    text = metrics.render({"model_info": ("Modèle actif.", {(("version", "abc"),): 1})})
+    assert "# TYPE scoring_api_request_duration_seconds histogram" in text
+    assert 'scoring_api_errors_total{pid=' in text and 'status="400"} 1' in text
+    assert 'endpoint="predict",stage="predict",le="+Inf"} 1' in text
+    assert 'scoring_api_request_duration_seconds_count{' in text and 'endpoint="predict"} 2' in text
+    assert 'scoring_api_model_info{version="abc",pid=' in text
+
+    disabled = Metrics(enabled=False)
+    assert disabled.start_timer() is NULL_TIMER
+    assert isinstance(disabled.start_timer(force=True), RequestTimer)
+    disabled.record("predict", "POST", 200, NULL_TIMER)
+    disabled.record("predict", "POST", 500, NULL_TIMER)
+    # Instrumentation désactivée : compteurs conservés, histogrammes de latence omis
+    disabled_text = disabled.render()
+    assert 'requests_total{' in disabled_text and 'status="200"} 1' in disabled_text
+    assert 'errors_total{' in disabled_text and 'status="500"} 1' in disabled_text
+    assert "request_duration_seconds_count{" not in disabled_text
@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+
+from micro_batcher import MicroBatcher
+
+
+def test_micro_batcher_coalesces_concurrent_rows():
+    """ Vérifie que des soumissions concurrentes sont regroupées et que chaque appelant récupère sa ligne. """
+    calls = []
+
+    def predict_fn(input_matrix):
+        calls.append(input_matrix.shape[0])
+        return input_matrix[:, 0] * 2
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.submit(np.array([float(i), 0.0]))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: 2.0 * i for i in range(8)}
+    assert sum(calls) == 8
+    assert len(calls) < 8
+    stats = batcher.stats()
+    assert stats["rows"] == 8
+    assert stats["mean_batch_size"] > 1
+
+
+def test_micro_batcher_propagates_errors():
+    """ Vérifie qu'une erreur du modèle est renvoyée à l'appelant. """
+    def predict_fn(input_matrix):
+        raise ValueError("modèle indisponible")
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=1)
+    try:
+        batcher.submit(np.zeros(2))
+    except ValueError as e:
+        assert "indisponible" in str(e)
+    else:
+        raise AssertionError("L'erreur du modèle n'a pas été propagée.")
+
+
+def test_micro_batcher_scores_each_group_with_its_model():
+    """ Vérifie que les lignes de groupes différents (versions du modèle) sont scorées chacune par leur groupe. """
+    calls = []
+
+    def predict_fn(input_matrix, factor):
+        calls.append((factor, input_matrix.shape[0]))
+        return input_matrix[:, 0] * factor
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.submit(np.array([float(i), 0.0]), group=2 if i % 2 else 3)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: float(i) * (2 if i % 2 else 3) for i in range(8)}
+    assert sum(size for _, size in calls) == 8
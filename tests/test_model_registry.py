@@ -0,0 +1,57 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from model_loader import default_model_path
+from model_registry import ModelRegistry, UnknownModelVersion
+
+
+def test_registry_reload_pinning_and_pruning(tmp_path):
+    """ Vérifie le rechargement à chaud, l'épinglage par version ou nom de fichier et la limite de versions. """
+    source_path = default_model_path()
+    model_path = tmp_path / source_path.name
+    shutil.copy(source_path, model_path)
+    if source_path.suffix == ".txt":
+        shutil.copy(source_path.with_suffix(".json"), model_path.with_suffix(".json"))
+
+    registry = ModelRegistry(max_versions=2)
+    first = registry.load(model_path)
+    assert registry.active() is first
+    assert registry.get() is first and registry.get(first.name) is first and registry.get(first.version) is first
+    with pytest.raises(UnknownModelVersion):
+        registry.get("inconnu.pkl")
+
+    # Fichier inchangé : pas de rechargement
+    assert registry.reload() is first
+
+    # Nouveau contenu : nouvelle version active, l'ancienne reste épinglable
+    with open(model_path, "ab") as f:
+        f.write(b"\n")
+    os.utime(model_path, ns=(0, first.signature[0][0] + 1))
+    second = registry.reload()
+    assert second is not first and registry.active() is second
+    assert registry.get(first.version) is first
+    row = np.zeros((1, len(first.features_names)))
+    np.testing.assert_allclose(first.model.predict_proba(row), second.model.predict_proba(row))
+
+    # Au-delà de max_versions, la version la plus ancienne (non active) est supprimée
+    with open(model_path, "ab") as f:
+        f.write(b"\n")
+    third = registry.reload()
+    assert [entry["version"] for entry in registry.versions()] == [second.version, third.version]
+    with pytest.raises(UnknownModelVersion):
+        registry.get(first.version)
+
+
+def test_registry_shadow_stats():
+    """ Vérifie l'agrégation des écarts entre le modèle servi et le modèle fantôme. """
+    registry = ModelRegistry()
+    registry.record_shadow(0.40, 0.50, threshold=0.47)
+    registry.record_shadow(0.10, 0.12, threshold=0.47)
+    stats = registry.shadow_stats()
+    assert stats["n"] == 2
+    assert stats["class_disagreements"] == 1
+    assert stats["max_abs_diff"] == pytest.approx(0.10)
+    assert stats["mean_abs_diff"] == pytest.approx(0.06)
@@ -0,0 +1,37 @@
+import time
+
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+
+def test_cache_key_is_canonical_and_versioned():
+    """ Vérifie que la clé ne dépend que du vecteur canonique et de la version du modèle. """
+    row = np.array([[1.0, 0.0, np.nan]])
+    assert PredictionCache.make_key(row, "v1") == PredictionCache.make_key(np.array([[1.0, -0.0, np.nan]]), "v1")
+    assert PredictionCache.make_key(row, "v1") != PredictionCache.make_key(row, "v2")
+    assert PredictionCache.make_key(row, "v1") != PredictionCache.make_key(np.array([[1.0, 0.0, 2.0]]), "v1")
+
+
+def test_cache_lru_ttl_and_invalidation():
+    """ Vérifie l'éviction LRU, l'expiration et l'invalidation au changement de version du modèle. """
+    cache = PredictionCache(max_size=2, ttl_s=0)
+    cache.check_model_version("v1")
+    cache.put("a", 0.1)
+    cache.put("b", 0.2)
+    assert cache.get("a") == 0.1
+    cache.put("c", 0.3)  # "b" est le moins récemment utilisé
+    assert cache.get("b") is None
+    assert cache.get("c") == 0.3
+    assert cache.stats()["evictions"] == 1
+
+    cache.check_model_version("v2")
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+    cache = PredictionCache(max_size=10, ttl_s=0.01)
+    cache.put("a", 0.1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 1)
@@ -0,0 +1,45 @@
+import lightgbm as lgb
+import numpy as np
+import pytest
+
+from model_loader import load_model_data, default_model_path
+from tree_engine import CompiledTreeClassifier, TreeEnsemble
+
+
+@pytest.mark.parametrize("engine", ["numba", "numpy"])
+def test_compiled_engine_matches_lightgbm(engine):
+    """ Vérifie la parité avec Booster.predict (valeurs manquantes, zéros et valeurs égales aux seuils). """
+    booster = load_model_data(default_model_path())["model"].booster_
+    model = CompiledTreeClassifier(booster, engine=engine)
+    ensemble = model.ensemble
+
+    rng = np.random.default_rng(0)
+    input_matrix = rng.normal(size=(500, booster.num_feature())) * 1000.0
+    input_matrix[rng.random(input_matrix.shape) < 0.1] = np.nan
+    input_matrix[rng.random(input_matrix.shape) < 0.05] = 0.0
+    # Valeurs exactement égales à des seuils de split (comparaison `<=`)
+    internal = np.flatnonzero(ensemble.feature >= 0)[:200]
+    input_matrix[np.arange(len(internal)), ensemble.feature[internal]] = ensemble.threshold[internal]
+
+    expected = booster.predict(input_matrix)
+    probabilities = model.predict_proba(input_matrix)
+    assert probabilities.shape == (500, 2)
+    np.testing.assert_allclose(probabilities[:, 1], expected, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(probabilities.sum(axis=1), 1.0)
+
+
+def test_missing_type_zero_and_unsupported_models():
+    """ Vérifie le traitement des zéros comme valeurs manquantes et le refus des modèles non binaires. """
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(2000, 3))
+    X[rng.random(X.shape) < 0.3] = 0.0
+    y = (X[:, 0] + (X[:, 1] == 0) > 0.2).astype(int)
+    params = {"objective": "binary", "zero_as_missing": True, "num_leaves": 8, "verbose": -1}
+    booster = lgb.train(params, lgb.Dataset(X, y), num_boost_round=20)
+    X_test = np.vstack([X[:200], np.zeros((1, 3)), np.full((1, 3), np.nan)])
+    np.testing.assert_allclose(CompiledTreeClassifier(booster).predict_proba(X_test)[:, 1], booster.predict(X_test),
+                               atol=1e-12)
+
+    regression = lgb.train({"objective": "regression", "verbose": -1}, lgb.Dataset(X, X[:, 0]), num_boost_round=2)
+    with pytest.raises(ValueError):
+        TreeEnsemble.from_booster(regression)